@@ -6,9 +6,30 @@
     IAgentEngine,
     IAerialAgent,
     AgentType,
+    StrategyError,
 )
-from typing import Callable, Dict, Any, Optional, Tuple, cast
+from gamms.ComputationEngine import Task
+from gamms.spatial import SpatialHash
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Union, cast
+from enum import IntEnum
+import numpy as np
 import math
+import time
+
+_CELL_SIZE = 50.0  # side of the grid cells bucketing agent positions
+
+class Engine(IntEnum):
+    OBJECT = 0
+    ARRAY = 1
+
+def _run_strategy(
+    strategy: Callable[[Dict[str, Any]], None],
+    state: Dict[str, Any],
+) -> Tuple[Dict[str, Any], float]:
+    """Run ``strategy`` on ``state`` and return the state with the seconds it took."""
+    start = time.perf_counter()
+    strategy(state)
+    return state, time.perf_counter() - start
 
 class NoOpAgent(IAgent):
     def __init__(self, ctx: IContext, name: str, start_node_id: int, **kwargs: Dict[str, Any]):
@@ -95,6 +116,9 @@ def __init__(self, ctx: IContext, name: str, start_node_id: int, **kwargs: Dict[
         self._strategy: Optional[Callable[[Dict[str, Any]], None]] = None
         self._state = {}
         self._orientation = (0.0, 0.0)
+        # Heading derived from the last move, with the (prev, current, graph version) it belongs to
+        self._heading = (0.0, 0.0)
+        self._heading_key = (start_node_id, start_node_id, -1)
         for k, v in kwargs.items():
             setattr(self, k, v)
     
@@ -121,6 +145,7 @@ def current_node_id(self, node_id: int):
                 }
             )
         self._current_node_id = node_id
+        self._ctx.agent._track(self)
 
     @property
     def prev_node_id(self) -> int:
@@ -190,35 +215,55 @@ def step(self):
     def get_state(self) -> Dict[str, Any]:
         for sensor in self._sensor_list.values():
             sensor.sense(self._current_node_id)
+        return self._collect_state()
+
+    def _sensing_node(self) -> int:
+        return self._current_node_id
 
+    def _collect_state(self) -> Dict[str, Any]:
+        """Build the state from the data the sensors last sensed."""
         state: Dict[str, Any] = {'curr_pos': self._current_node_id}
         state['sensor'] = {k:(sensor.type, sensor.data) for k, sensor in self._sensor_list.items()}
         self._state = state
         return self._state
-    
 
     def set_state(self) -> None:
-        self.prev_node_id = self._current_node_id
+        self._check_action()
+        self._apply_action()
+
+    def _check_action(self) -> None:
+        """Raise the error ``set_state`` would, without changing the agent."""
+        self._ctx.agent._check_moves([(self._current_node_id, self._action_target())])
+
+    def _action_target(self) -> int:
+        """Check the form of the action and return the node it moves to."""
         # Action can either be a node ID or a dictionary with 'action' key
         if isinstance(self._state['action'], int): # Node ids are integers
-            # Check if the node exists in the graph
-            _ = self._ctx.graph.graph.get_node(self._state['action'])
-            self.current_node_id = self._state['action']
+            return self._state['action']
         elif isinstance(self._state['action'], dict):
             action = cast(Dict[str, Any], self._state['action'])
             if 'node_id' not in action:
                 raise ValueError("Action dictionary must contain 'node_id' key.")
-            else:
-                _ = self._ctx.graph.graph.get_node(action['node_id'])
-                self.current_node_id = action['node_id']
-            
             if 'orientation' in action:
                 orientation = cast(Tuple[float, float], action['orientation'])
                 if len(orientation) != 2:
                     raise ValueError("Orientation must be a tuple of (sin, cos).")
-                self.orientation = orientation
+                if orientation[0] == 0 and orientation[1] == 0:
+                    raise ValueError("Orientation cannot be a zero vector.")
+            return action['node_id']
         else:
             raise TypeError("Action must be an integer (node ID) or a dictionary with 'node_id' key.")
+
+    def _apply_action(self) -> None:
+        """Commit an action that passed ``_check_action``."""
+        self.prev_node_id = self._current_node_id
+        if isinstance(self._state['action'], int):
+            self.current_node_id = self._state['action']
+            return
+        action = cast(Dict[str, Any], self._state['action'])
+        self.current_node_id = action['node_id']
+        if 'orientation' in action:
+            self.orientation = cast(Tuple[float, float], action['orientation'])
             
     
     @property
@@ -230,15 +275,11 @@ def orientation(self) -> Tuple[float, float]:
         """
         if self._orientation != (0.0, 0.0):
             return self._orientation
-        prev_node = self._graph.graph.get_node(self.prev_node_id)
-        curr_node = self._graph.graph.get_node(self.current_node_id)
-        delta_x = curr_node.x - prev_node.x
-        delta_y = curr_node.y - prev_node.y
-        distance = math.sqrt(delta_x**2 + delta_y**2)
-        if distance == 0:
-            return (0.0, 0.0)
-        else:
-            return (delta_x / distance, delta_y / distance)
+        key = (self._prev_node_id, self._current_node_id, self._graph.graph.version)
+        if key != self._heading_key:
+            self._heading = self._graph.get_heading(key[0], key[1])
+            self._heading_key = key
+        return self._heading
     
     @orientation.setter
     def orientation(self, orientation: Tuple[float, float]):
@@ -306,6 +347,7 @@ def position(self, pos: Tuple[float, float, float]):
         self.prev_node_id = self.current_node_id  # Update previous node ID
         self._prev_position = self._position
         self._position = pos
+        self._ctx.agent._track(self)
 
     @property
     def prev_position(self):
@@ -413,19 +455,44 @@ def strategy(self) -> Optional[Callable[[Dict[str, Any]], None]]:
     step = Agent.step
 
     def get_state(self) -> Dict[str, Any]:
-        for sensor in self._sensor_list.values():
-            sensor.sense(self.current_node_id)
+        if self._sensor_list:
+            node_id = self.current_node_id
+            for sensor in self._sensor_list.values():
+                sensor.sense(node_id)
+        return self._collect_state()
 
+    def _sensing_node(self) -> int:
+        return self.current_node_id
+
+    def _collect_state(self) -> Dict[str, Any]:
+        """Build the state from the data the sensors last sensed."""
         state: Dict[str, Any] = {'curr_pos': self.position, 'quat': self.quat}
         state['sensor'] = {k:(sensor.type, sensor.data) for k, sensor in self._sensor_list.items()}
         self._state = state
         return self._state
-    
+
     def set_state(self) -> None:
+        self._check_action()
+        self._apply_action()
+
+    def _check_action(self) -> None:
+        """Raise the error ``set_state`` would, without changing the agent."""
         if isinstance(self._state['action'], tuple):
-            action = cast(Tuple[float, float, float], self._state['action'])
-            if len(action) != 3:
+            if len(self._state['action']) != 3:
                 raise ValueError("Action must be a 3d tuple (x, y, z).")
+        elif isinstance(self._state['action'], dict):
+            action = cast(Dict[str, Any], self._state['action'])
+            if 'direction' in action and len(action['direction']) != 3:
+                raise ValueError("Direction must be a 3d tuple (x, y, z).")
+            if 'quat' in action and len(action['quat']) != 4:
+                raise ValueError("Quaternion must be a tuple of (w, x, y, z).")
+        else:
+            raise TypeError("Action must be a 3d tuple or a dictionary with 'direction' key.")
+
+    def _apply_action(self) -> None:
+        """Commit an action that passed ``_check_action``."""
+        if isinstance(self._state['action'], tuple):
+            action = cast(Tuple[float, float, float], self._state['action'])
             pos = self.position
             norm = math.sqrt(action[0]**2 + action[1]**2 + action[2]**2)
             if norm == 0:
@@ -436,12 +503,10 @@ def set_state(self) -> None:
                     pos[1] + action[1] / norm * self._speed,
                     pos[2] + action[2] / norm * self._speed
                 )
-        elif isinstance(self._state['action'], dict):
+        else:
             action = cast(Dict[str, Any], self._state['action'])
             if 'direction' in action:
                 direction = cast(Tuple[float, float, float], action['direction'])
-                if len(direction) != 3:
-                    raise ValueError("Direction must be a 3d tuple (x, y, z).")
                 pos = self.position
                 norm = math.sqrt(direction[0]**2 + direction[1]**2 + direction[2]**2)
                 if norm == 0:
@@ -454,20 +519,492 @@ def set_state(self) -> None:
                     )
             if 'quat' in action:
                 quat = action['quat']
-                if len(quat) != 4:
-                    raise ValueError("Quaternion must be a tuple of (w, x, y, z).")
                 self.quat = (quat[0], quat[1], quat[2], quat[3])
-        else:
-            raise TypeError("Action must be a 3d tuple or a dictionary with 'direction' key.")
 
     
+class AgentArrays:
+    """
+    Struct-of-arrays storage of agent state, one row per agent.
+
+    Rows of deleted agents are reused, so ``alive`` marks the rows in use.
+    Aerial agents have no node of their own in ``current_node``, it is -1,
+    and basic agents have the zero vector in ``orientation`` until one is
+    set explicitly. ``team`` is -1 for agents without an integer team.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.names: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self.current_node = np.full(capacity, -1, dtype=np.int64)
+        self.prev_node = np.full(capacity, -1, dtype=np.int64)
+        self.position = np.zeros((capacity, 3), dtype=np.float64)
+        self.quat = np.zeros((capacity, 4), dtype=np.float64)
+        self.quat[:, 0] = 1.0
+        self.orientation = np.zeros((capacity, 2), dtype=np.float64)
+        self.speed = np.zeros(capacity, dtype=np.float64)
+        self.team = np.full(capacity, -1, dtype=np.int64)
+        self.aerial = np.zeros(capacity, dtype=bool)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow(self) -> None:
+        capacity = len(self.alive)
+        for attr in ('current_node', 'prev_node', 'position', 'quat', 'orientation', 'speed', 'team', 'aerial', 'alive'):
+            old = getattr(self, attr)
+            new = np.empty((capacity * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, attr, new)
+        self._reset(slice(capacity, None))
+
+    def _reset(self, rows: Union[int, slice]) -> None:
+        self.current_node[rows] = -1
+        self.prev_node[rows] = -1
+        self.position[rows] = 0.0
+        self.quat[rows] = (1.0, 0.0, 0.0, 0.0)
+        self.orientation[rows] = 0.0
+        self.speed[rows] = 0.0
+        self.team[rows] = -1
+        self.aerial[rows] = False
+        self.alive[rows] = False
+
+    def allocate(self, name: str) -> int:
+        if name in self.rows:
+            raise ValueError(f"Agent {name} already exists.")
+        if self._free:
+            row = self._free.pop()
+            self.names[row] = name
+        else:
+            row = len(self.names)
+            if row == len(self.alive):
+                self._grow()
+            self.names.append(name)
+        self.rows[name] = row
+        self.alive[row] = True
+        return row
+
+    def release(self, name: str) -> None:
+        row = self.rows.pop(name)
+        self.names[row] = None
+        self._reset(row)
+        self._free.append(row)
+
+    def index(self, agents: Union[Sequence[Union[str, int]], np.ndarray]) -> np.ndarray:
+        """
+        Get the rows of ``agents``, given as names or as row indices.
+
+        Raises:
+            KeyError: If a name or row does not belong to an agent.
+        """
+        if isinstance(agents, np.ndarray) and agents.dtype.kind in 'iu':
+            rows = agents.astype(np.int64, copy=False)
+        else:
+            rows = np.fromiter(
+                (agent if isinstance(agent, (int, np.integer)) else self.rows[agent] for agent in agents),
+                dtype=np.int64,
+            )
+        dead = (rows < 0) | (rows >= len(self.names))
+        if not dead.any():
+            dead = ~self.alive[rows]
+        if dead.any():
+            raise KeyError(f"Agent rows {rows[dead].tolist()} not found.")
+        return rows
+
+
+class ArrayAgent(Agent):
+    """
+    Agent whose node IDs and orientation are a row of ``AgentArrays``.
+
+    Agent keeps its state in ``_current_node_id``, ``_prev_node_id`` and
+    ``_orientation``, so redirecting those to the row leaves every Agent
+    method working on the arrays.
+    """
+
+    def __init__(self, ctx: IContext, name: str, start_node_id: int, arrays: AgentArrays, **kwargs: Dict[str, Any]):
+        self._arrays = arrays
+        self._row = arrays.allocate(name)
+        super().__init__(ctx, name, start_node_id, **kwargs)
+        team = kwargs.get('team')
+        meta = kwargs.get('meta')
+        if team is None and isinstance(meta, dict):
+            team = meta.get('team')
+        if isinstance(team, int):
+            arrays.team[self._row] = team
+
+    @property
+    def _current_node_id(self) -> int:
+        return int(self._arrays.current_node[self._row])
+
+    @_current_node_id.setter
+    def _current_node_id(self, node_id: int) -> None:
+        self._arrays.current_node[self._row] = node_id
+
+    @property
+    def _prev_node_id(self) -> int:
+        return int(self._arrays.prev_node[self._row])
+
+    @_prev_node_id.setter
+    def _prev_node_id(self, node_id: int) -> None:
+        self._arrays.prev_node[self._row] = node_id
+
+    @property
+    def _orientation(self) -> Tuple[float, float]:
+        sin, cos = self._arrays.orientation[self._row].tolist()
+        return (sin, cos)
+
+    @_orientation.setter
+    def _orientation(self, orientation: Tuple[float, float]) -> None:
+        self._arrays.orientation[self._row] = orientation
+
+
+class ArrayAerialAgent(AerialAgent):
+    """AerialAgent whose previous node, position, quaternion and speed are a row of ``AgentArrays``."""
+
+    def __init__(self, ctx: IContext, name: str, start_node_id: int, speed: float, arrays: AgentArrays):
+        self._arrays = arrays
+        self._row = arrays.allocate(name)
+        arrays.aerial[self._row] = True
+        super().__init__(ctx, name, start_node_id, speed)
+
+    @property
+    def _prev_node_id(self) -> int:
+        return int(self._arrays.prev_node[self._row])
+
+    @_prev_node_id.setter
+    def _prev_node_id(self, node_id: int) -> None:
+        self._arrays.prev_node[self._row] = node_id
+
+    @property
+    def _position(self) -> Tuple[float, float, float]:
+        x, y, z = self._arrays.position[self._row].tolist()
+        return (x, y, z)
+
+    @_position.setter
+    def _position(self, pos: Tuple[float, float, float]) -> None:
+        self._arrays.position[self._row] = pos
+
+    @property
+    def _quat(self) -> Tuple[float, float, float, float]:
+        w, x, y, z = self._arrays.quat[self._row].tolist()
+        return (w, x, y, z)
+
+    @_quat.setter
+    def _quat(self, quat: Tuple[float, float, float, float]) -> None:
+        self._arrays.quat[self._row] = quat
+
+    @property
+    def _speed(self) -> float:
+        return float(self._arrays.speed[self._row])
+
+    @_speed.setter
+    def _speed(self, speed: float) -> None:
+        self._arrays.speed[self._row] = speed
+
+
 class AgentEngine(IAgentEngine):
-    def __init__(self, ctx: IContext):
+    def __init__(self, ctx: IContext, engine: Engine = Engine.OBJECT, adjacent_moves: bool = False):
         self.ctx = ctx
+        # Restrict actions of basic agents to staying or moving to a neighbor
+        self.adjacent_moves = adjacent_moves
+        if engine == Engine.OBJECT:
+            self._arrays: Optional[AgentArrays] = None
+        elif engine == Engine.ARRAY:
+            self._arrays = AgentArrays()
+        else:
+            raise NotImplementedError(f"Agent engine {engine} not implemented")
         self.agents: Dict[str, IAgent] = {}
+        self._agent_hash: SpatialHash[str] = SpatialHash(_CELL_SIZE)
+        self._positions: Dict[str, Tuple[float, float, float]] = {}
+        self._movement_epoch = 0
+        self._strategy_times: Dict[str, float] = {}
+        # Occupancy of basic agents, node -> names in arrival order, and its inverse
+        self._occupants: Dict[int, Dict[str, None]] = {}
+        self._node_of: Dict[str, int] = {}
+        # Node positions by id, valid for the graph version they were read at
+        self._node_xy: Dict[int, Tuple[float, float]] = {}
+        self._node_xy_version: Optional[int] = None
+
+    def _node_position(self, node_id: int) -> Optional[Tuple[float, float]]:
+        """Position of a node, read from the graph once per graph version, or None if it does not exist."""
+        graph = self.ctx.graph.graph
+        if self._node_xy_version != graph.version:
+            self._node_xy.clear()
+            self._node_xy_version = graph.version
+        xy = self._node_xy.get(node_id)
+        if xy is None:
+            try:
+                node = graph.get_node(node_id)
+            except KeyError:
+                return None
+            xy = self._node_xy[node_id] = (node.x, node.y)
+        return xy
+
+    def _track(self, agent: IAgent) -> None:
+        """Refresh the indexed position of ``agent`` after it moved."""
+        if self.agents.get(agent.name) is not agent:
+            return
+        if agent.type == AgentType.AERIAL:
+            pos = cast(IAerialAgent, agent).position
+        else:
+            xy = self._node_position(agent.current_node_id)
+            if xy is None:
+                # Agent sits on a node unknown to the graph, it cannot be located or indexed
+                self._vacate(agent.name)
+                self._untrack(agent.name)
+                return
+            self._occupy(agent.name, agent.current_node_id)
+            pos = (xy[0], xy[1], 0.0)
+        if self._positions.get(agent.name) != pos:
+            self._movement_epoch += 1
+        self._positions[agent.name] = pos
+        if isinstance(agent, ArrayAgent):
+            agent._arrays.position[agent._row] = pos
+        self._agent_hash.update(agent.name, pos[0], pos[1])
+
+    def _check_moves(self, moves: List[Tuple[int, int]]) -> None:
+        """
+        Validate moves of basic agents, given as (current node, target node) pairs.
+
+        Each distinct target is looked up once, and with ``adjacent_moves``
+        each distinct move is checked against the neighbors of its source.
+
+        Raises:
+            KeyError: If a target node does not exist.
+            ValueError: If ``adjacent_moves`` is set and a target is neither
+                the current node nor one of its neighbors.
+        """
+        graph = self.ctx.graph.graph
+        for target in {target for _, target in moves}:
+            if not graph.has_node(target):
+                raise KeyError(f"Node {target} does not exist.")
+        if not self.adjacent_moves:
+            return
+        for source, target in {move for move in moves if move[0] != move[1]}:
+            if target not in graph.get_neighbors(source):
+                raise ValueError(f"Node {target} is not adjacent to node {source}.")
+
+    def _untrack(self, name: str) -> None:
+        if self._positions.pop(name, None) is not None:
+            self._movement_epoch += 1
+        self._agent_hash.remove(name)
+
+    def _occupy(self, name: str, node_id: int) -> None:
+        if self._node_of.get(name) == node_id:
+            return
+        self._vacate(name)
+        self._node_of[name] = node_id
+        self._occupants.setdefault(node_id, {})[name] = None
+
+    def _vacate(self, name: str) -> None:
+        node_id = self._node_of.pop(name, None)
+        if node_id is None:
+            return
+        names = self._occupants[node_id]
+        del names[name]
+        if not names:
+            del self._occupants[node_id]
+
+    def agents_at(self, node_id: int) -> List[IAgent]:
+        return [self.agents[name] for name in self._occupants.get(node_id, ())]
+
+    def co_located(self, team_a: Iterable[str], team_b: Iterable[str]) -> List[Tuple[IAgent, IAgent]]:
+        members_b = set(team_b)
+        pairs: List[Tuple[IAgent, IAgent]] = []
+        for name_a in team_a:
+            node_id = self._node_of.get(name_a)
+            if node_id is None:
+                continue
+            for name_b in self._occupants[node_id]:
+                if name_b in members_b and name_b != name_a:
+                    pairs.append((self.agents[name_a], self.agents[name_b]))
+        return pairs
+
+    def agents_within_hops(self, node_id: int, k: int) -> List[Tuple[IAgent, int]]:
+        if k < 0:
+            raise ValueError("Number of hops must be non-negative.")
+        graph = self.ctx.graph.graph
+        found: List[Tuple[IAgent, int]] = []
+        seen = {node_id}
+        frontier = [node_id]
+        for hops in range(k + 1):
+            for node in frontier:
+                for name in self._occupants.get(node, ()):
+                    found.append((self.agents[name], hops))
+            if hops == k:
+                break
+            ring: List[int] = []
+            for node in frontier:
+                for neighbor in graph.get_neighbors(node):
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        ring.append(neighbor)
+            if not ring:
+                break
+            frontier = ring
+        return found
+
+    @property
+    def movement_epoch(self) -> int:
+        return self._movement_epoch
+
+    @property
+    def strategy_times(self) -> Dict[str, float]:
+        return self._strategy_times
+
+    @property
+    def arrays(self) -> AgentArrays:
+        """
+        The arrays holding the agent state when the engine is ``Engine.ARRAY``.
+
+        Raises:
+            RuntimeError: If the engine keeps agents as objects.
+        """
+        if self._arrays is None:
+            raise RuntimeError("Agent arrays are only available with Engine.ARRAY.")
+        return self._arrays
+
+    def move_many(
+        self,
+        agents: Union[Sequence[Union[str, int]], np.ndarray],
+        node_ids: Union[Sequence[int], np.ndarray, int],
+    ) -> None:
+        if self._arrays is not None:
+            rows = self._arrays.index(agents)
+            names = [cast(str, self._arrays.names[row]) for row in rows.tolist()]
+            if self._arrays.aerial[rows].any():
+                raise ValueError("Aerial agents cannot be moved to a node.")
+        else:
+            names = list(agents)
+            for name in names:
+                if not isinstance(self.get_agent(name), Agent):
+                    raise ValueError(f"Agent {name} cannot be moved to a node.")
+        targets = np.broadcast_to(np.asarray(node_ids, dtype=np.int64), (len(names),))
+        # Every target is checked before any agent moves, so a bad batch changes nothing
+        graph = self.ctx.graph.graph
+        for node_id in set(targets.tolist()):
+            if not graph.has_node(node_id):
+                raise KeyError(f"Node {node_id} does not exist.")
+        if self.ctx.record.record():
+            self.ctx.record.write(
+                opCode=OpCodes.AGENT_MOVE_MANY,
+                data={"agent_names": names, "node_ids": targets.tolist()},
+            )
+        if self._arrays is not None:
+            self._arrays.prev_node[rows] = self._arrays.current_node[rows]
+            self._arrays.current_node[rows] = targets
+            for name in names:
+                self._track(self.agents[name])
+        else:
+            for name, node_id in zip(names, targets.tolist()):
+                agent = cast(Agent, self.agents[name])
+                agent._prev_node_id = agent._current_node_id
+                agent._current_node_id = node_id
+                self._track(agent)
 
     def create_iter(self):
         return self.agents.values()
+
+    def step_all(self, agents: Optional[Iterable[str]] = None) -> None:
+        if agents is None:
+            team = [agent for agent in self.agents.values() if agent.strategy is not None]
+        else:
+            team = [self.get_agent(name) for name in agents]
+            for agent in team:
+                if agent.strategy is None:
+                    raise AttributeError(f"Strategy of agent {agent.name} is not set.")
+        states = self._sense_all(team)
+        self._think_all(team, states)
+        self._apply_all(team)
+
+    def _think_all(self, team: List[IAgent], states: List[Dict[str, Any]]) -> None:
+        """
+        Run the strategy of every agent of ``team`` on its state.
+
+        The strategies run on the compute engine when the context has one,
+        and all of them have finished when this returns.
+        """
+        ictx = self.ctx.ictx
+        compute = ictx.compute if ictx is not None else None
+        strategies = [cast(Callable[[Dict[str, Any]], None], agent.strategy) for agent in team]
+        times: Dict[str, float] = {}
+        errors: Dict[str, BaseException] = {}
+        if compute is None:
+            for agent, strategy, state in zip(team, strategies, states):
+                try:
+                    _, times[agent.name] = _run_strategy(strategy, state)
+                except Exception as e:
+                    errors[agent.name] = e
+        else:
+            tasks = [Task(_run_strategy, strategy, state) for strategy, state in zip(strategies, states)]
+            for task in tasks:
+                compute.submit(task)
+            # Barrier, no action is applied before every strategy is done
+            for agent, task, state in zip(team, tasks, states):
+                try:
+                    compute.wait(task)
+                except Exception as e:
+                    errors[agent.name] = e
+                    continue
+                result, times[agent.name] = task.result
+                if result is not state:
+                    # A worker process acted on a copy of the state
+                    state.clear()
+                    state.update(result)
+        self._strategy_times = times
+        if errors:
+            raise StrategyError(errors) from next(iter(errors.values()))
+
+    def _sense_all(self, team: List[IAgent]) -> List[Dict[str, Any]]:
+        """
+        Sense for every agent of ``team`` before any of them moves.
+
+        Sensors are grouped by class, so that a class providing a
+        ``sense_many`` kernel senses its whole group in one call.
+        """
+        groups: Dict[type, Tuple[List[ISensor], List[int]]] = {}
+        for agent in team:
+            if not isinstance(agent, (Agent, AerialAgent)) or not agent._sensor_list:
+                continue
+            node_id = agent._sensing_node()
+            for sensor in agent._sensor_list.values():
+                sensors, node_ids = groups.setdefault(type(sensor), ([], []))
+                sensors.append(sensor)
+                node_ids.append(node_id)
+        for cls, (sensors, node_ids) in groups.items():
+            sense_many = getattr(cls, 'sense_many', None)
+            if sense_many is not None:
+                sense_many(sensors, node_ids)
+            else:
+                for sensor, node_id in zip(sensors, node_ids):
+                    sensor.sense(node_id)
+        return [
+            agent._collect_state() if isinstance(agent, (Agent, AerialAgent)) else agent.get_state()
+            for agent in team
+        ]
+
+    def _apply_all(self, team: List[IAgent]) -> None:
+        """Validate the actions of the whole team, then commit them all."""
+        moves: List[Tuple[int, int]] = []
+        for agent in team:
+            if isinstance(agent, Agent):
+                moves.append((agent._current_node_id, agent._action_target()))
+            elif isinstance(agent, AerialAgent):
+                agent._check_action()
+        self._check_moves(moves)
+        for agent in team:
+            if isinstance(agent, (Agent, AerialAgent)):
+                agent._apply_action()
+            else:
+                agent.set_state()
+
+    def query_agents(self, x: float, y: float, r: float) -> Iterator[Tuple[IAgent, Tuple[float, float, float]]]:
+        r_sq = r * r
+        for name in self._agent_hash.query(x, y, r):
+            pos = self._positions[name]
+            if (pos[0] - x)**2 + (pos[1] - y)**2 <= r_sq:
+                yield self.agents[name], pos
     
     def create_agent(self, name: str, **kwargs: Dict[str, Any]) -> IAgent:
         if self.ctx.record.record():
@@ -475,15 +1012,21 @@ def create_agent(self, name: str, **kwargs: Dict[str, Any]) -> IAgent:
         start_node_id = cast(int, kwargs.pop('start_node_id'))
         sensors = kwargs.pop('sensors', [])
         agent_type = kwargs.pop('type', AgentType.BASIC)
+        if name in self.agents:
+            raise ValueError(f"Agent {name} already exists.")
         if agent_type == AgentType.AERIAL:
             speed = cast(float, kwargs.pop('speed'))
-            agent = AerialAgent(self.ctx, name, start_node_id, speed)
+            if self._arrays is not None:
+                agent = ArrayAerialAgent(self.ctx, name, start_node_id, speed, self._arrays)
+            else:
+                agent = AerialAgent(self.ctx, name, start_node_id, speed)
+        elif self._arrays is not None:
+            agent = ArrayAgent(self.ctx, name, start_node_id, self._arrays, **kwargs)
         else:
             agent = Agent(self.ctx, name, start_node_id, **kwargs)
 
-        if name in self.agents:
-            raise ValueError(f"Agent {name} already exists.")
         self.agents[name] = agent
+        self._track(agent)
 
         for sensor in sensors:
             try:
@@ -506,6 +1049,10 @@ def delete_agent(self, name: str) -> None:
         if name not in self.agents:
             self.ctx.logger.warning(f"Deleting non-existent agent {name}")
         self.agents.pop(name, None)
+        self._untrack(name)
+        self._vacate(name)
+        if self._arrays is not None and name in self._arrays.rows:
+            self._arrays.release(name)
 
     def terminate(self):
         return
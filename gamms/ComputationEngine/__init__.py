@@ -1 +1 @@
-from .compute_egine import ComputeEngine, Task, TaskStatus
\ No newline at end of file
+from .compute_egine import ComputeEngine, Engine, Task, TaskStatus
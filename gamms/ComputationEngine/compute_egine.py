@@ -1,10 +1,14 @@
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from threading import Lock
 import enum
-from typing import Optional, Dict
+from typing import Any, Optional, Dict
 from gamms.typing import IComputeEngine, ITask, IInternalContext
 import uuid
 
+class Engine(enum.IntEnum):
+    THREAD = 0
+    PROCESS = 1
+
 class TaskStatus(enum.Enum):
     PENDING = 0
     RUNNING = 1
@@ -19,19 +23,24 @@ def __init__(self, func, *args, **kwargs) -> None:
         self._id = uuid.uuid1().hex
         self._status: TaskStatus = TaskStatus.PENDING
         self._exception = None
+        self._result = None
         self._lock = Lock()
     
     @property
     def id(self):
         return self._id
 
+    @property
+    def result(self) -> Any:
+        return self._result
+
     def run(self):
         with self._lock:
             if self._status != TaskStatus.PENDING:
                 raise ValueError("Task already started or completed")
             self._status = TaskStatus.RUNNING
         try:
-            self.func(*self.args, **self.kwargs)
+            self._result = self.func(*self.args, **self.kwargs)
             self._status = TaskStatus.COMPLETED
         except Exception as e:
             self._status = TaskStatus.FAILED
@@ -53,10 +62,9 @@ def submit(self, task: Task):
     def wait(self, task: Task):
         if task.id not in self._tasks:
             raise ValueError("Task not found")
-        self._tasks[task.id].result()
+        self._tasks.pop(task.id).result()
         if task.status == TaskStatus.FAILED:
             raise task._exception
-        del self._tasks[task.id]
         
     def shutdown(self):
         self.executor.shutdown()
@@ -64,11 +72,61 @@ def shutdown(self):
             raise ValueError("Some tasks are still running. This should not happen")
 
 
+class ProcessTaskLoop:
+    """
+    Runs tasks in worker processes.
+
+    The function and arguments of a task are pickled to the worker, so they
+    must be module level functions and picklable values. The task object
+    itself stays in this process and is updated when it is waited on.
+    """
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._tasks: Dict[str, Future] = {}
+
+    def submit(self, task: Task):
+        with task._lock:
+            if task._status != TaskStatus.PENDING:
+                raise ValueError("Task already started or completed")
+            task._status = TaskStatus.RUNNING
+        future = self.executor.submit(task.func, *task.args, **task.kwargs)
+        self._tasks[task.id] = future
+
+    def wait(self, task: Task):
+        if task.id not in self._tasks:
+            raise ValueError("Task not found")
+        future = self._tasks.pop(task.id)
+        try:
+            task._result = future.result()
+            task._status = TaskStatus.COMPLETED
+        except Exception as e:
+            task._status = TaskStatus.FAILED
+            task._exception = e
+            raise
+
+    def shutdown(self):
+        self.executor.shutdown()
+        if len(self._tasks) > 0:
+            raise ValueError("Some tasks are still running. This should not happen")
+
+
 class ComputeEngine(IComputeEngine):
-    def __init__(self, ctx: Optional[IInternalContext] = None,engine_kwargs: Optional[Dict[str, int]] = None, **kwargs) -> None:
+    def __init__(
+        self,
+        ctx: Optional[IInternalContext] = None,
+        engine_kwargs: Optional[Dict[str, int]] = None,
+        engine: Engine = Engine.THREAD,
+        **kwargs
+    ) -> None:
         if engine_kwargs is None:
             engine_kwargs = {}
-        self._engine = SimpleTaskLoop(**engine_kwargs)
+        if engine == Engine.THREAD:
+            self._engine = SimpleTaskLoop(**engine_kwargs)
+        elif engine == Engine.PROCESS:
+            self._engine = ProcessTaskLoop(**engine_kwargs)
+        else:
+            raise NotImplementedError(f"Compute engine {engine} not implemented")
+        self.engine = engine
         self.ctx = ctx
     
     def submit(self, task: Task) -> None:
@@ -80,7 +138,7 @@ def wait(self, task: Task) -> None:
     def terminate(self):
         self._engine.shutdown()
 
-__all__ = ["ComputeEngine", "Task", "TaskStatus"]
+__all__ = ["ComputeEngine", "Engine", "Task", "TaskStatus"]
 
 if __name__ == "__main__":
     import time
@@ -1,22 +1,30 @@
 import networkx as nx
-from typing import Dict, Any, Iterator, Mapping, Tuple, cast, Union, Set, overload
+from typing import Dict, Any, Iterator, List, Mapping, Optional, Tuple, cast, Union, Set, overload
 from enum import Enum
 from gamms.typing import Node, OSMEdge, IGraph, IGraphEngine, IContext, ObsFace
 from gamms.typing.graph_engine import Engine
 from gamms.typing.memory_engine import StoreType
 from gamms.MemoryEngine.memory_engine import MemoryStore, SqliteStore, PathLike
+from gamms.spatial import SpatialHash
 from shapely.geometry import LineString
 
 from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
 
+import cbor2
+import math
+import numpy as np
+import struct
 import tempfile
 
 _Node = dataclass()(Node)
 _OSMEdge = dataclass()(OSMEdge)
 _ObsFace = dataclass()(ObsFace)
 
+_CELL_SIZE = 10.0  # side of the uniform grid cells bucketing in-memory nodes
+
 class Graph(IGraph):
-    def __init__(self, store: MemoryStore):
+    def __init__(self, store: MemoryStore, cell_size: float = _CELL_SIZE):
         self.store = store
         self.store.create_map(
             "nodes",
@@ -29,6 +37,15 @@ def __init__(self, store: MemoryStore):
             schema={"id": int, "source": int, "target": int, "length": float, "linestring": LineString}
         )
         self._adjacency: Dict[int, Set[int]] = {}
+        # Spatial buckets so that distance queries only touch nearby nodes,
+        # plus the edges incident to every node to answer edge queries.
+        self._node_hash: SpatialHash[int] = SpatialHash(cell_size)
+        self._incident: Dict[int, Set[int]] = {}
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     def get_edge(self, edge_id: int) -> OSMEdge:
         return _OSMEdge(**self.store.get_data("edges", edge_id))
@@ -38,21 +55,38 @@ def get_edges(self) -> Iterator[int]: ...
     @overload
     def get_edges(self, d: float, x: float, y: float) -> Iterator[int]: ...
     def get_edges(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
-        return iter(self.store.query_keys("edges"))
+        if d < 0:
+            yield from self.store.query_keys("edges")
+            return
+        seen: Set[int] = set()
+        for node_id in self.get_nodes(d, x, y):
+            for edge_id in self._incident[node_id]:
+                if edge_id not in seen:
+                    seen.add(edge_id)
+                    yield edge_id
     
     def get_node(self, node_id: int) -> Node:
         return _Node(**self.store.get_data("nodes", node_id))
+
+    def has_node(self, node_id: int) -> bool:
+        return node_id in self._adjacency
     
     @overload
     def get_nodes(self) -> Iterator[int]: ...
     @overload
     def get_nodes(self, d: float, x: float, y: float) -> Iterator[int]: ...
     def get_nodes(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
-        return iter(self.store.query_keys("nodes"))
+        if d < 0:
+            yield from self.store.query_keys("nodes")
+            return
+        yield from self._node_hash.query(x, y, d)
 
     def add_node(self, node_data: Dict[str, Any]) -> None:
         self.store.insert_data("nodes", node_data)
         self._adjacency[node_data['id']] = set()
+        self._incident[node_data['id']] = set()
+        self._node_hash.update(node_data['id'], node_data['x'], node_data['y'])
+        self._version += 1
     
     def add_edge(self, edge_data: Dict[str, Any]) -> None:
         linestring = edge_data.get('linestring', None)
@@ -73,37 +107,50 @@ def add_edge(self, edge_data: Dict[str, Any]) -> None:
 
         self.store.insert_data("edges", edge_data)
         self._adjacency[edge_data['source']].add(edge_data['target'])
+        self._incident[edge_data['source']].add(edge_data['id'])
+        self._incident[edge_data['target']].add(edge_data['id'])
+        self._version += 1
 
     def update_node(self, node_data: Dict[str, Any]) -> None:
         self.store.update_data("nodes", node_data)
+        node = self.get_node(node_data['id'])
+        self._node_hash.update(node.id, node.x, node.y)
+        self._version += 1
     
     def update_edge(self, edge_data: Dict[str, Any]) -> None:
         existing_edge = self.get_edge(edge_data['id'])
         self._adjacency[existing_edge.source].discard(existing_edge.target)
+        self._incident[existing_edge.source].discard(existing_edge.id)
+        self._incident[existing_edge.target].discard(existing_edge.id)
         self.store.update_data("edges", edge_data)
-        self._adjacency[edge_data['source']].add(edge_data['target'])
+        edge = self.get_edge(existing_edge.id)
+        self._adjacency[edge.source].add(edge.target)
+        self._incident[edge.source].add(edge.id)
+        self._incident[edge.target].add(edge.id)
+        self._version += 1
 
     def remove_node(self, node_id: int) -> None:
         if node_id not in self._adjacency:
             return
         
-        edges_to_remove = []
-        for edge_id in self.get_edges():
-            edge = self.get_edge(edge_id)
-            if edge.source == node_id or edge.target == node_id:
-                edges_to_remove.append(edge_id)
-        for key in edges_to_remove:
-            self.store.delete_data("edges", key)
+        for edge_id in list(self._incident[node_id]):
+            self.remove_edge(edge_id)
         self.store.delete_data("nodes", node_id)
 
         del self._adjacency[node_id]
+        del self._incident[node_id]
+        self._node_hash.remove(node_id)
         for neighbors in self._adjacency.values():
             neighbors.discard(node_id)
+        self._version += 1
 
     def remove_edge(self, edge_id: int) -> None:
         edge = self.get_edge(edge_id)
         self._adjacency[edge.source].discard(edge.target)
+        self._incident[edge.source].discard(edge_id)
+        self._incident[edge.target].discard(edge_id)
         self.store.delete_data("edges", edge_id)
+        self._version += 1
     
     def attach_networkx_graph(self, G: nx.Graph) -> None:
         for node, data in G.nodes(data=True): # type: ignore
@@ -143,6 +190,23 @@ def attach_networkx_graph(self, G: nx.Graph) -> None:
             self.add_edge(edge_data)
     
 
+    def _reload(self) -> None:
+        """Rebuild the indexes from the store after it was restored, as a new version."""
+        self._adjacency = {}
+        self._incident = {}
+        self._node_hash.clear()
+        for node_id in self.store.query_keys("nodes"):
+            node = self.store.get_data("nodes", node_id)
+            self._adjacency[node_id] = set()
+            self._incident[node_id] = set()
+            self._node_hash.update(node_id, node['x'], node['y'])
+        for edge_id in self.store.query_keys("edges"):
+            edge = self.store.get_data("edges", edge_id)
+            self._adjacency[edge['source']].add(edge['target'])
+            self._incident[edge['source']].add(edge_id)
+            self._incident[edge['target']].add(edge_id)
+        self._version += 1
+
     def get_neighbors(self, node_id: int) -> Iterator[int]:
         if node_id not in self._adjacency:
             raise KeyError(f"Node {node_id} does not exist.")
@@ -172,7 +236,7 @@ def __init__(self, store: SqliteStore):
             schema={"id": int, "source": int, "target": int, "length": float, "linestring": LineString}
         )
 
-        self.store.connection().execute("CREATE INDEX IF NOT EXISTS idx_nodes_xy ON nodes (x, y)")
+        self.store.create_index("nodes", ("x", "y"))
         self.store.connection().executescript(
             """
             ALTER TABLE edges RENAME TO old_edges;
@@ -189,13 +253,25 @@ def __init__(self, store: SqliteStore):
             DROP TABLE old_edges;
             """
         )
-        self.store.connection().execute("CREATE INDEX IF NOT EXISTS idx_edges_source_target ON edges (source, target)")
+        # The edges table was recreated with foreign keys, its indexes come after
+        self.store.create_index("edges", ("source", "target"))
+        self.store.create_index("edges", "target")
+        self._version = 0
+        # Node ids, loaded on first use and then kept in step with add and remove
+        self._node_ids: Optional[Set[int]] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
     
     def add_node(self, node_data: Dict[str, Any]) -> None:
         """
         Adds a node to the graph.
         """
         self.store.insert_data("nodes", node_data)
+        if self._node_ids is not None:
+            self._node_ids.add(node_data['id'])
+        self._version += 1
 
     
     def add_edge(self, edge_data: Dict[str, Any]) -> None:
@@ -219,12 +295,29 @@ def add_edge(self, edge_data: Dict[str, Any]) -> None:
         edge_data['linestring'] = tuple(linestring.coords)
 
         self.store.insert_data("edges", edge_data)
+        self._version += 1
     
     def get_node(self, node_id: int) -> Node:
         """
         Retrieves a node by its ID.
         """
         return _Node(**self.store.get_data("nodes", node_id))
+
+    def _reload(self) -> None:
+        """Forget the cached node IDs after the store was restored, as a new version."""
+        self._node_ids = None
+        self._version += 1
+
+    def has_node(self, node_id: int) -> bool:
+        """
+        Checks whether a node exists against the cached set of node IDs.
+        """
+        if self._node_ids is None:
+            self.store.flush()
+            cursor = self.store.read_connection().cursor()
+            cursor.execute("SELECT id FROM nodes")
+            self._node_ids = {row[0] for row in cursor.fetchall()}
+        return node_id in self._node_ids
     
     @overload
     def get_edges(self) -> Iterator[int]: ...
@@ -235,12 +328,18 @@ def get_edges(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int
         Returns an iterator over all edge IDs in the graph.
         """
         self.store.flush()  # Ensure all pending changes are written to the database
-        cursor = self.store.connection().cursor()
+        cursor = self.store.read_connection().cursor()
         if d >= 0:
             x_min, x_max = x - d, x + d
             y_min, y_max = y - d, y + d
-            cursor.execute("SELECT edges.id FROM edges JOIN nodes AS u ON edges.source = u.id JOIN nodes AS v ON edges.target = v.id WHERE (u.x BETWEEN ? AND ? AND u.y BETWEEN ? AND ?) OR (v.x BETWEEN ? AND ? AND v.y BETWEEN ? AND ?)",
-                           (x_min, x_max, y_min, y_max, x_min, x_max, y_min, y_max))
+            # Resolve the box through the (x, y) index of nodes first, then follow the endpoint indexes
+            cursor.execute(
+                """WITH inside AS (SELECT id FROM nodes WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ?)
+                SELECT id FROM edges WHERE source IN inside
+                UNION
+                SELECT id FROM edges WHERE target IN inside""",
+                (x_min, x_max, y_min, y_max),
+            )
         else:
             cursor.execute("SELECT id FROM edges")
         while True:
@@ -263,23 +362,17 @@ def get_nodes(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int
         """
         Returns an iterator over all node IDs in the graph.
         """
-        self.store.flush()
-        cursor = self.store.cursor()
         if d >= 0:
-            cursor.execute("SELECT id FROM nodes WHERE x BETWEEN ? AND ? AND y BETWEEN ? AND ?", (x - d, x + d, y - d, y + d))
+            yield from self.store.query_range("nodes", {"x": (x - d, x + d), "y": (y - d, y + d)})
         else:
-            cursor.execute("SELECT id FROM nodes")
-        while True:
-            row = cursor.fetchone()
-            if row is None:
-                break
-            yield row[0]
+            yield from self.store.query_keys("nodes")
     
     def update_node(self, node_data: Dict[str, Any]) -> None:
         """
         Updates a node in the graph.
         """
         self.store.update_data("nodes", node_data)
+        self._version += 1
     
     def update_edge(self, edge_data: Dict[str, Any]) -> None:
         """
@@ -289,6 +382,7 @@ def update_edge(self, edge_data: Dict[str, Any]) -> None:
         if linestring is not None:
             edge_data['linestring'] = tuple(LineString(linestring).coords)
         self.store.update_data("edges", edge_data)
+        self._version += 1
     
     def remove_node(self, node_id: int) -> None:
         """
@@ -297,7 +391,10 @@ def remove_node(self, node_id: int) -> None:
         try:
             self.store.delete_data("nodes", node_id)
         except KeyError:
-            pass  # Node does not exist, ignore
+            return  # Node does not exist, ignore
+        if self._node_ids is not None:
+            self._node_ids.discard(node_id)
+        self._version += 1
 
     def remove_edge(self, edge_id: int) -> None:
         """
@@ -306,17 +403,56 @@ def remove_edge(self, edge_id: int) -> None:
         try:
             self.store.delete_data("edges", edge_id)
         except KeyError:
-            pass  # Edge does not exist, ignore
+            return  # Edge does not exist, ignore
+        self._version += 1
 
-    
-    attach_networkx_graph = Graph.attach_networkx_graph
+
+    def attach_networkx_graph(self, G: nx.Graph) -> None:
+        """
+        Bulk loads the nodes and edges of ``G`` in a single transaction.
+        """
+        nodes: Dict[int, Dict[str, Any]] = {}
+        for node, data in G.nodes(data=True): # type: ignore
+            node = cast(int, node)
+            data = cast(Dict[str, Any], data)
+            nodes[node] = {'id': node, 'x': data.get('x', 0.0), 'y': data.get('y', 0.0)}
+
+        edges = []
+        for u, v, data in G.edges(data=True): # type: ignore
+            u = cast(int, u)
+            v = cast(int, v)
+            data = cast(Dict[str, Any], data)
+            linestring = data.get('linestring', None)
+            if linestring is None:
+                linestring = LineString([(nodes[u]['x'], nodes[u]['y']), (nodes[v]['x'], nodes[v]['y'])])
+            elif not isinstance(linestring, LineString):
+                try:
+                    linestring = LineString(linestring)
+                except Exception as e:
+                    raise ValueError(f"Invalid linestring data: {linestring}") from e
+            if linestring.is_empty:
+                raise ValueError(f"Invalid linestring: {linestring}")
+            edges.append({
+                'id': data.get('id', -1),
+                'source': u,
+                'target': v,
+                'length': data.get('length', 0.0),
+                'linestring': tuple(linestring.coords),
+            })
+
+        with self.store.transaction():
+            self.store.insert_many("nodes", nodes.values())
+            self.store.insert_many("edges", edges)
+        if self._node_ids is not None:
+            self._node_ids.update(nodes)
+        self._version += 1
             
     def get_neighbors(self, node_id: int) -> Iterator[int]:
         """
         Returns an iterator over the neighbors of a given node.
         """
         _ = self.get_node(node_id)
-        cursor = self.store.connection().cursor()
+        cursor = self.store.read_connection().cursor()
         cursor.execute("SELECT target FROM edges WHERE source = ?", (node_id,))
         while True:
             row = cursor.fetchone()
@@ -324,30 +460,259 @@ def get_neighbors(self, node_id: int) -> Iterator[int]:
                 break
             yield row[0]
 
+_SHARED_MAGIC = b"GAMMSSG1"
+_SHARED_ALIGN = 64
+_SHARED_HEADER = struct.Struct("<8sQ")
+_SHARED_PUBLISHED: Set[str] = set()  # segments published by this process, tracked as their owner
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        pass
+    # Before Python 3.13 attaching registers the segment with the resource
+    # tracker, which would unlink it when this process exits. The publisher
+    # owns the segment, so drop the registration again, unless this process
+    # is the publisher and the registration is its own.
+    shm = shared_memory.SharedMemory(name=name)
+    if shm.name not in _SHARED_PUBLISHED:
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def publish_graph(engine: IGraphEngine, name: Optional[str] = None) -> shared_memory.SharedMemory:
+    """
+    Copy the graph and obstacle faces of ``engine`` into one shared memory segment.
+
+    The segment starts with a small CBOR manifest locating each array. Node
+    and edge arrays are sorted by id; CSR offsets give the out-neighbours and
+    incident edges of every node. The caller owns the returned segment and
+    must ``close`` and ``unlink`` it once no process needs the graph.
+    """
+    graph = engine.graph
+    nodes = sorted(graph.get_nodes())
+    node_xy = np.array([(graph.get_node(nid).x, graph.get_node(nid).y) for nid in nodes], dtype=np.float64)
+    node_ids = np.array(nodes, dtype=np.int64)
+    index = {nid: i for i, nid in enumerate(nodes)}
+
+    edges = [graph.get_edge(eid) for eid in sorted(graph.get_edges())]
+    coords = [np.asarray(edge.linestring.coords, dtype=np.float64)[:, :2] for edge in edges]
+    coord_offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in coords], out=coord_offsets[1:])
+    neighbors: List[Set[int]] = [set() for _ in nodes]
+    incident: List[List[int]] = [[] for _ in nodes]
+    for i, edge in enumerate(edges):
+        neighbors[index[edge.source]].add(edge.target)
+        incident[index[edge.source]].append(i)
+        if edge.target != edge.source:
+            incident[index[edge.target]].append(i)
+
+    def csr(groups: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+        np.cumsum([len(group) for group in groups], out=offsets[1:])
+        values = np.fromiter((v for group in groups for v in sorted(group)), dtype=np.int64, count=int(offsets[-1]))
+        return offsets, values
+
+    out_offsets, out_targets = csr(neighbors)
+    inc_offsets, inc_edges = csr(incident)
+    faces = [engine.get_obstacle_face(fid) for fid in sorted(engine.get_obstacle_faces())]
+    x_order = np.argsort(node_xy[:, 0], kind="stable")
+
+    arrays: Dict[str, np.ndarray] = {
+        "node_ids": node_ids,
+        "node_xy": node_xy.reshape(-1, 2),
+        "node_by_x": x_order.astype(np.int64),
+        "node_x_sorted": node_xy.reshape(-1, 2)[x_order, 0],
+        "out_offsets": out_offsets,
+        "out_targets": out_targets,
+        "inc_offsets": inc_offsets,
+        "inc_edges": inc_edges,
+        "edge_ids": np.array([edge.id for edge in edges], dtype=np.int64),
+        "edge_source": np.array([edge.source for edge in edges], dtype=np.int64),
+        "edge_target": np.array([edge.target for edge in edges], dtype=np.int64),
+        "edge_length": np.array([edge.length for edge in edges], dtype=np.float64),
+        "edge_coord_offsets": coord_offsets,
+        "edge_coords": np.concatenate(coords) if coords else np.zeros((0, 2), dtype=np.float64),
+        "face_ids": np.array([face.id for face in faces], dtype=np.int64),
+        "face_corners": np.array(
+            [face.tr + face.br + face.tl + face.bl for face in faces], dtype=np.float64
+        ).reshape(-1, 4, 3),
+        "face_types": np.array([face.type for face in faces], dtype=np.int64),
+    }
+
+    manifest: Dict[str, Any] = {}
+    offset = 0
+    for key, array in arrays.items():
+        manifest[key] = [offset, array.dtype.str, list(array.shape)]
+        offset += array.nbytes + (-array.nbytes % _SHARED_ALIGN)
+    encoded = cbor2.dumps(manifest)
+    base = _SHARED_HEADER.size + len(encoded)
+    base += -base % _SHARED_ALIGN
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(base + offset, 1))
+    _SHARED_PUBLISHED.add(shm.name)
+    _SHARED_HEADER.pack_into(shm.buf, 0, _SHARED_MAGIC, len(encoded))
+    shm.buf[_SHARED_HEADER.size:_SHARED_HEADER.size + len(encoded)] = encoded
+    for key, array in arrays.items():
+        start = base + manifest[key][0]
+        shm.buf[start:start + array.nbytes] = np.ascontiguousarray(array).tobytes()
+    return shm
+
+
+class SharedGraph(IGraph):
+    def __init__(self, name: str):
+        """
+        Read-only graph viewing the arrays ``publish_graph`` wrote to the shared memory segment ``name``.
+
+        Every process attaching to the segment reads the same physical
+        memory, so attaching costs no copy of the graph. Lookups by id
+        bisect the sorted id arrays and box queries bisect the x-sorted
+        nodes, so no per-process index is built either.
+        """
+        self._shm = _attach_shared_memory(name)
+        magic, size = _SHARED_HEADER.unpack_from(self._shm.buf, 0)
+        if magic != _SHARED_MAGIC:
+            self._shm.close()
+            raise ValueError(f"Shared memory segment {name!r} does not hold a published graph.")
+        manifest = cbor2.loads(bytes(self._shm.buf[_SHARED_HEADER.size:_SHARED_HEADER.size + size]))
+        base = _SHARED_HEADER.size + size
+        base += -base % _SHARED_ALIGN
+        arrays: Dict[str, np.ndarray] = {}
+        for key, (offset, dtype, shape) in manifest.items():
+            array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=self._shm.buf, offset=base + offset)
+            array.flags.writeable = False
+            arrays[key] = array
+        self._arrays = arrays
+
+    @property
+    def version(self) -> int:
+        return 0
+
+    def _node_index(self, node_id: int) -> int:
+        node_ids = self._arrays["node_ids"]
+        i = int(np.searchsorted(node_ids, node_id))
+        if i == len(node_ids) or node_ids[i] != node_id:
+            raise KeyError(f"Node {node_id} does not exist.")
+        return i
+
+    def _box_nodes(self, d: float, x: float, y: float) -> np.ndarray:
+        x_sorted = self._arrays["node_x_sorted"]
+        lo = np.searchsorted(x_sorted, x - d, side="left")
+        hi = np.searchsorted(x_sorted, x + d, side="right")
+        candidates = self._arrays["node_by_x"][lo:hi]
+        return candidates[np.abs(self._arrays["node_xy"][candidates, 1] - y) <= d]
+
+    def has_node(self, node_id: int) -> bool:
+        node_ids = self._arrays["node_ids"]
+        i = int(np.searchsorted(node_ids, node_id))
+        return i < len(node_ids) and node_ids[i] == node_id
+
+    def get_node(self, node_id: int) -> Node:
+        i = self._node_index(node_id)
+        x, y = self._arrays["node_xy"][i].tolist()
+        return _Node(id=int(node_id), x=x, y=y)
+
+    @overload
+    def get_nodes(self) -> Iterator[int]: ...
+    @overload
+    def get_nodes(self, d: float, x: float, y: float) -> Iterator[int]: ...
+    def get_nodes(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
+        if d < 0:
+            return iter(self._arrays["node_ids"].tolist())
+        return iter(self._arrays["node_ids"][self._box_nodes(d, x, y)].tolist())
+
+    def get_edge(self, edge_id: int) -> OSMEdge:
+        edge_ids = self._arrays["edge_ids"]
+        i = int(np.searchsorted(edge_ids, edge_id))
+        if i == len(edge_ids) or edge_ids[i] != edge_id:
+            raise KeyError(f"Edge {edge_id} does not exist.")
+        start, stop = self._arrays["edge_coord_offsets"][i:i + 2].tolist()
+        return _OSMEdge(
+            id=int(edge_id),
+            source=int(self._arrays["edge_source"][i]),
+            target=int(self._arrays["edge_target"][i]),
+            length=float(self._arrays["edge_length"][i]),
+            linestring=LineString(self._arrays["edge_coords"][start:stop]),
+        )
+
+    @overload
+    def get_edges(self) -> Iterator[int]: ...
+    @overload
+    def get_edges(self, d: float, x: float, y: float) -> Iterator[int]: ...
+    def get_edges(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
+        if d < 0:
+            return iter(self._arrays["edge_ids"].tolist())
+        offsets = self._arrays["inc_offsets"]
+        inc_edges = self._arrays["inc_edges"]
+        nodes = self._box_nodes(d, x, y)
+        if len(nodes) == 0:
+            return iter(())
+        edges = np.unique(np.concatenate([inc_edges[offsets[i]:offsets[i + 1]] for i in nodes.tolist()]))
+        return iter(self._arrays["edge_ids"][edges].tolist())
+
+    def get_neighbors(self, node_id: int) -> Iterator[int]:
+        i = self._node_index(node_id)
+        offsets = self._arrays["out_offsets"]
+        return iter(self._arrays["out_targets"][offsets[i]:offsets[i + 1]].tolist())
+
+    def get_obstacle_face(self, face_id: int) -> ObsFace:
+        face_ids = self._arrays["face_ids"]
+        i = int(np.searchsorted(face_ids, face_id))
+        if i == len(face_ids) or face_ids[i] != face_id:
+            raise KeyError(f"Obstacle face with ID {face_id} does not exist.")
+        tr, br, tl, bl = (tuple(corner) for corner in self._arrays["face_corners"][i].tolist())
+        return _ObsFace(id=int(face_id), tr=tr, br=br, tl=tl, bl=bl, type=int(self._arrays["face_types"][i]))
+
+    def get_obstacle_faces(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
+        face_ids = self._arrays["face_ids"]
+        if d < 0:
+            return iter(face_ids.tolist())
+        corners = self._arrays["face_corners"]
+        low = corners[:, :, :2].min(axis=1)
+        high = corners[:, :, :2].max(axis=1)
+        inside = (
+            (high[:, 0] >= x - d) & (low[:, 0] <= x + d)
+            & (high[:, 1] >= y - d) & (low[:, 1] <= y + d)
+        )
+        return iter(face_ids[inside].tolist())
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> None:
+        raise RuntimeError("Shared graphs are read-only.")
+
+    add_node = add_edge = update_node = update_edge = remove_node = remove_edge = _read_only
+
+    def close(self) -> None:
+        self._arrays = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            # Arrays handed out still view the segment; it is released with them
+            pass
+
+
 class GraphEngine(IGraphEngine):
-    def __init__(self, ctx: IContext, engine: Enum = Engine.SQLITE):
-        if engine == Engine.MEMORY:
+    def __init__(self, ctx: IContext, engine: Enum = Engine.SQLITE, shared_name: Optional[str] = None):
+        self._published: Optional[shared_memory.SharedMemory] = None
+        if engine == Engine.SHARED:
+            if shared_name is None:
+                raise ValueError("The shared graph engine needs the shared_name of a published graph.")
+            self._store = None
+            self._graph = SharedGraph(shared_name)
+        elif engine == Engine.MEMORY:
             self._store = ctx.ictx.memory.create_store(StoreType.MEMORY, name="graph_store")
             self._store = cast(MemoryStore, self._store)
             self._graph = Graph(self._store)
-            self._store.create_map(
-                "obstacle_face",
-                primary_key="id",
-                schema={
-                    "id": int,
-                    "trx": float, "try": float, "trz": float,
-                    "brx": float, "bry": float, "brz": float,
-                    "tlx": float, "tly": float, "tlz": float,
-                    "blx": float, "bly": float, "blz": float,
-                    "type": int
-                }
-            )
         elif engine == Engine.SQLITE:
             self._dbdir = tempfile.TemporaryDirectory(dir=".")
             path = PathLike(f"{self._dbdir.name}/graph.db")
             self._store = ctx.ictx.memory.create_store(StoreType.DATABASE, name="graph_store", path=path)
             self._store = cast(SqliteStore, self._store)
             self._graph = SqliteGraph(self._store)
+        else:
+            raise ValueError(f"Unsupported engine type: {engine}")
+        if self._store is not None:
+            # Faces keep their bounding box, so box queries are plain range queries on the index
             self._store.create_map(
                 "obstacle_face",
                 primary_key="id",
@@ -357,19 +722,55 @@ def __init__(self, ctx: IContext, engine: Enum = Engine.SQLITE):
                     "brx": float, "bry": float, "brz": float,
                     "tlx": float, "tly": float, "tlz": float,
                     "blx": float, "bly": float, "blz": float,
+                    "minx": float, "maxx": float, "miny": float, "maxy": float,
                     "type": int
                 }
             )
-            self._store.connection().execute(
-                "CREATE INDEX IF NOT EXISTS idx_obstacle_face ON obstacle_face (trx, try, brx, bry, tlx, tly, blx, bly)"
-            )
-        else:
-            raise ValueError(f"Unsupported engine type: {engine}")
+            self._store.create_index("obstacle_face", ("minx", "miny"))
         self.ctx = ctx
+        self._obstacle_version = 0
+        # Unit headings by (source, target), valid for the graph version they were computed at
+        self._headings: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        self._headings_version = self._graph.version
     
     @property
     def graph(self) -> IGraph:
         return self._graph
+
+    def snapshot(self) -> Any:
+        if self._store is None:
+            raise RuntimeError("Shared graphs are read-only.")
+        return self._store.snapshot()
+
+    def restore(self, snapshot: Any) -> None:
+        if self._store is None:
+            raise RuntimeError("Shared graphs are read-only.")
+        self._store.restore(snapshot)
+        cast(Union[Graph, SqliteGraph], self._graph)._reload()
+        self._obstacle_version += 1
+
+    def get_heading(self, source_id: int, target_id: int) -> Tuple[float, float]:
+        if self._headings_version != self._graph.version:
+            self._headings.clear()
+            self._headings_version = self._graph.version
+        key = (source_id, target_id)
+        heading = self._headings.get(key)
+        if heading is None:
+            source = self._graph.get_node(source_id)
+            target = self._graph.get_node(target_id)
+            delta_x = target.x - source.x
+            delta_y = target.y - source.y
+            distance = math.sqrt(delta_x**2 + delta_y**2)
+            if distance == 0:
+                heading = (0.0, 0.0)
+            else:
+                heading = (delta_x / distance, delta_y / distance)
+            self._headings[key] = heading
+        return heading
+
+    @property
+    def obstacle_version(self) -> int:
+        return self._obstacle_version
     
     def add_obstacle_face(
         self,
@@ -380,6 +781,8 @@ def add_obstacle_face(
         bl: Tuple[float, float, float],
         type: int
     ) -> None:
+        if self._store is None:
+            raise RuntimeError("Shared graphs are read-only.")
         try:
             self._store.insert_data("obstacle_face", {
                 "id": face_id,
@@ -387,8 +790,11 @@ def add_obstacle_face(
                 "brx": br[0], "bry": br[1], "brz": br[2],
                 "tlx": tl[0], "tly": tl[1], "tlz": tl[2],
                 "blx": bl[0], "bly": bl[1], "blz": bl[2],
+                "minx": min(tr[0], br[0], tl[0], bl[0]), "maxx": max(tr[0], br[0], tl[0], bl[0]),
+                "miny": min(tr[1], br[1], tl[1], bl[1]), "maxy": max(tr[1], br[1], tl[1], bl[1]),
                 "type": type
             })
+            self._obstacle_version += 1
         except ValueError as e:
             raise ValueError(f"Failed to add obstacle face with ID {face_id}: {e}") from e
         except KeyError:
@@ -397,9 +803,14 @@ def add_obstacle_face(
             raise ValueError(f"Unexpected error occurred while adding obstacle face with ID {face_id}.") from e
 
     def remove_obstacle_face(self, face_id: int) -> None:
+        if self._store is None:
+            raise RuntimeError("Shared graphs are read-only.")
         self._store.delete_data("obstacle_face", face_id)
+        self._obstacle_version += 1
     
     def get_obstacle_face(self, face_id: int) -> ObsFace:
+        if self._store is None:
+            return cast(SharedGraph, self._graph).get_obstacle_face(face_id)
         ret = self._store.get_data("obstacle_face", face_id)
         ret = {
             'id': ret['id'],
@@ -412,39 +823,16 @@ def get_obstacle_face(self, face_id: int) -> ObsFace:
         return _ObsFace(**ret)
 
     def get_obstacle_faces(self, d: float = -1.0, x: float = 0, y: float = 0) -> Iterator[int]:
-        if self._store.type == StoreType.MEMORY:
-            for key in self._store.query_keys("obstacle_face"):
-                if d >= 0:
-                    data = self._store.get_data("obstacle_face", key)
-                    if not (max(data['trx'], data['tlx'], data['brx'], data['blx']) >= x - d and
-                            min(data['trx'], data['tlx'], data['brx'], data['blx']) <= x + d and
-                            max(data['try'], data['tly'], data['bry'], data['bly']) >= y - d and
-                            min(data['try'], data['tly'], data['bry'], data['bly']) <= y + d):
-                        continue
-                yield key
-        elif self._store.type == StoreType.DATABASE:
-            cursor = self._store.connection().cursor()
-            if d >= 0:
-                cursor.execute(
-                    """SELECT id FROM obstacle_face WHERE (
-                        MAX(tlx, trx, blx, brx) >= ?
-                        AND MIN(tlx, trx, blx, brx) <= ?
-                        AND MAX(tly, try, bly, bry) >= ?
-                        AND MIN(tly, try, bly, bry) <= ?
-                    )""",
-                    (x - d, x + d, y - d, y + d)
-                )
-            else:
-                cursor.execute("SELECT id FROM obstacle_face")
-            while True:
-                row = cursor.fetchone()
-                if row is None:
-                    break
-                yield row[0]
-        else:
-            raise ValueError(f"Unsupported store type: {self._store.type}")
+        if self._store is None:
+            return cast(SharedGraph, self._graph).get_obstacle_faces(d, x, y)
+        if d < 0:
+            return self._store.query_keys("obstacle_face")
+        # A face's bounding box overlaps the square of half-width d around (x, y)
+        return self._store.query_range("obstacle_face", {
+            "minx": (None, x + d), "maxx": (x - d, None),
+            "miny": (None, y + d), "maxy": (y - d, None),
+        })
 
-    
     def attach_networkx_graph(self, G: nx.Graph) -> IGraph:
         """
         Attaches a NetworkX graph to the Graph object.
@@ -461,9 +849,30 @@ def load(self, path: str) -> IGraph:
         """
         self._graph.load(path)
         return self.graph
-    
+
+    def publish(self, name: Optional[str] = None) -> str:
+        """
+        Publishes the graph and obstacle faces to shared memory for other processes.
+
+        Pass the returned name as ``shared_name`` to a GraphEngine created
+        with ``Engine.SHARED`` to view the graph without copying it. The
+        segment reflects the graph at the time of the call and is removed
+        when this engine terminates.
+        """
+        if self._published is not None:
+            self._published.close()
+            self._published.unlink()
+        self._published = publish_graph(self, name)
+        return self._published.name
+
     def terminate(self):
-        if self._store.type == StoreType.DATABASE:
+        if self._published is not None:
+            self._published.close()
+            self._published.unlink()
+            self._published = None
+        if self._store is None:
+            cast(SharedGraph, self._graph).close()
+        elif self._store.type == StoreType.DATABASE:
             self._dbdir.cleanup()
         try:
             del self._graph
@@ -1,3 +1,3 @@
-from gamms.MemoryEngine.memory_engine import MemoryEngine, MemoryStore, SqliteStore, PathLike
+from gamms.MemoryEngine.memory_engine import MemoryEngine, MemoryStore, SqliteStore, FileStore, PathLike
 
-__all__ = ["MemoryEngine", "MemoryStore", "SqliteStore", "PathLike"]
+__all__ = ["MemoryEngine", "MemoryStore", "SqliteStore", "FileStore", "PathLike"]
@@ -0,0 +1,730 @@
+"""Append-only log store memory-mapping a single segment file."""
+
+import contextlib
+import importlib
+import itertools
+import mmap
+import os
+import struct
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Type, Union
+
+import cbor2
+import numpy as np
+
+from gamms.MemoryEngine.store import (
+    _COORD_HEADER,
+    _COORD_TYPES,
+    _EXPORT_BATCH_SIZE,
+    PathLike,
+    _MemoryIndex,
+    _batch_arrays,
+    _check_ranges,
+    _encode_coords,
+    _in_ranges,
+    _index_fields,
+    _plan_query,
+    _validate_struct,
+    _write_npz,
+)
+from gamms.MemoryEngine.stats import _InstrumentedStore
+from gamms.typing.memory_engine import Eviction, IPathLike, StoreType
+
+
+_MAGIC = b"GAMMSLG1"
+# crc32, payload length, op, map id; the crc covers everything after itself
+_HEADER = struct.Struct("<IIII")
+_ALIGN = 8
+_MIN_CAPACITY = 1 << 20
+_NULL = 0xFFFFFFFF
+
+# Record ops
+_OP_CREATE = 1
+_OP_DROP = 2
+_OP_PUT = 3
+_OP_DELETE = 4
+_OP_LINK = 5  # points a key back at an earlier PUT, written when a nested transaction rolls back
+_OP_BEGIN = 6
+_OP_COMMIT = 7
+_OP_ABORT = 8
+
+_FIXED_CODES = {int: "q", float: "d", bool: "?"}
+_VAR_SLOT = struct.Struct("<II")
+
+
+def _pad(size: int) -> int:
+    return -size % _ALIGN
+
+
+def _type_name(field_type: Type) -> str:
+    return f"{field_type.__module__}:{field_type.__qualname__}"
+
+
+def _resolve_type(name: str) -> Type:
+    module, _, qualname = name.partition(":")
+    obj: Any = importlib.import_module(module)
+    for part in qualname.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+class _RowLayout:
+    """
+    Fixed binary layout of one map's rows.
+
+    int, float and bool fields are stored inline; every other field takes an
+    (offset, length) slot pointing at its bytes after the fixed part. Variable
+    data is 8-byte aligned so packed coordinates can be viewed in place.
+    """
+
+    def __init__(self, schema: Dict[str, Type], primary_key: str):
+        self.schema = schema
+        self.pk = primary_key
+        self.fields = tuple(schema)
+        self.index = {field: i for i, field in enumerate(self.fields)}
+        self.types = tuple(schema[field] for field in self.fields)
+        self.pk_index = self.index[primary_key]
+        slots: List[Tuple[int, struct.Struct, bool]] = []
+        offset = 0
+        for field_type in self.types:
+            code = _FIXED_CODES.get(field_type)
+            packer = _VAR_SLOT if code is None else struct.Struct("<" + code)
+            slots.append((offset, packer, code is None))
+            offset += packer.size
+        self.slots = tuple(slots)
+        self.fixed_size = offset + _pad(offset)
+
+    def encode_field(self, i: int, value: Any) -> Any:
+        """Inline value of a fixed field, or the bytes of a variable one (None for null)."""
+        field_type = self.types[i]
+        if not self.slots[i][2]:
+            if value is None:
+                raise ValueError(f"Field {self.fields[i]!r} cannot be None.")
+            return value
+        if value is None:
+            return None
+        if field_type is str:
+            return value.encode("utf-8")
+        if field_type is bytes:
+            return bytes(value)
+        if field_type in _COORD_TYPES:
+            return _encode_coords(value)
+        return cbor2.dumps(value)
+
+    def encode_row(self, struct_: Dict[str, Any]) -> bytes:
+        if self.pk not in struct_:
+            raise ValueError(f"Primary key {self.pk!r} missing from struct.")
+        for field in struct_:
+            if field not in self.index:
+                raise ValueError(f"Field {field!r} not declared in map schema.")
+        try:
+            raw = [self.encode_field(i, struct_[field]) for i, field in enumerate(self.fields)]
+        except KeyError as exc:
+            raise ValueError(f"Field {exc.args[0]!r} missing from struct.") from None
+        return self.pack(raw)
+
+    def pack(self, raw: List[Any]) -> bytes:
+        fixed = bytearray(self.fixed_size)
+        var = bytearray()
+        for value, (offset, packer, is_var) in zip(raw, self.slots):
+            if not is_var:
+                try:
+                    packer.pack_into(fixed, offset, value)
+                except struct.error as exc:
+                    raise ValueError(f"Cannot store {value!r}: {exc}") from None
+            elif value is None:
+                packer.pack_into(fixed, offset, 0, _NULL)
+            else:
+                packer.pack_into(fixed, offset, self.fixed_size + len(var), len(value))
+                var += value
+                var += bytes(_pad(len(var)))
+        return bytes(fixed + var)
+
+    def raw_field(self, buf: Any, pos: int, i: int) -> Any:
+        """Inline value or a memoryview of the bytes of field ``i`` in the payload at ``pos``."""
+        offset, packer, is_var = self.slots[i]
+        if not is_var:
+            return packer.unpack_from(buf, pos + offset)[0]
+        start, length = packer.unpack_from(buf, pos + offset)
+        if length == _NULL:
+            return None
+        return memoryview(buf)[pos + start:pos + start + length]
+
+    def coords(self, buf: Any, pos: int, i: int) -> Optional[np.ndarray]:
+        start, length = _VAR_SLOT.unpack_from(buf, pos + self.slots[i][0])
+        if length == _NULL:
+            return None
+        start += pos
+        dim = int(np.frombuffer(buf, dtype="<u8", count=1, offset=start)[0])
+        count = (length - _COORD_HEADER) // 8
+        return np.frombuffer(buf, dtype="<f8", count=count, offset=start + _COORD_HEADER).reshape(-1, dim)
+
+    def decode(self, buf: Any, pos: int, i: int) -> Any:
+        field_type = self.types[i]
+        if field_type in _COORD_TYPES:
+            coords = self.coords(buf, pos, i)
+            if coords is None or field_type is np.ndarray:
+                return coords
+            return field_type(coords)
+        raw = self.raw_field(buf, pos, i)
+        if raw is None or not self.slots[i][2]:
+            return raw
+        if field_type is str:
+            return str(raw, "utf-8")
+        if field_type is bytes:
+            return bytes(raw)
+        return field_type(cbor2.loads(raw))
+
+
+_UNDECODED = object()
+
+
+class LogRow(Mapping[str, Any]):
+    """
+    Row of a FileStore read in place from the memory-mapped segment.
+
+    Fields are decoded on first access and kept. Coordinate fields are
+    read-only NumPy views of the mapping, so reading them copies nothing.
+    """
+    __slots__ = ("_layout", "_buf", "_pos", "_values")
+
+    def __init__(self, layout: _RowLayout, buf: mmap.mmap, pos: int):
+        self._layout = layout
+        self._buf = buf
+        self._pos = pos
+        self._values: List[Any] = [_UNDECODED] * len(layout.fields)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            i = self._layout.index[key]
+        except KeyError:
+            raise KeyError(f"Field {key!r} not in map schema.") from None
+        value = self._values[i]
+        if value is _UNDECODED:
+            value = self._layout.decode(self._buf, self._pos, i)
+            self._values[i] = value
+        return value
+
+    def coords(self, key: str) -> Optional[np.ndarray]:
+        """Coordinates of a LineString or ndarray field as a read-only (N, dim) view of the segment."""
+        try:
+            i = self._layout.index[key]
+        except KeyError:
+            raise KeyError(f"Field {key!r} not in map schema.") from None
+        if self._layout.types[i] not in _COORD_TYPES:
+            raise TypeError(f"Field {key!r} does not hold coordinates.")
+        return self._layout.coords(self._buf, self._pos, i)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout.fields)
+
+    def __len__(self) -> int:
+        return len(self._layout.fields)
+
+
+class _LogMap:
+    __slots__ = ("map_id", "name", "layout", "index", "secondary")
+
+    def __init__(self, map_id: int, name: str, layout: _RowLayout):
+        self.map_id = map_id
+        self.name = name
+        self.layout = layout
+        # Primary key -> offset of the PUT record holding the live row
+        self.index: Dict[Any, int] = {}
+        # Secondary indexes live in memory only and are not rebuilt on reopen
+        self.secondary: List[_MemoryIndex] = []
+
+
+class _LogSnapshot:
+    __slots__ = ("store", "generation", "end", "next_map_id", "maps")
+
+    def __init__(self, store: "FileStore", maps: List[Tuple[_LogMap, Dict[Any, int], List[Tuple[str, Tuple[str, ...]]]]]):
+        self.store = store
+        self.generation = store._generation
+        self.end = store._end
+        self.next_map_id = store._next_map_id
+        self.maps = maps
+
+
+class FileStore(_InstrumentedStore):
+    def __init__(self, name: str, path: PathLike):
+        """
+        Append-only log store backed by one memory-mapped segment file.
+
+        Every write appends a checksummed record and an in-memory index maps
+        each primary key to the record holding its live row, so ``get_data``
+        reads rows in place from the mapping. Opening an existing file replays
+        its log; a torn tail or an unfinished transaction left by a crash is
+        discarded. Superseded records accumulate until ``compact`` rewrites
+        the segment with only the live rows.
+        """
+        self._name = name
+        self._path = path
+        path_str = path.as_str()
+        parent = os.path.dirname(path_str)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._maps: Dict[str, _LogMap] = {}
+        self._next_map_id = 1
+        self._undo: List[Tuple[_LogMap, Any, Optional[int]]] = []
+        self._tx_depth = 0
+        self._generation = 0  # bumped by compact, which moves every record
+        self._fd = os.open(path_str, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        self._end = 0
+        self._capacity = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._open_segment()
+
+    def name(self) -> str:
+        return self._name
+
+    def path(self) -> PathLike:
+        return self._path
+
+    @property
+    def type(self) -> StoreType:
+        return StoreType.FILESYSTEM
+
+    # ---- segment file ---------------------------------------------------
+
+    def _open_segment(self) -> None:
+        fd = self._fd
+        size = os.fstat(fd).st_size
+        if size == 0:
+            self._write_at(0, _MAGIC)
+            size = len(_MAGIC)
+        self._map_file(max(size, _MIN_CAPACITY))
+        if self._mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self._path.as_str()!r} is not a FileStore segment.")
+        self._end = self._replay(size)
+        # Zero whatever follows the last valid record so stale bytes are never replayed
+        os.ftruncate(fd, self._end)
+        os.ftruncate(fd, self._capacity)
+
+    def _write_at(self, pos: int, data: bytes) -> None:
+        os.lseek(self._fd, pos, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def _map_file(self, capacity: int) -> None:
+        fd = self._fd
+        os.ftruncate(fd, capacity)
+        # Rows handed out keep the previous mapping alive until they are dropped
+        self._mm = mmap.mmap(fd, capacity, access=mmap.ACCESS_READ)
+        self._capacity = capacity
+
+    def _records(self, size: int) -> Iterator[Tuple[int, int, int, int, int]]:
+        """(offset, op, map id, payload offset, payload length) of each valid record before ``size``."""
+        mm = self._mm
+        pos = len(_MAGIC)
+        while pos + _HEADER.size <= size:
+            crc, length, op, map_id = _HEADER.unpack_from(mm, pos)
+            start = pos + _HEADER.size
+            if not _OP_CREATE <= op <= _OP_ABORT or start + length > size:
+                return
+            if zlib.crc32(mm[pos + 4:start + length]) != crc:
+                return
+            yield pos, op, map_id, start, length
+            pos = start + length + _pad(length)
+
+    def _replay(self, size: int) -> int:
+        maps: Dict[int, _LogMap] = {}
+        pending: Optional[List[Tuple[int, int, int, int, int]]] = None
+        end = tx_start = len(_MAGIC)
+        for record in self._records(size):
+            pos, op, map_id, start, length = record
+            end = start + length + _pad(length)
+            if op == _OP_BEGIN:
+                pending, tx_start = [], pos
+            elif op in (_OP_COMMIT, _OP_ABORT):
+                if op == _OP_COMMIT:
+                    for buffered in pending or ():
+                        self._apply(maps, *buffered)
+                pending = None
+            elif op in (_OP_CREATE, _OP_DROP) or pending is None:
+                # Map changes are not transactional
+                self._apply(maps, *record)
+            else:
+                pending.append(record)
+        self._maps = {log_map.name: log_map for log_map in maps.values()}
+        self._next_map_id = max(maps, default=0) + 1
+        if pending is not None:
+            # Drop the unfinished transaction so later records are not read as part of it
+            return tx_start
+        return end
+
+    def _apply(self, maps: Dict[int, _LogMap], pos: int, op: int, map_id: int, start: int, length: int) -> None:
+        mm = self._mm
+        if op == _OP_CREATE:
+            name, fields, primary_key = cbor2.loads(mm[start:start + length])
+            schema = {field: _resolve_type(type_name) for field, type_name in fields}
+            maps[map_id] = _LogMap(map_id, name, _RowLayout(schema, primary_key))
+            self._next_map_id = max(self._next_map_id, map_id + 1)
+            return
+        log_map = maps.get(map_id)
+        if log_map is None:
+            return
+        if op == _OP_DROP:
+            del maps[map_id]
+        elif op == _OP_PUT:
+            layout = log_map.layout
+            log_map.index[layout.decode(mm, start, layout.pk_index)] = pos
+        elif op == _OP_DELETE:
+            log_map.index.pop(cbor2.loads(mm[start:start + length]), None)
+        elif op == _OP_LINK:
+            key, offset = cbor2.loads(mm[start:start + length])
+            log_map.index[key] = offset
+
+    def _append(self, op: int, map_id: int = 0, payload: bytes = b"") -> int:
+        if self._fd < 0:
+            raise RuntimeError(f"Store {self._name!r} is closed.")
+        record = self._encode_record(op, map_id, payload)
+        pos = self._end
+        if pos + len(record) > self._capacity:
+            self._map_file(max(2 * self._capacity, pos + len(record)))
+        self._write_at(pos, record)
+        self._end = pos + len(record)
+        return pos
+
+    def _row(self, log_map: _LogMap, pos: int) -> LogRow:
+        return LogRow(log_map.layout, self._mm, pos + _HEADER.size)
+
+    def _set_key(self, log_map: _LogMap, key: Any, pos: Optional[int]) -> None:
+        previous = log_map.index.get(key)
+        if self._tx_depth:
+            self._undo.append((log_map, key, previous))
+        if pos is None:
+            del log_map.index[key]
+        else:
+            log_map.index[key] = pos
+        for index in log_map.secondary:
+            if previous is not None:
+                index.remove(key, self._row(log_map, previous))
+            if pos is not None:
+                index.add(key, self._row(log_map, pos))
+
+    # ---- maps -----------------------------------------------------------
+
+    def create_map(
+        self,
+        map_name: str,
+        schema: Dict[str, Type],
+        primary_key: str,
+        eviction: Optional[Eviction] = None,
+    ) -> None:
+        if eviction is not None:
+            raise ValueError(f"Store {self._name!r} does not support evicting maps.")
+        if map_name in self._maps:
+            raise ValueError(f"Map {map_name!r} already exists in store {self._name!r}.")
+        _validate_struct(schema, primary_key)
+        fields = [[field, _type_name(field_type)] for field, field_type in schema.items()]
+        for (field, type_name), field_type in zip(fields, schema.values()):
+            try:
+                resolved = _resolve_type(type_name)
+            except (ImportError, AttributeError):
+                resolved = None
+            if resolved is not field_type:
+                raise TypeError(f"Field {field!r} type {type_name!r} cannot be resolved when the store is reopened.")
+        log_map = _LogMap(self._next_map_id, map_name, _RowLayout(schema, primary_key))
+        self._append(_OP_CREATE, log_map.map_id, cbor2.dumps([map_name, fields, primary_key]))
+        self._next_map_id += 1
+        self._maps[map_name] = log_map
+
+    def delete_map(self, map_name: str) -> None:
+        if map_name not in self._maps:
+            raise KeyError(f"Map {map_name!r} does not exist in store {self._name!r}.")
+        log_map = self._maps.pop(map_name)
+        self._append(_OP_DROP, log_map.map_id)
+
+    def list_maps(self) -> List[str]:
+        return list(self._maps.keys())
+
+    def _require_map(self, map_name: str) -> _LogMap:
+        try:
+            return self._maps[map_name]
+        except KeyError:
+            raise IndexError(f"Map {map_name!r} does not exist in store {self._name!r}.") from None
+
+    # ---- rows -----------------------------------------------------------
+
+    def insert_data(self, map_name: str, struct: Dict[str, Any]) -> None:
+        log_map = self._require_map(map_name)
+        payload = log_map.layout.encode_row(struct)
+        key = struct[log_map.layout.pk]
+        if key in log_map.index:
+            raise KeyError(f"Key {key!r} already exists in map {map_name!r}.")
+        self._set_key(log_map, key, self._append(_OP_PUT, log_map.map_id, payload))
+
+    def get_data(self, map_name: str, key: Any) -> Mapping[str, Any]:
+        log_map = self._require_map(map_name)
+        try:
+            pos = log_map.index[key]
+        except KeyError:
+            raise KeyError(f"Key {key!r} not found in map {map_name!r}.") from None
+        return self._row(log_map, pos)
+
+    def update_data(self, map_name: str, struct: Dict[str, Any]) -> None:
+        log_map = self._require_map(map_name)
+        layout = log_map.layout
+        if layout.pk not in struct:
+            raise ValueError(f"Primary key {layout.pk!r} missing from struct.")
+        key = struct[layout.pk]
+        try:
+            pos = log_map.index[key]
+        except KeyError:
+            raise KeyError(f"Key {key!r} not found in map {map_name!r}.") from None
+        # Unchanged fields are copied over as stored, without decoding them
+        start = pos + _HEADER.size
+        raw = [layout.raw_field(self._mm, start, i) for i in range(len(layout.fields))]
+        for field, value in struct.items():
+            try:
+                i = layout.index[field]
+            except KeyError:
+                raise ValueError(f"Field {field!r} not found in schema for map {map_name!r}.") from None
+            raw[i] = layout.encode_field(i, value)
+        payload = layout.pack(raw)
+        self._set_key(log_map, key, self._append(_OP_PUT, log_map.map_id, payload))
+
+    def delete_data(self, map_name: str, key: Any) -> None:
+        log_map = self._require_map(map_name)
+        if key not in log_map.index:
+            raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
+        self._append(_OP_DELETE, log_map.map_id, cbor2.dumps(key))
+        self._set_key(log_map, key, None)
+
+    def tick(self, steps: int = 1) -> None:
+        # No map of this backend evicts rows
+        pass
+
+    def query_keys(self, map_name: str) -> Iterator[Any]:
+        log_map = self._require_map(map_name)
+        return iter(list(log_map.index))
+
+    def iter_batches(self, map_name: str, batch_size: int = _EXPORT_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+        log_map = self._require_map(map_name)
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+        return self._log_batches(log_map, batch_size)
+
+    def _log_batches(self, log_map: _LogMap, batch_size: int) -> Iterator[Dict[str, np.ndarray]]:
+        layout = log_map.layout
+        positions = iter(log_map.index.values())
+        while True:
+            chunk = list(itertools.islice(positions, batch_size))
+            if not chunk:
+                return
+            columns: Dict[str, List[Any]] = {}
+            for i, field in enumerate(layout.fields):
+                # Coordinates are read as views of the segment, without building geometries
+                read = layout.coords if layout.types[i] in _COORD_TYPES else layout.decode
+                columns[field] = [read(self._mm, pos + _HEADER.size, i) for pos in chunk]
+            yield _batch_arrays(layout.schema, columns)
+
+    def export(self, map_name: str, path: Union[str, IPathLike], format: str = "npz") -> None:
+        log_map = self._require_map(map_name)
+        empty = _batch_arrays(log_map.layout.schema, dict.fromkeys(log_map.layout.schema, []))
+        _write_npz(path, format, self.iter_batches(map_name), empty)
+
+    def create_index(self, map_name: str, fields: Sequence[str], kind: str = "btree") -> None:
+        log_map = self._require_map(map_name)
+        fields = _index_fields(log_map.layout.schema, fields, kind)
+        if any(index.kind == kind and index.fields == fields for index in log_map.secondary):
+            return
+        index = _MemoryIndex(kind, fields)
+        index.rebuild(self._rows(log_map))
+        log_map.secondary.append(index)
+
+    def _rows(self, log_map: _LogMap) -> Iterator[Tuple[Any, LogRow]]:
+        return ((key, self._row(log_map, pos)) for key, pos in log_map.index.items())
+
+    def _candidates(self, log_map: _LogMap, field_ranges: Dict[str, Tuple[Any, Any]]) -> Iterable[Any]:
+        for index in log_map.secondary:
+            if index.stale:
+                index.rebuild(self._rows(log_map))
+        candidates = _plan_query(log_map.secondary, field_ranges)
+        return log_map.index if candidates is None else candidates
+
+    def query_eq(self, map_name: str, field: str, value: Any) -> Iterator[Any]:
+        log_map = self._require_map(map_name)
+        i = log_map.layout.index.get(field)
+        if i is None:
+            raise KeyError(f"Field {field!r} not in map schema.")
+        candidates = log_map.index if value is None else self._candidates(log_map, {field: (value, value)})
+        decode = log_map.layout.decode
+        return iter([
+            key for key in candidates
+            if decode(self._mm, log_map.index[key] + _HEADER.size, i) == value
+        ])
+
+    def query_range(self, map_name: str, field_ranges: Dict[str, Tuple[Any, Any]]) -> Iterator[Any]:
+        log_map = self._require_map(map_name)
+        _check_ranges(log_map.layout.schema, field_ranges)
+        return iter([
+            key for key in self._candidates(log_map, field_ranges)
+            if _in_ranges(self._row(log_map, log_map.index[key]), field_ranges)
+        ])
+
+    def insert_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for struct in structs:
+                self.insert_data(map_name, struct)
+
+    def update_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for struct in structs:
+                self.update_data(map_name, struct)
+
+    def delete_many(self, map_name: str, keys: Iterable[Any]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for key in keys:
+                self.delete_data(map_name, key)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Group writes so they are replayed all or nothing after a reopen.
+
+        Only the outermost transaction is framed in the log. A failing nested
+        transaction appends records pointing its keys back at their previous
+        rows. Map creation and deletion are not transactional.
+        """
+        mark = len(self._undo)
+        if self._tx_depth == 0:
+            self._append(_OP_BEGIN)
+        self._tx_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._tx_depth -= 1
+            undo = self._undo[mark:]
+            del self._undo[mark:]
+            for log_map, key, previous in reversed(undo):
+                for index in log_map.secondary:
+                    index.stale = True
+                if previous is None:
+                    log_map.index.pop(key, None)
+                else:
+                    log_map.index[key] = previous
+                if self._tx_depth and self._maps.get(log_map.name) is log_map:
+                    if previous is None:
+                        self._append(_OP_DELETE, log_map.map_id, cbor2.dumps(key))
+                    else:
+                        self._append(_OP_LINK, log_map.map_id, cbor2.dumps([key, previous]))
+            if self._tx_depth == 0:
+                self._append(_OP_ABORT)
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self._undo.clear()
+            self._append(_OP_COMMIT)
+            self.flush()
+
+    # ---- maintenance ----------------------------------------------------
+
+    def snapshot(self) -> Any:
+        """
+        Remember the end of the log and the key index of every map.
+
+        The log before that point already describes the snapshot state, so
+        nothing is copied. Compacting the segment invalidates snapshots.
+        """
+        if self._tx_depth:
+            raise RuntimeError("Cannot snapshot a store inside a transaction.")
+        maps = [
+            (log_map, dict(log_map.index), [(index.kind, index.fields) for index in log_map.secondary])
+            for log_map in self._maps.values()
+        ]
+        return _LogSnapshot(self, maps)
+
+    def restore(self, snapshot: Any) -> None:
+        """Truncate the log back to where the snapshot was taken."""
+        if not isinstance(snapshot, _LogSnapshot) or snapshot.store is not self:
+            raise ValueError(f"Snapshot was not taken from store {self._name!r}.")
+        if snapshot.generation != self._generation:
+            raise ValueError("Snapshot was taken before the store was compacted.")
+        if self._tx_depth:
+            raise RuntimeError("Cannot restore a store inside a transaction.")
+        # Zero the discarded records so they are never replayed
+        os.ftruncate(self._fd, snapshot.end)
+        os.ftruncate(self._fd, self._capacity)
+        self._end = snapshot.end
+        self._next_map_id = snapshot.next_map_id
+        self._maps = {}
+        for log_map, index, definitions in snapshot.maps:
+            restored = _LogMap(log_map.map_id, log_map.name, log_map.layout)
+            restored.index = dict(index)
+            restored.secondary = [_MemoryIndex(kind, fields) for kind, fields in definitions]
+            for secondary in restored.secondary:
+                secondary.stale = True
+            self._maps[log_map.name] = restored
+
+    def flush(self) -> None:
+        """Force the appended records to disk."""
+        if self._fd >= 0:
+            os.fsync(self._fd)
+
+    def segment_size(self) -> int:
+        """Bytes of log written to the segment, superseded records included."""
+        return self._end
+
+    def compact(self) -> None:
+        """
+        Rewrite the segment with only the live rows.
+
+        The new segment is written next to the old one and swapped in with an
+        atomic rename, so a crash leaves one of the two intact. Rows read
+        before compacting remain valid.
+        """
+        if self._tx_depth:
+            raise RuntimeError("Cannot compact a FileStore inside a transaction.")
+        self._generation += 1
+        path_str = self._path.as_str()
+        tmp_path = path_str + ".compact"
+        mm = self._mm
+        with open(tmp_path, "wb") as out:
+            out.write(_MAGIC)
+            written = len(_MAGIC)
+            moved: Dict[int, Dict[Any, int]] = {}
+            for log_map in self._maps.values():
+                layout = log_map.layout
+                fields = [[field, _type_name(layout.schema[field])] for field in layout.fields]
+                chunks = [self._encode_record(_OP_CREATE, log_map.map_id, cbor2.dumps([log_map.name, fields, layout.pk]))]
+                offsets = moved[log_map.map_id] = {}
+                offset = written + len(chunks[0])
+                for key, pos in log_map.index.items():
+                    length = _HEADER.unpack_from(mm, pos)[1]
+                    size = _HEADER.size + length + _pad(length)
+                    # PUT records are position independent and copied verbatim
+                    chunks.append(mm[pos:pos + size])
+                    offsets[key] = offset
+                    offset += size
+                out.write(b"".join(chunks))
+                written = offset
+            out.flush()
+            os.fsync(out.fileno())
+        os.close(self._fd)
+        os.replace(tmp_path, path_str)
+        self._fd = os.open(path_str, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        self._map_file(max(written, _MIN_CAPACITY))
+        self._end = written
+        for log_map in self._maps.values():
+            log_map.index = moved[log_map.map_id]
+
+    @staticmethod
+    def _encode_record(op: int, map_id: int, payload: bytes) -> bytes:
+        body = struct.pack("<III", len(payload), op, map_id) + payload
+        return struct.pack("<I", zlib.crc32(body)) + body + bytes(_pad(len(payload)))
+
+    def close(self) -> None:
+        if self._fd < 0:
+            return
+        self.flush()
+        # Shrink the preallocated tail away so the file holds just the log
+        os.ftruncate(self._fd, self._end)
+        os.close(self._fd)
+        self._fd = -1
+        self._maps.clear()
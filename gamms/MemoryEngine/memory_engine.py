@@ -1,6 +1,7 @@
-from typing import Dict, Iterator, Optional
+from typing import Any, Dict, Iterator, Optional
 
 from gamms.typing.memory_engine import IMemoryEngine, IPathLike, IStore, StoreType
+from gamms.MemoryEngine.file_store import FileStore
 from gamms.MemoryEngine.store import MemoryStore, PathLike, SqliteStore
 
 
@@ -12,6 +13,7 @@ class MemoryEngine(IMemoryEngine):
 
     def __init__(self) -> None:
         self._stores: Dict[str, IStore] = {}
+        self._stats_enabled = False
 
     @staticmethod
     def _build_store(
@@ -26,7 +28,9 @@ def _build_store(
                 raise ValueError("DATABASE store requires a path.")
             return SqliteStore(name, path)  # type: ignore[arg-type]
         if store_type == StoreType.FILESYSTEM:
-            raise NotImplementedError("FILESYSTEM store type is not implemented yet.")
+            if path is None:
+                raise ValueError("FILESYSTEM store requires a path.")
+            return FileStore(name, path)  # type: ignore[arg-type]
         raise ValueError(f"Unsupported store type: {store_type}")
 
     def create_store(
@@ -38,6 +42,8 @@ def create_store(
         if name in self._stores:
             raise ValueError(f"Store with name {name!r} already exists.")
         store = self._build_store(store_type, name, path)
+        if self._stats_enabled:
+            store.enable_stats()
         self._stores[name] = store
         return store
 
@@ -49,10 +55,22 @@ def get_store(self, name: str) -> IStore:
     def list_stores(self) -> Iterator[str]:
         return iter(self._stores.keys())
 
+    def tick(self, steps: int = 1) -> None:
+        for store in self._stores.values():
+            store.tick(steps)
+
+    def enable_stats(self, enabled: bool = True) -> None:
+        self._stats_enabled = enabled
+        for store in self._stores.values():
+            store.enable_stats(enabled)
+
+    def stats(self, reset: bool = False) -> Dict[str, Dict[str, Any]]:
+        return {name: store.stats(reset) for name, store in self._stores.items()}
+
     def terminate(self) -> None:
         for store in self._stores.values():
             store.close()
         self._stores.clear()
 
 
-__all__ = ["MemoryEngine", "MemoryStore", "SqliteStore", "PathLike"]
+__all__ = ["MemoryEngine", "MemoryStore", "SqliteStore", "FileStore", "PathLike"]
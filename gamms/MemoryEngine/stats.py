@@ -0,0 +1,244 @@
+"""Per-map operation counters and latency histograms for stores."""
+
+import bisect
+import functools
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from gamms.typing.memory_engine import IStore
+
+
+LATENCY_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+"""Upper bounds in seconds of the latency histogram buckets; a last bucket counts slower calls."""
+
+# IStore method -> operation it is counted under
+_TIMED_METHODS = {
+    "insert_data": "insert", "insert_many": "insert",
+    "get_data": "get",
+    "update_data": "update", "update_many": "update",
+    "delete_data": "delete", "delete_many": "delete",
+    "query_eq": "query", "query_range": "query",
+}
+_TIMED_ITERATORS = {"query_keys": "query_keys"}
+_SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+"?(\w+)', re.IGNORECASE)
+
+
+class _OpStats:
+    __slots__ = ("count", "total", "max", "histogram")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "histogram": list(self.histogram),
+        }
+
+
+class StoreStats:
+    """
+    Call counts and latencies of store operations, per map and per operation.
+
+    Only the outermost store call is timed, so ``insert_many`` counts as a
+    single insert however it is implemented, and a ``get_data`` made inside
+    an update is not counted separately.
+    """
+
+    def __init__(self) -> None:
+        self._maps: Dict[str, Dict[str, _OpStats]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def record(self, map_name: str, op: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            ops = self._maps.setdefault(map_name, {})
+            stats = ops.get(op)
+            if stats is None:
+                stats = ops[op] = _OpStats()
+            stats.total += seconds
+            if calls:
+                stats.count += calls
+                stats.max = max(stats.max, seconds)
+                stats.histogram[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += calls
+
+    def as_dict(self, reset: bool = False) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            ret = {
+                map_name: {op: stats.as_dict() for op, stats in ops.items()}
+                for map_name, ops in self._maps.items()
+            }
+            if reset:
+                self._maps = {}
+        return ret
+
+    def timed(self, op: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        local = self._local
+
+        @functools.wraps(method)
+        def wrapper(map_name: str, *args: Any, **kwargs: Any) -> Any:
+            if getattr(local, "active", False):
+                return method(map_name, *args, **kwargs)
+            local.active = True
+            start = time.perf_counter()
+            try:
+                return method(map_name, *args, **kwargs)
+            finally:
+                local.active = False
+                self.record(map_name, op, time.perf_counter() - start)
+        return wrapper
+
+    def timed_iter(self, op: str, method: Callable[..., Iterator[Any]]) -> Callable[..., Iterator[Any]]:
+        local = self._local
+
+        def step(it: Iterator[Any]) -> Any:
+            if getattr(local, "active", False):
+                return next(it)
+            local.active = True
+            try:
+                return next(it)
+            finally:
+                local.active = False
+
+        @functools.wraps(method)
+        def wrapper(map_name: str, *args: Any, **kwargs: Any) -> Iterator[Any]:
+            # Time spent between items belongs to the caller, not the store
+            start = time.perf_counter()
+            elapsed = 0.0
+            try:
+                it = iter(method(map_name, *args, **kwargs))
+                elapsed += time.perf_counter() - start
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = step(it)
+                    except StopIteration:
+                        elapsed += time.perf_counter() - start
+                        return
+                    elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                self.record(map_name, op, elapsed)
+        return wrapper
+
+    def sql(self, statement: str, seconds: float, calls: int = 1) -> None:
+        match = _SQL_TABLE.search(statement)
+        self.record(match.group(1) if match else "", "sql", seconds, calls)
+
+
+class _TimedCursor:
+    """Cursor wrapper timing statements and fetches under the ``sql`` operation of the table they name."""
+
+    def __init__(self, cursor: sqlite3.Cursor, stats: StoreStats):
+        self._cursor = cursor
+        self._stats = stats
+        self._statement = ""
+
+    def _time(self, calls: int, method: Callable[..., Any], *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            # Fetching steps the statement further, so it adds to its time but not its count
+            self._stats.sql(self._statement, time.perf_counter() - start, calls)
+
+    def execute(self, sql: str, parameters: Any = ()) -> "_TimedCursor":
+        self._statement = sql
+        self._time(1, self._cursor.execute, sql, parameters)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> "_TimedCursor":
+        self._statement = sql
+        self._time(1, self._cursor.executemany, sql, seq_of_parameters)
+        return self
+
+    def fetchone(self) -> Any:
+        return self._time(0, self._cursor.fetchone)
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        if size is None:
+            return self._time(0, self._cursor.fetchmany)
+        return self._time(0, self._cursor.fetchmany, size)
+
+    def fetchall(self) -> List[Any]:
+        return self._time(0, self._cursor.fetchall)
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class _TimedConnection:
+    """Connection wrapper whose statements run through a ``_TimedCursor``."""
+
+    def __init__(self, conn: sqlite3.Connection, stats: StoreStats):
+        self._conn = conn
+        self._stats = stats
+
+    def cursor(self) -> _TimedCursor:
+        return _TimedCursor(self._conn.cursor(), self._stats)
+
+    def execute(self, sql: str, parameters: Any = ()) -> _TimedCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> _TimedCursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self) -> "_TimedConnection":
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._conn.__exit__(*exc_info)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+
+class _InstrumentedStore(IStore):
+    """
+    Adds ``enable_stats`` and ``stats`` to a store.
+
+    Enabling shadows the timed methods with wrappers on the instance, and
+    disabling removes them again, so a store that is not instrumented runs
+    its methods directly at no cost.
+    """
+
+    _stats: Optional[StoreStats] = None
+
+    def _instrument(self, stats: StoreStats) -> None:
+        for method, op in _TIMED_METHODS.items():
+            setattr(self, method, stats.timed(op, getattr(type(self), method).__get__(self)))
+        for method, op in _TIMED_ITERATORS.items():
+            setattr(self, method, stats.timed_iter(op, getattr(type(self), method).__get__(self)))
+
+    def _uninstrument(self) -> None:
+        for method in (*_TIMED_METHODS, *_TIMED_ITERATORS):
+            self.__dict__.pop(method, None)
+
+    def enable_stats(self, enabled: bool = True) -> None:
+        if enabled and self._stats is None:
+            self._stats = StoreStats()
+            self._instrument(self._stats)
+        elif not enabled and self._stats is not None:
+            self._uninstrument()
+            self._stats = None
+
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        if self._stats is None:
+            return {"maps": {}}
+        return {"maps": self._stats.as_dict(reset)}
@@ -1,10 +1,23 @@
+import contextlib
+import itertools
 import os
 import sqlite3
-from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Type
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple, Type, Union,
+    cast,
+)
 
 import cbor2
+import numpy as np
+from shapely.geometry import LineString
 
-from gamms.typing.memory_engine import IPathLike, IStore, StoreType
+from gamms.MemoryEngine.stats import _InstrumentedStore, _TimedConnection
+from gamms.spatial import SpatialHash
+from gamms.typing.memory_engine import Eviction, IPathLike, StoreType
 
 
 _PRIMITIVE_TYPES = (int, float, str, bool, bytes)
@@ -51,12 +64,520 @@ def _validate_struct(struct: Dict[str, Type], primary_key: str) -> None:
             f"got {struct[primary_key].__name__!r}."
         )
 
-class MemoryStore(IStore):
+_INDEX_KINDS = ("btree", "hash", "spatial")
+_SPATIAL_CELL_SIZE = 10.0  # grid cell side of in-memory spatial indexes
+
+
+def _index_fields(schema: Dict[str, Type], fields: Union[str, Sequence[str]], kind: str) -> Tuple[str, ...]:
+    """Validated tuple of the fields of an index of ``kind``."""
+    if kind not in _INDEX_KINDS:
+        raise ValueError(f"Unknown index kind {kind!r}, expected one of {_INDEX_KINDS}.")
+    fields = (fields,) if isinstance(fields, str) else tuple(fields)
+    if not fields:
+        raise ValueError("An index needs at least one field.")
+    for field in fields:
+        if field not in schema:
+            raise KeyError(f"Field {field!r} not in map schema.")
+    if kind == "spatial" and len(fields) != 2:
+        raise ValueError(f"A spatial index covers exactly two fields, got {len(fields)}.")
+    if kind == "hash" and len(fields) != 1:
+        raise ValueError(f"A hash index covers a single field, got {len(fields)}.")
+    return fields
+
+
+def _check_ranges(schema: Dict[str, Type], field_ranges: Dict[str, Tuple[Any, Any]]) -> None:
+    for field in field_ranges:
+        if field not in schema:
+            raise KeyError(f"Field {field!r} not in map schema.")
+
+
+def _in_ranges(row: Mapping[str, Any], field_ranges: Dict[str, Tuple[Any, Any]]) -> bool:
+    for field, (low, high) in field_ranges.items():
+        value = row[field]
+        if value is None or (low is not None and value < low) or (high is not None and value > high):
+            return False
+    return True
+
+
+class _MemoryIndex:
+    """
+    Secondary index of an in-memory map.
+
+    Stores update it on every write. Rolled back writes mark it stale
+    instead, and the next query rebuilds it from the rows.
+    """
+
+    def __init__(self, kind: str, fields: Tuple[str, ...]):
+        self.kind = kind
+        self.fields = fields
+        self.stale = False
+        self._buckets: Dict[Any, Set[Any]] = {}
+        self._values: Dict[Any, Any] = {}
+        self._sorted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._grid: Optional[SpatialHash[Any]] = SpatialHash(_SPATIAL_CELL_SIZE) if kind == "spatial" else None
+
+    def add(self, key: Any, row: Mapping[str, Any]) -> None:
+        value = row[self.fields[0]]
+        if self.kind == "hash":
+            self._buckets.setdefault(value, set()).add(key)
+        elif self.kind == "btree":
+            if value is not None:
+                self._values[key] = value
+                self._sorted = None
+        else:
+            y = row[self.fields[1]]
+            if value is not None and y is not None:
+                self._grid.update(key, value, y)
+
+    def remove(self, key: Any, row: Mapping[str, Any]) -> None:
+        if self.kind == "hash":
+            value = row[self.fields[0]]
+            bucket = self._buckets.get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[value]
+        elif self.kind == "btree":
+            if self._values.pop(key, None) is not None:
+                self._sorted = None
+        else:
+            self._grid.remove(key)
+
+    def rebuild(self, rows: Iterable[Tuple[Any, Mapping[str, Any]]]) -> None:
+        self._buckets.clear()
+        self._values.clear()
+        self._sorted = None
+        if self._grid is not None:
+            self._grid.clear()
+        for key, row in rows:
+            self.add(key, row)
+        self.stale = False
+
+    def lookup_eq(self, field: str, value: Any) -> Optional[Iterable[Any]]:
+        """Keys whose ``field`` may equal ``value``, None when this index cannot tell."""
+        if field != self.fields[0] or self.kind == "spatial":
+            return None
+        if self.kind == "hash":
+            return self._buckets.get(value, ())
+        return self._scan_sorted(value, value)
+
+    def lookup_range(self, field_ranges: Dict[str, Tuple[Any, Any]]) -> Optional[Iterable[Any]]:
+        """Superset of the keys within ``field_ranges``, None when this index cannot narrow them."""
+        if self.kind == "btree" and self.fields[0] in field_ranges:
+            return self._scan_sorted(*field_ranges[self.fields[0]])
+        if self.kind == "spatial" and all(field in field_ranges for field in self.fields):
+            (x_low, x_high), (y_low, y_high) = (field_ranges[field] for field in self.fields)
+            if None in (x_low, x_high, y_low, y_high):
+                return None
+            d = max(x_high - x_low, y_high - y_low) / 2
+            return self._grid.query((x_low + x_high) / 2, (y_low + y_high) / 2, d)
+        return None
+
+    def _scan_sorted(self, low: Any, high: Any) -> Iterable[Any]:
+        if self._sorted is None:
+            # Sorted arrays are rebuilt lazily, on the first lookup after a write
+            keys = np.empty(len(self._values), dtype=object)
+            keys[:] = list(self._values)
+            values = np.array(list(self._values.values()))
+            order = np.argsort(values, kind="stable")
+            self._sorted = (values[order], keys[order])
+        values, keys = self._sorted
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return keys[start:stop].tolist()
+
+
+def _plan_query(
+    indexes: Iterable[_MemoryIndex],
+    field_ranges: Dict[str, Tuple[Any, Any]],
+) -> Optional[Iterable[Any]]:
+    """Candidate keys from the most specific index able to narrow ``field_ranges``."""
+    best = None
+    for index in indexes:
+        if index.kind == "hash":
+            low, high = field_ranges.get(index.fields[0], (None, None))
+            if low is None or low != high:
+                continue
+            candidates = index.lookup_eq(index.fields[0], low)
+        else:
+            candidates = index.lookup_range(field_ranges)
+        if candidates is None:
+            continue
+        if index.kind != "btree":
+            return candidates
+        best = candidates
+    return best
+
+
+_COLUMN_DTYPES: Dict[Type, np.dtype] = {
+    int: np.dtype(np.int64),
+    float: np.dtype(np.float64),
+    bool: np.dtype(np.bool_),
+}
+_INT64_RANGE = (-2**63, 2**63 - 1)
+_MIN_COLUMN_CAPACITY = 64
+_MIN_COMPACT_ROWS = 1024  # tombstones tolerated before compacting a columnar map
+
+
+class _ColumnarMap(MutableMapping[Any, Dict[str, Any]]):
+    """
+    Rows of an int/float/bool-only map kept as growable NumPy columns.
+
+    A dict maps each key to its row. Deleted rows are tombstoned and the
+    columns are compacted once tombstones outnumber the live rows. Reads
+    return a fresh dict of Python scalars, so only rows whose values read
+    back unchanged are accepted; ``holds`` tells them apart.
+    """
+
+    def __init__(self, schema: Dict[str, Type], primary_key: str):
+        self._fields = tuple(schema)
+        self._types = dict(schema)
+        self._pk = primary_key
+        self._columns = {
+            field: np.empty(_MIN_COLUMN_CAPACITY, dtype=_COLUMN_DTYPES[field_type])
+            for field, field_type in schema.items()
+        }
+        self._live = np.zeros(_MIN_COLUMN_CAPACITY, dtype=np.bool_)
+        self._rows: Dict[Any, int] = {}
+        self._size = 0  # rows in use, tombstones included
+
+    def _write(self, row: int, struct: Mapping[str, Any]) -> None:
+        for field, value in struct.items():
+            try:
+                column = self._columns[field]
+            except KeyError:
+                raise ValueError(f"Field {field!r} not declared in map schema.") from None
+            column[row] = value
+
+    def holds(self, struct: Mapping[str, Any]) -> bool:
+        """
+        Whether the columns represent ``struct`` exactly, so it reads back unchanged.
+
+        Every field must be declared and hold a value of exactly its declared
+        type, ints within int64 range. None, or True or 3 in a float field,
+        would read back different.
+        """
+        for field, value in struct.items():
+            field_type = self._types.get(field)
+            if field_type is None or type(value) is not field_type:
+                return False
+            if field_type is int and not _INT64_RANGE[0] <= value <= _INT64_RANGE[1]:
+                return False
+        return True
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        row = self._rows[key]
+        return {field: column.item(row) for field, column in self._columns.items()}
+
+    def __setitem__(self, key: Any, struct: Mapping[str, Any]) -> None:
+        row = self._rows.get(key)
+        if row is not None:
+            self.update_row(key, struct)
+            return
+        for field in self._fields:
+            if field not in struct:
+                raise ValueError(f"Field {field!r} not declared in map schema.")
+        if self._size == len(self._live):
+            self._grow()
+        row = self._size
+        self._write(row, struct)
+        self._live[row] = True
+        self._rows[key] = row
+        self._size += 1
+
+    def update_row(self, key: Any, struct: Mapping[str, Any]) -> None:
+        self._write(self._rows[key], struct)
+
+    def __delitem__(self, key: Any) -> None:
+        row = self._rows.pop(key)
+        self._live[row] = False
+        dead = self._size - len(self._rows)
+        if dead >= _MIN_COMPACT_ROWS and dead > len(self._rows):
+            self.compact()
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def _grow(self) -> None:
+        dead = self._size - len(self._rows)
+        if dead * 2 >= self._size:
+            self.compact()
+            if self._size < len(self._live):
+                return
+        capacity = 2 * len(self._live)
+        for field, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[field] = grown
+        live = np.zeros(capacity, dtype=np.bool_)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+
+    def compact(self) -> None:
+        """Drop tombstoned rows, keeping the live rows in insertion order."""
+        if self._size == len(self._rows):
+            return
+        live = self._live[:self._size]
+        count = len(self._rows)
+        for column in self._columns.values():
+            column[:count] = column[:self._size][live]
+        self._live[:count] = True
+        self._live[count:self._size] = False
+        self._size = count
+        self._rows = dict(zip(self._columns[self._pk][:count].tolist(), range(count)))
+
+    def copy(self) -> "_ColumnarMap":
+        clone = _ColumnarMap.__new__(_ColumnarMap)
+        clone._fields = self._fields
+        clone._types = self._types
+        clone._pk = self._pk
+        capacity = max(self._size, _MIN_COLUMN_CAPACITY)
+        clone._columns = {field: column[:capacity].copy() for field, column in self._columns.items()}
+        clone._live = self._live[:capacity].copy()
+        clone._rows = self._rows.copy()
+        clone._size = self._size
+        return clone
+
+    def column(self, field: str) -> np.ndarray:
+        """Read-only view of a column, in ``query_keys`` order."""
+        self.compact()
+        view = self._columns[field][:self._size]
+        view.flags.writeable = False
+        return view
+
+
+_EXPORT_BATCH_SIZE = 65536  # rows per batch of iter_batches and export
+_EXPORT_FORMATS = ("npz",)
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+def _batch_arrays(schema: Dict[str, Type], columns: Dict[str, List[Any]]) -> Dict[str, np.ndarray]:
+    """
+    Column arrays of one batch of rows, given the values of each field.
+
+    Int, float and bool fields become typed arrays and str fields fixed
+    width unicode arrays. Coordinate fields are laid out like Arrow lists:
+    the points of all rows one after the other under the field name, and
+    ``<field>.offsets`` giving where the points of each row start and end.
+    Fields of other types, or holding None, fall back to object arrays.
+    """
+    batch: Dict[str, np.ndarray] = {}
+    for field, field_type in schema.items():
+        values = columns[field]
+        if field_type in _COORD_TYPES and all(value is not None for value in values):
+            coords = [np.asarray(getattr(value, 'coords', value), dtype=np.float64) for value in values]
+            if all(array.ndim == 2 for array in coords) and len({array.shape[1] for array in coords}) <= 1:
+                offsets = np.zeros(len(coords) + 1, dtype=np.int64)
+                np.cumsum([len(array) for array in coords], out=offsets[1:])
+                batch[field] = np.concatenate(coords) if coords else np.zeros((0, 2), dtype=np.float64)
+                batch[f"{field}.offsets"] = offsets
+                continue
+        elif field_type in _COLUMN_DTYPES:
+            try:
+                batch[field] = np.array(values, dtype=_COLUMN_DTYPES[field_type])
+                continue
+            except (TypeError, ValueError):
+                pass
+        elif field_type is str and all(value is not None for value in values):
+            batch[field] = np.array(values, dtype=np.str_)
+            continue
+        batch[field] = _object_array(values)
+    return batch
+
+
+def _write_npz(
+    path: Union[str, IPathLike],
+    format: str,
+    batches: Iterable[Dict[str, np.ndarray]],
+    empty: Dict[str, np.ndarray],
+) -> None:
+    """
+    Write the concatenation of ``batches``, or ``empty`` if there are none, as an ``.npz`` archive.
+
+    Each column of each batch is spooled to its own ``.npy`` file next to the
+    archive, and the columns are then streamed into the archive one batch at
+    a time, so memory stays bounded by the batch size. Object columns are the
+    exception, as their pickle can only be written whole.
+    """
+    if format not in _EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {format!r}.")
+    path_str = path.as_str() if isinstance(path, IPathLike) else os.fspath(path)
+    parent = os.path.dirname(os.path.abspath(path_str))
+    os.makedirs(parent, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=parent) as spool:
+        parts: Dict[str, List[str]] = {}
+        dtypes: Dict[str, List[np.dtype]] = {}
+        shapes: Dict[str, List[Tuple[int, ...]]] = {}
+        columns: Dict[str, int] = {}
+
+        def save(i: int, batch: Dict[str, np.ndarray]) -> None:
+            for key, array in batch.items():
+                part = os.path.join(spool, f"{columns.setdefault(key, len(columns))}-{i}.npy")
+                np.save(part, array, allow_pickle=True)
+                parts.setdefault(key, []).append(part)
+                dtypes.setdefault(key, []).append(array.dtype)
+                shapes.setdefault(key, []).append(array.shape)
+
+        for i, batch in enumerate(batches):
+            save(i, batch)
+        if not parts:
+            save(0, empty)
+
+        with zipfile.ZipFile(path_str, "w", allowZip64=True) as archive:
+            for key, key_parts in parts.items():
+                dtype = np.result_type(*dtypes[key])
+                # Offsets of every batch after the first continue from the previous batch
+                is_offsets = key.endswith(".offsets")
+                rows = sum(shape[0] for shape in shapes[key]) - (len(key_parts) - 1 if is_offsets else 0)
+                with archive.open(f"{key}.npy", "w", force_zip64=True) as out:
+                    if dtype.hasobject:
+                        array = np.concatenate([np.load(part, allow_pickle=True) for part in key_parts])
+                        np.lib.format.write_array(out, array, allow_pickle=True)
+                        continue
+                    np.lib.format.write_array_header_2_0(out, {
+                        "descr": np.lib.format.dtype_to_descr(dtype),
+                        "fortran_order": False,
+                        "shape": (rows, *shapes[key][0][1:]),
+                    })
+                    base = 0
+                    for j, part in enumerate(key_parts):
+                        array = np.load(part, mmap_mode="r")
+                        if is_offsets:
+                            shifted = (array[1:] if j else array) + base
+                            base += int(array[-1])
+                            array = shifted
+                        out.write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+
+class _EvictingMap(MutableMapping[Any, Dict[str, Any]]):
+    """
+    Rows of a map bounded by an ``Eviction`` policy.
+
+    Rows are kept in least recently used order, and for a TTL also in
+    order of their last write together with the step of that write. The map
+    only reports the keys due for eviction; the store deletes them so its
+    indexes and transactions see the eviction like any other delete.
+    """
+
+    def __init__(self, eviction: Eviction):
+        self.eviction = eviction
+        self._rows: OrderedDict[Any, Dict[str, Any]] = OrderedDict()
+        self._written: OrderedDict[Any, int] = OrderedDict()
+        self.clock = 0
+        self.counts = dict.fromkeys(("hits", "misses", "lru_evictions", "ttl_evictions"), 0)
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        return self._rows[key]
+
+    def __setitem__(self, key: Any, row: Dict[str, Any]) -> None:
+        self._rows[key] = row
+        self._rows.move_to_end(key)
+        if self.eviction.ttl is not None:
+            self._written[key] = self.clock
+            self._written.move_to_end(key)
+
+    def __delitem__(self, key: Any) -> None:
+        del self._rows[key]
+        self._written.pop(key, None)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._rows
+
+    def touch(self, key: Any) -> None:
+        self._rows.move_to_end(key)
+
+    def written(self, key: Any) -> None:
+        self._rows.move_to_end(key)
+        if self.eviction.ttl is not None:
+            self._written[key] = self.clock
+            self._written.move_to_end(key)
+
+    def overflow(self) -> List[Any]:
+        """Least recently used keys beyond ``max_entries``."""
+        limit = self.eviction.max_entries
+        if limit is None or len(self._rows) <= limit:
+            return []
+        return list(itertools.islice(self._rows, len(self._rows) - limit))
+
+    def advance(self, steps: int) -> List[Any]:
+        """Move the clock ``steps`` forward and return the keys whose TTL ran out."""
+        self.clock += steps
+        ttl = self.eviction.ttl
+        if ttl is None:
+            return []
+        expired = []
+        for key, step in self._written.items():
+            if self.clock - step < ttl:
+                break
+            expired.append(key)
+        return expired
+
+    def copy(self) -> "_EvictingMap":
+        clone = _EvictingMap(self.eviction)
+        clone._rows = self._rows.copy()
+        clone._written = self._written.copy()
+        clone.clock = self.clock
+        clone.counts = self.counts
+        return clone
+
+
+class _MemorySnapshot:
+    __slots__ = ("store", "maps", "schemas", "indexes")
+
+    def __init__(
+        self,
+        store: "MemoryStore",
+        maps: Dict[str, MutableMapping[Any, Dict[str, Any]]],
+        schemas: Dict[str, Tuple[Dict[str, Type], str]],
+        indexes: Dict[str, List[Tuple[str, Tuple[str, ...]]]],
+    ):
+        self.store = store
+        self.maps = maps
+        self.schemas = schemas
+        self.indexes = indexes
+
+
+class MemoryStore(_InstrumentedStore):
     def __init__(self, name: str, path: Optional[PathLike] = None):
+        """
+        Dict backed store.
+
+        Maps whose fields are all int, float or bool keep their rows in
+        NumPy columns instead of one dict per row; ``get_column`` exposes
+        them to vectorized consumers. Such a map moves to dict rows the
+        first time it is given a None or undeclared field.
+
+        Snapshots share the row dicts of the other maps with the store. A row
+        is copied the first time it is updated after a snapshot or restore.
+        """
         self._name = name
         self._path = path
-        self._maps: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._maps: Dict[str, MutableMapping[Any, Dict[str, Any]]] = {}
         self._schemas: Dict[str, Tuple[Dict[str, Type], str]] = {}
+        self._indexes: Dict[str, List[_MemoryIndex]] = {}
+        # Keys of the maps shared with a snapshot whose row dicts were already copied
+        self._private: Dict[str, Set[Any]] = {}
+        # Undo actions of the writes made inside the open transactions
+        self._undo: List[Callable[[], None]] = []
+        self._tx_depth = 0
 
     def name(self) -> str:
         return self._name
@@ -68,23 +589,37 @@ def path(self) -> Optional[IPathLike]:
     def type(self) -> StoreType:
         return StoreType.MEMORY
 
-    def create_map(self, map_name: str, schema: Dict[str, Type], primary_key: str) -> None:
+    def create_map(
+        self,
+        map_name: str,
+        schema: Dict[str, Type],
+        primary_key: str,
+        eviction: Optional[Eviction] = None,
+    ) -> None:
         if map_name in self._maps:
             raise ValueError(f"Map {map_name!r} already exists in store {self._name!r}.")
         _validate_struct(schema, primary_key)
-        self._maps[map_name] = {}
+        if eviction is not None:
+            self._maps[map_name] = _EvictingMap(eviction)
+        elif all(field_type in _COLUMN_DTYPES for field_type in schema.values()):
+            self._maps[map_name] = _ColumnarMap(schema, primary_key)
+        else:
+            self._maps[map_name] = {}
         self._schemas[map_name] = (schema, primary_key)
+        self._indexes[map_name] = []
 
     def delete_map(self, map_name: str) -> None:
         if map_name not in self._maps:
             raise KeyError(f"Map {map_name!r} does not exist in store {self._name!r}.")
         del self._maps[map_name]
         del self._schemas[map_name]
+        del self._indexes[map_name]
+        self._private.pop(map_name, None)
 
     def list_maps(self) -> List[str]:
         return list(self._maps.keys())
 
-    def _require_map(self, map_name: str) -> Tuple[Dict[Any, Dict[str, Any]], Dict[str, Type], str]:
+    def _require_map(self, map_name: str) -> Tuple[MutableMapping[Any, Dict[str, Any]], Dict[str, Type], str]:
         if map_name not in self._maps:
             raise IndexError(f"Map {map_name!r} does not exist in store {self._name!r}.")
         schema, pk = self._schemas[map_name]
@@ -100,13 +635,27 @@ def insert_data(self, map_name: str, struct: Dict[str, Any]) -> None:
         key = struct[pk]
         if key in rows:
             raise KeyError(f"Key {key!r} already exists in map {map_name!r}.")
+        if isinstance(rows, _ColumnarMap) and not rows.holds(struct):
+            rows = self._demote(map_name, rows)
         rows[key] = struct
+        for index in self._indexes[map_name]:
+            index.add(key, struct)
+        if self._tx_depth:
+            self._undo.append(lambda: rows.pop(key, None))
+        if isinstance(rows, _EvictingMap):
+            for evicted in rows.overflow():
+                self._evict(map_name, rows, evicted, "lru_evictions")
 
     def get_data(self, map_name: str, key: Any) -> Mapping[str, Any]:
         rows, schema, _ = self._require_map(map_name)
         if key not in rows:
+            if isinstance(rows, _EvictingMap):
+                rows.counts["misses"] += 1
             raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
         row = rows[key]
+        if isinstance(rows, _EvictingMap):
+            rows.counts["hits"] += 1
+            rows.touch(key)
         return row
 
     def update_data(self, map_name: str, struct: Dict[str, Any]) -> None:
@@ -116,21 +665,271 @@ def update_data(self, map_name: str, struct: Dict[str, Any]) -> None:
         key = struct[pk]
         if key not in rows:
             raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
-        rows[key].update(struct)
+        if isinstance(rows, _ColumnarMap) and not rows.holds(struct):
+            rows = self._demote(map_name, rows)
+        indexes = self._indexes[map_name]
+        if indexes:
+            old = dict(rows[key])
+            self._update_row(map_name, rows, key, struct)
+            new = rows[key]
+            for index in indexes:
+                index.remove(key, old)
+                index.add(key, new)
+        else:
+            self._update_row(map_name, rows, key, struct)
+        if isinstance(rows, _EvictingMap):
+            rows.written(key)
+
+    def _demote(self, map_name: str, columnar: _ColumnarMap) -> Dict[Any, Dict[str, Any]]:
+        """
+        Move a columnar map to dict rows, for data its columns cannot hold.
+
+        The dict store keeps any value as given, so a map keeps doing so
+        after the first such row arrives rather than raising or converting.
+        """
+        rows = {key: columnar[key] for key in columnar}
+        self._maps[map_name] = rows
+        if self._tx_depth:
+            # Earlier undo actions of the transaction apply to the columnar map
+            self._undo.append(lambda: self._maps.__setitem__(map_name, columnar))
+        return rows
+
+    def _update_row(
+        self,
+        map_name: str,
+        rows: MutableMapping[Any, Dict[str, Any]],
+        key: Any,
+        struct: Dict[str, Any],
+    ) -> None:
+        if isinstance(rows, _ColumnarMap):
+            if self._tx_depth:
+                previous = rows[key]
+                self._undo.append(lambda: rows.update_row(key, previous))
+            rows.update_row(key, struct)
+            return
+        row = rows[key]
+        private = self._private.get(map_name)
+        if private is not None and key not in private:
+            row = rows[key] = dict(row)
+            private.add(key)
+        if self._tx_depth:
+            previous = dict(row)
+            def undo() -> None:
+                row.clear()
+                row.update(previous)
+            self._undo.append(undo)
+        row.update(struct)
 
     def delete_data(self, map_name: str, key: Any) -> None:
         rows, _, _ = self._require_map(map_name)
         if key not in rows:
             raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
-        del rows[key]
+        row = rows.pop(key)
+        for index in self._indexes[map_name]:
+            index.remove(key, row)
+        if self._tx_depth:
+            self._undo.append(lambda: rows.__setitem__(key, row))
+
+    def _evict(self, map_name: str, rows: _EvictingMap, key: Any, reason: str) -> None:
+        row = rows.pop(key)
+        for index in self._indexes[map_name]:
+            index.remove(key, row)
+        if self._tx_depth:
+            self._undo.append(lambda: rows.__setitem__(key, row))
+        rows.counts[reason] += 1
+
+    def tick(self, steps: int = 1) -> None:
+        for map_name, rows in self._maps.items():
+            if isinstance(rows, _EvictingMap):
+                for key in rows.advance(steps):
+                    self._evict(map_name, rows, key, "ttl_evictions")
 
     def query_keys(self, map_name: str) -> Iterator[Any]:
         rows, _, _ = self._require_map(map_name)
         return iter(rows.keys())
 
+    def iter_batches(self, map_name: str, batch_size: int = _EXPORT_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+        rows, schema, _ = self._require_map(map_name)
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+        if isinstance(rows, _ColumnarMap):
+            return (
+                {field: rows.column(field)[start:start + batch_size].copy() for field in schema}
+                for start in range(0, len(rows), batch_size)
+            )
+        return self._dict_batches(rows, schema, batch_size)
+
+    @staticmethod
+    def _dict_batches(
+        rows: MutableMapping[Any, Dict[str, Any]],
+        schema: Dict[str, Type],
+        batch_size: int,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        values = iter(rows.values())
+        while True:
+            chunk = list(itertools.islice(values, batch_size))
+            if not chunk:
+                return
+            yield _batch_arrays(schema, {field: [row[field] for row in chunk] for field in schema})
+
+    def export(self, map_name: str, path: Union[str, IPathLike], format: str = "npz") -> None:
+        _, schema, _ = self._require_map(map_name)
+        _write_npz(path, format, self.iter_batches(map_name), _batch_arrays(schema, dict.fromkeys(schema, [])))
+
+    def insert_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for struct in structs:
+                self.insert_data(map_name, struct)
+
+    def update_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for struct in structs:
+                self.update_data(map_name, struct)
+
+    def delete_many(self, map_name: str, keys: Iterable[Any]) -> None:
+        self._require_map(map_name)
+        with self.transaction():
+            for key in keys:
+                self.delete_data(map_name, key)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        mark = len(self._undo)
+        self._tx_depth += 1
+        try:
+            yield
+        except BaseException:
+            while len(self._undo) > mark:
+                self._undo.pop()()
+            # Undone writes bypass the indexes
+            for indexes in self._indexes.values():
+                for index in indexes:
+                    index.stale = True
+            raise
+        finally:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._undo.clear()
+
+    def create_index(self, map_name: str, fields: Sequence[str], kind: str = "btree") -> None:
+        rows, schema, _ = self._require_map(map_name)
+        fields = _index_fields(schema, fields, kind)
+        indexes = self._indexes[map_name]
+        if any(index.kind == kind and index.fields == fields for index in indexes):
+            return
+        index = _MemoryIndex(kind, fields)
+        index.rebuild(rows.items())
+        indexes.append(index)
+
+    def _candidates(self, map_name: str, field_ranges: Dict[str, Tuple[Any, Any]]) -> Optional[Iterable[Any]]:
+        rows = self._maps[map_name]
+        indexes = self._indexes[map_name]
+        for index in indexes:
+            if index.stale:
+                index.rebuild(rows.items())
+        return _plan_query(indexes, field_ranges)
+
+    def query_eq(self, map_name: str, field: str, value: Any) -> Iterator[Any]:
+        rows, schema, pk = self._require_map(map_name)
+        if field not in schema:
+            raise KeyError(f"Field {field!r} not in map schema.")
+        candidates = None if value is None else self._candidates(map_name, {field: (value, value)})
+        if candidates is not None:
+            return iter([key for key in candidates if rows[key][field] == value])
+        if isinstance(rows, _ColumnarMap):
+            return iter(rows.column(pk)[rows.column(field) == value].tolist())
+        return iter([key for key, row in rows.items() if row[field] == value])
+
+    def query_range(self, map_name: str, field_ranges: Dict[str, Tuple[Any, Any]]) -> Iterator[Any]:
+        rows, schema, pk = self._require_map(map_name)
+        _check_ranges(schema, field_ranges)
+        candidates = self._candidates(map_name, field_ranges)
+        if candidates is not None:
+            return iter([key for key in candidates if _in_ranges(rows[key], field_ranges)])
+        if isinstance(rows, _ColumnarMap):
+            mask = np.ones(len(rows), dtype=np.bool_)
+            for field, (low, high) in field_ranges.items():
+                column = rows.column(field)
+                if low is not None:
+                    mask &= column >= low
+                if high is not None:
+                    mask &= column <= high
+            return iter(rows.column(pk)[mask].tolist())
+        return iter([key for key, row in rows.items() if _in_ranges(row, field_ranges)])
+
+    def snapshot(self) -> Any:
+        if self._tx_depth:
+            raise RuntimeError("Cannot snapshot a store inside a transaction.")
+        maps: Dict[str, MutableMapping[Any, Dict[str, Any]]] = {}
+        for map_name, rows in self._maps.items():
+            maps[map_name] = rows.copy()
+            if not isinstance(rows, _ColumnarMap):
+                self._private[map_name] = set()
+        indexes = {
+            map_name: [(index.kind, index.fields) for index in map_indexes]
+            for map_name, map_indexes in self._indexes.items()
+        }
+        return _MemorySnapshot(self, maps, dict(self._schemas), indexes)
+
+    def restore(self, snapshot: Any) -> None:
+        if not isinstance(snapshot, _MemorySnapshot) or snapshot.store is not self:
+            raise ValueError(f"Snapshot was not taken from store {self._name!r}.")
+        if self._tx_depth:
+            raise RuntimeError("Cannot restore a store inside a transaction.")
+        self._maps = {map_name: rows.copy() for map_name, rows in snapshot.maps.items()}
+        self._private = {
+            map_name: set() for map_name, rows in self._maps.items() if not isinstance(rows, _ColumnarMap)
+        }
+        self._schemas = dict(snapshot.schemas)
+        self._indexes = {}
+        for map_name, definitions in snapshot.indexes.items():
+            self._indexes[map_name] = [_MemoryIndex(kind, fields) for kind, fields in definitions]
+            for index in self._indexes[map_name]:
+                index.stale = True
+
+    def get_column(self, map_name: str, field: str) -> np.ndarray:
+        """
+        Values of one field across the map, in ``query_keys`` order.
+
+        Columnar maps return a read-only view of their storage that is only
+        valid until the next write to the map; other maps build an array.
+        """
+        rows, schema, _ = self._require_map(map_name)
+        if field not in schema:
+            raise KeyError(f"Field {field!r} not found in schema for map {map_name!r}.")
+        if isinstance(rows, _ColumnarMap):
+            return rows.column(field)
+        dtype = _COLUMN_DTYPES.get(schema[field], np.dtype(object))
+        values = np.empty(len(rows), dtype=dtype)
+        try:
+            for i, row in enumerate(rows.values()):
+                values[i] = row[field]
+        except (TypeError, ValueError, OverflowError):
+            # None or a value of another type, the field needs an object array
+            values = _object_array([row[field] for row in rows.values()])
+        return values
+
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        ret = super().stats(reset)
+        ret["eviction"] = {}
+        for map_name, rows in self._maps.items():
+            if isinstance(rows, _EvictingMap):
+                ret["eviction"][map_name] = {
+                    "size": len(rows),
+                    "max_entries": rows.eviction.max_entries,
+                    "ttl": rows.eviction.ttl,
+                    **rows.counts,
+                }
+                if reset:
+                    rows.counts.update(dict.fromkeys(rows.counts, 0))
+        return ret
+
     def close(self) -> None:
         self._maps.clear()
         self._schemas.clear()
+        self._indexes.clear()
 
 
 
@@ -142,36 +941,290 @@ def close(self) -> None:
 }
 
 
+def _encode_bool(value: Any) -> int:
+    return 1 if value else 0
+
+
+# Field types holding coordinate sequences, stored as packed float64 instead of CBOR
+_COORD_TYPES = (LineString, np.ndarray)
+_COORD_HEADER = np.dtype('<u8').itemsize
+
+
+def _encode_coords(value: Any) -> bytes:
+    """Pack an (N, dim) coordinate sequence as a little-endian dim header followed by float64 values."""
+    coords = np.asarray(getattr(value, 'coords', value), dtype='<f8')
+    if coords.ndim != 2:
+        raise ValueError(f"Coordinates must be a sequence of points, got shape {coords.shape}.")
+    return np.uint64(coords.shape[1]).astype('<u8').tobytes() + coords.tobytes()
+
+
+def _decode_coords(raw: bytes) -> np.ndarray:
+    """Read-only (N, dim) float64 view over a payload written by _encode_coords."""
+    dim = int(np.frombuffer(raw, dtype='<u8', count=1)[0])
+    return np.frombuffer(raw, dtype='<f8', offset=_COORD_HEADER).reshape(-1, dim)
+
+
+def _is_cbor_array(raw: bytes) -> bool:
+    # Coordinates written before packing was introduced are CBOR arrays (major type 4)
+    return 0x80 <= raw[0] <= 0x9f
+
+
+def _raw_coords(raw: Optional[bytes]) -> Optional[np.ndarray]:
+    """Coordinates of a column value, packed or CBOR, without building the geometry."""
+    if raw is None:
+        return None
+    if _is_cbor_array(raw):
+        return np.asarray(cbor2.loads(raw), dtype=np.float64)
+    return _decode_coords(raw)
+
+
+def _field_encoder(field_type: Type) -> Optional[Callable[[Any], Any]]:
+    """Encoder turning a field value into its column value, None when stored as is."""
+    if field_type in _COORD_TYPES:
+        return _encode_coords
+    if field_type not in _PY_TO_SQL:
+        return cbor2.dumps
+    if field_type is bool:
+        return _encode_bool
+    return None
+
+
+def _field_decoder(field_type: Type) -> Optional[Callable[[Any], Any]]:
+    """Decoder turning a column value back into the field value, None when read as is."""
+    if field_type is np.ndarray:
+        return lambda raw: np.array(cbor2.loads(raw)) if _is_cbor_array(raw) else _decode_coords(raw)
+    if field_type in _COORD_TYPES:
+        return lambda raw: field_type(cbor2.loads(raw) if _is_cbor_array(raw) else _decode_coords(raw))
+    if field_type not in _PY_TO_SQL:
+        return lambda raw: field_type(cbor2.loads(raw))
+    if field_type is bool:
+        return bool
+    return None
+
+
+class _MapCodec:
+    """SQL statements and field codecs of one map, compiled once in ``create_map``."""
+
+    def __init__(self, map_name: str, schema: Dict[str, Type], primary_key: str):
+        self.schema = schema
+        self.pk = primary_key
+        self.fields = tuple(schema)
+        self.index = {field: i for i, field in enumerate(self.fields)}
+        self.encoders = {field: _field_encoder(field_type) for field, field_type in schema.items()}
+        self.decoders = tuple(_field_decoder(schema[field]) for field in self.fields)
+        self._map_name = map_name
+        self._row_encoders = tuple(self.encoders[field] for field in self.fields)
+        self._plain = all(encoder is None for encoder in self._row_encoders)
+        cols = ", ".join(self.fields)
+        self.insert_sql = f"INSERT INTO {map_name} ({cols}) VALUES ({', '.join('?' * len(self.fields))})"
+        self.select_sql = f"SELECT {cols} FROM {map_name} WHERE {primary_key} = ?"
+        self.exists_sql = f"SELECT 1 FROM {map_name} WHERE {primary_key} = ?"
+        self.delete_sql = f"DELETE FROM {map_name} WHERE {primary_key} = ?"
+        self.keys_sql = f"SELECT {primary_key} FROM {map_name}"
+        self.scan_sql = f"SELECT {cols} FROM {map_name}"
+        self._update_sql: Dict[Tuple[str, ...], str] = {}
+
+    def encode_row(self, struct: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Column values of a full struct, in schema order."""
+        if self.pk not in struct:
+            raise ValueError(f"Primary key {self.pk!r} missing from struct.")
+        try:
+            values = tuple([struct[field] for field in self.fields])
+        except KeyError as exc:
+            raise ValueError(f"Field {exc.args[0]!r} missing from struct.") from None
+        if self._plain:
+            return values
+        return tuple([
+            value if encoder is None else encoder(value)
+            for value, encoder in zip(values, self._row_encoders)
+        ])
+
+    def encode_update(self, struct: Dict[str, Any]) -> Tuple[Tuple[str, ...], Tuple[Any, ...]]:
+        """Updated fields of a partial struct and the statement parameters, primary key last."""
+        if self.pk not in struct:
+            raise ValueError(f"Primary key {self.pk!r} missing from struct.")
+        fields = tuple([field for field in struct if field != self.pk])
+        params = []
+        for field in fields:
+            try:
+                encoder = self.encoders[field]
+            except KeyError:
+                raise ValueError(f"Field {field!r} not found in schema for map {self._map_name!r}.") from None
+            value = struct[field]
+            params.append(value if encoder is None else encoder(value))
+        params.append(struct[self.pk])
+        return fields, tuple(params)
+
+    def update_sql(self, fields: Tuple[str, ...]) -> str:
+        sql = self._update_sql.get(fields)
+        if sql is None:
+            assignments_str = ", ".join(f"{field} = ?" for field in fields)
+            sql = f"UPDATE {self._map_name} SET {assignments_str} WHERE {self.pk} = ?"
+            self._update_sql[fields] = sql
+        return sql
+
+
+_UNDECODED = object()
+
+
 class LazyMapping(Mapping[str, Any]):
-    """Helper for decoding SQL rows on demand according to a schema."""
-    def __init__(self, schema: Dict[str, Type], data: Tuple[Tuple[str, Any], ...]):
-        self._schema = schema
-        self._data = dict(data)
+    """
+    Helper for decoding SQL rows on demand according to a schema.
+
+    Each field is decoded on first access and the result is kept, so repeated
+    reads of e.g. a geometry field build the object once. Decoded values are
+    shared with every reader of the row and must not be mutated.
+    """
+    __slots__ = ('_codec', '_row', '_values')
+
+    def __init__(self, codec: _MapCodec, row: Tuple[Any, ...]):
+        self._codec = codec
+        self._row = row
+        self._values: Optional[List[Any]] = None
 
     def __getitem__(self, key: str) -> Any:
-        if key not in self._schema:
-            raise KeyError(f"Field {key!r} not in map schema.")
-        if key not in self._data:
-            raise KeyError(f"Field {key!r} not found in data.")
-        field_type = self._schema[key]
-        raw = self._data[key]
-        if raw is None:
-            return None
-        if field_type not in _PY_TO_SQL:
-            decoded = field_type(cbor2.loads(raw))
-            return decoded
-        if field_type is bool:
-            return bool(raw)
-        return raw
+        try:
+            i = self._codec.index[key]
+        except KeyError:
+            raise KeyError(f"Field {key!r} not in map schema.") from None
+        decoder = self._codec.decoders[i]
+        if decoder is None:
+            return self._row[i]
+        if self._values is None:
+            self._values = [_UNDECODED] * len(self._row)
+        value = self._values[i]
+        if value is _UNDECODED:
+            raw = self._row[i]
+            value = None if raw is None else decoder(raw)
+            self._values[i] = value
+        return value
+
+    def coords(self, key: str) -> Optional[np.ndarray]:
+        """
+        Coordinates of a LineString or ndarray field as a read-only (N, dim)
+        float64 array viewing the row buffer, without building the geometry.
+        """
+        try:
+            i = self._codec.index[key]
+        except KeyError:
+            raise KeyError(f"Field {key!r} not in map schema.") from None
+        if self._codec.schema[key] not in _COORD_TYPES:
+            raise TypeError(f"Field {key!r} does not hold coordinates.")
+        return _raw_coords(self._row[i])
 
     def __iter__(self) -> Iterator[str]:
-        return iter(self._schema.keys())
+        return iter(self._codec.fields)
 
     def __len__(self) -> int:
-        return len(self._schema)
+        return len(self._codec.fields)
+
+_READ_CACHE_SIZE = 4096  # decoded rows kept by SqliteStore.get_data
+_WRITE_BEHIND_LIMIT = 65536  # queued writes before write-behind producers wait for the writer
 
-class SqliteStore(IStore):
-    def __init__(self, name: str, path: PathLike):
+
+class _LockedCursor:
+    """Cursor wrapper running every statement and fetch under the lock of the shared writer connection."""
+
+    def __init__(self, cursor: sqlite3.Cursor, lock: threading.Lock):
+        self._cursor = cursor
+        self._lock = lock
+
+    def execute(self, sql: str, parameters: Any = ()) -> "_LockedCursor":
+        with self._lock:
+            self._cursor.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> "_LockedCursor":
+        with self._lock:
+            self._cursor.executemany(sql, seq_of_parameters)
+        return self
+
+    def fetchone(self) -> Any:
+        with self._lock:
+            return self._cursor.fetchone()
+
+    def fetchmany(self, size: Optional[int] = None) -> List[Any]:
+        with self._lock:
+            if size is None:
+                return self._cursor.fetchmany()
+            return self._cursor.fetchmany(size)
+
+    def fetchall(self) -> List[Any]:
+        with self._lock:
+            return self._cursor.fetchall()
+
+    def __iter__(self) -> Iterator[Any]:
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class _LockedConnection:
+    """Connection wrapper whose statements run through a ``_LockedCursor``."""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def cursor(self) -> _LockedCursor:
+        with self._lock:
+            return _LockedCursor(self._conn.cursor(), self._lock)
+
+    def execute(self, sql: str, parameters: Any = ()) -> _LockedCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> _LockedCursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+
+class _SqliteSnapshot:
+    __slots__ = ("store", "conn", "codecs")
+
+    def __init__(self, store: "SqliteStore", conn: sqlite3.Connection, codecs: Dict[str, _MapCodec]):
+        self.store = store
+        self.conn = conn
+        self.codecs = codecs
+
+
+class SqliteStore(_InstrumentedStore):
+    def __init__(
+        self,
+        name: str,
+        path: PathLike,
+        cache_size: int = _READ_CACHE_SIZE,
+        write_behind: bool = False,
+    ):
+        """
+        SQLite backed store.
+
+        ``get_data`` keeps the last ``cache_size`` rows it decoded in an LRU
+        cache keyed by (map, key); 0 disables it. Writes through the store
+        invalidate the affected rows. Writers using ``connection()`` directly
+        must call ``mark_dirty``, which drops the whole cache.
+
+        The thread creating the store owns the single writer connection.
+        Reads from other threads go through ``read_connection``, one
+        read-only connection per thread, and bypass the cache.
+
+        With ``write_behind``, ``insert_data`` and ``update_data`` outside a
+        transaction only validate the write and queue it; a background thread
+        applies the queue in batched transactions. ``get_data`` serves queued
+        rows from the queue, other threads only see them once applied.
+        ``flush()`` waits for the queue to drain and raises a RuntimeError
+        naming the map and key of every queued write that failed; each write
+        runs under its own savepoint, so the rest of its batch is still
+        applied. Every other write drains the queue first.
+        """
+        if cache_size < 0:
+            raise ValueError("Cache size cannot be negative.")
         self._name = name
         self._path = path
         path_str = self._path.as_str()
@@ -179,11 +1232,34 @@ def __init__(self, name: str, path: PathLike):
             parent = os.path.dirname(path_str)
             if parent:
                 os.makedirs(parent, exist_ok=True)
-        self._conn = sqlite3.connect(path_str, isolation_level=None)
+        # Other threads only use the writer when the database is in memory and cannot be reopened
+        self._conn = sqlite3.connect(path_str, isolation_level=None, check_same_thread=False)
         self._conn.execute("PRAGMA journal_mode = WAL;")
+        self._writer_thread = threading.get_ident()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
         self._conn.execute("PRAGMA temp_store = MEMORY;")
-        self._schemas: Dict[str, Tuple[Dict[str, Type], str]] = {}
+        self._codecs: Dict[str, _MapCodec] = {}
         self._dirty = False
+        self._tx_depth = 0
+        self._cache: OrderedDict[Tuple[str, Any], LazyMapping] = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # Write-behind queue of (seq, (map, key), sql, params) and the latest queued row of each key
+        self._conn_lock = threading.Lock()
+        self._queue_cond = threading.Condition()
+        self._queue: List[Tuple[int, Tuple[str, Any], str, Tuple[Any, ...]]] = []
+        self._overlay: Dict[Tuple[str, Any], Tuple[int, LazyMapping]] = {}
+        self._seq = 0
+        self._applying = False
+        self._closing = False
+        self._write_errors: List[Tuple[Tuple[str, Any], BaseException]] = []
+        self._writer: Optional[threading.Thread] = None
+        if write_behind:
+            self._writer = threading.Thread(target=self._write_loop, name=f"{name}-writer", daemon=True)
+            self._writer.start()
 
     def name(self) -> str:
         return self._name
@@ -195,8 +1271,16 @@ def path(self) -> PathLike:
     def type(self) -> StoreType:
         return StoreType.DATABASE
 
-    def create_map(self, map_name: str, schema: Dict[str, Type], primary_key: str) -> None:
-        if map_name in self._schemas:
+    def create_map(
+        self,
+        map_name: str,
+        schema: Dict[str, Type],
+        primary_key: str,
+        eviction: Optional[Eviction] = None,
+    ) -> None:
+        if eviction is not None:
+            raise ValueError(f"Store {self._name!r} does not support evicting maps.")
+        if map_name in self._codecs:
             raise ValueError(f"Map {map_name!r} already exists in store {self._name!r}.")
         _validate_struct(schema, primary_key)
         col_defs: List[str] = []
@@ -207,145 +1291,465 @@ def create_map(self, map_name: str, schema: Dict[str, Type], primary_key: str) -
                 col_def += " PRIMARY KEY"
             col_defs.append(col_def)
         sql = f"CREATE TABLE {map_name} ({', '.join(col_defs)})"
-        self._conn.execute(sql)
-        self._schemas[map_name] = (schema, primary_key)
+        self._drain()
+        self._execute(sql)
+        self._codecs[map_name] = _MapCodec(map_name, schema, primary_key)
 
     def delete_map(self, map_name: str) -> None:
-        if map_name not in self._schemas:
+        if map_name not in self._codecs:
             raise KeyError(f"Map {map_name!r} does not exist in store {self._name!r}.")
-        self._conn.execute(f"DROP TABLE {map_name}")
-        del self._schemas[map_name]
+        self._drain()
+        self._execute(f"DROP TABLE {map_name}")
+        del self._codecs[map_name]
+        self._cache.clear()
 
     def list_maps(self) -> List[str]:
-        return list(self._schemas.keys())
+        return list(self._codecs.keys())
 
-    def _require_schema(self, map_name: str) -> Tuple[Dict[str, Type], str]:
-        if map_name not in self._schemas:
-            raise IndexError(f"Map {map_name!r} does not exist in store {self._name!r}.")
-        return self._schemas[map_name]
+    def _require_codec(self, map_name: str) -> _MapCodec:
+        try:
+            return self._codecs[map_name]
+        except KeyError:
+            raise IndexError(f"Map {map_name!r} does not exist in store {self._name!r}.") from None
 
-    def insert_data(self, map_name: str, struct: Dict[str, Any]) -> None:
-        schema, pk = self._require_schema(map_name)
-        if pk not in struct:
-            raise ValueError(f"Primary key {pk!r} missing from struct.")
-        
-        # All schema fields must be present in the struct
-        values = []
-        for key in schema:
-            if key not in struct:
-                raise ValueError(f"Field {key!r} missing from struct.")
-            if schema[key] not in _PY_TO_SQL:
-                encoded = cbor2.dumps(struct[key])
-                values.append(encoded)
-            elif schema[key] is bool:
-                values.append(1 if struct[key] else 0)
-            else:
-                values.append(struct[key])
+    # The background writer shares the writer connection, so every use of it holds _conn_lock
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor:
+        with self._conn_lock:
+            return self._conn.execute(sql, params)
+
+    def _executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        with self._conn_lock:
+            return self._conn.executemany(sql, rows)
 
-        cols = ", ".join(schema.keys())
-        placeholders = ", ".join(["?"]*len(schema))
+    def _exists(self, codec: _MapCodec, key: Any) -> bool:
+        """Whether the database holds ``key``, through the primary key index without decoding the row."""
+        with self._conn_lock:
+            return self._conn.execute(codec.exists_sql, (key,)).fetchone() is not None
+
+    def insert_data(self, map_name: str, struct: Dict[str, Any]) -> None:
+        codec = self._require_codec(map_name)
+        values = codec.encode_row(struct)
+        if self._writer is not None and not self._tx_depth:
+            key = struct[codec.pk]
+            cache_key = (map_name, key)
+            with self._queue_cond:
+                queued = cache_key in self._overlay
+            # The overlay is checked first, a row it drops meanwhile has been applied
+            if queued or cache_key in self._cache or self._exists(codec, key):
+                raise KeyError(f"Key {key!r} already exists in map {map_name!r}.")
+            self._enqueue(map_name, key, codec.insert_sql, values, LazyMapping(codec, values))
+            return
         try:
-            self._conn.execute(
-                f"INSERT INTO {map_name} ({cols}) VALUES ({placeholders})",
-                tuple(values),
-            )
+            self._execute(codec.insert_sql, values)
         except sqlite3.IntegrityError as exc:
-            raise KeyError(f"Key {struct[pk]!r} already exists in map {map_name!r}.") from exc
+            raise KeyError(f"Key {struct[codec.pk]!r} already exists in map {map_name!r}.") from exc
         self._dirty = True
 
     def get_data(self, map_name: str, key: Any) -> Mapping[str, Any]:
-        schema, pk = self._require_schema(map_name)
-        self.flush()
-        cols = ", ".join(schema.keys())
-        cursor = self._conn.execute(
-            f"SELECT {cols} FROM {map_name} WHERE {pk} = ?",
-            (key,),
-        )
-        row = cursor.fetchone()
+        if threading.get_ident() != self._writer_thread:
+            codec = self._require_codec(map_name)
+            row = self.read_connection().execute(codec.select_sql, (key,)).fetchone()
+            if row is None:
+                raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
+            return LazyMapping(codec, row)
+        cache_key = (map_name, key)
+        if self._writer is not None:
+            with self._queue_cond:
+                queued = self._overlay.get(cache_key)
+            if queued is not None:
+                return queued[1]
+        data = self._cache.get(cache_key)
+        if data is not None:
+            self._cache.move_to_end(cache_key)
+            self._cache_hits += 1
+            return data
+        codec = self._require_codec(map_name)
+        self._commit()
+        with self._conn_lock:
+            row = self._conn.execute(codec.select_sql, (key,)).fetchone()
         if row is None:
             raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
-        return LazyMapping(schema, tuple(zip(schema.keys(), row)))
+        data = LazyMapping(codec, row)
+        self._cache_misses += 1
+        if self._cache_size:
+            self._cache[cache_key] = data
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return data
 
     def update_data(self, map_name: str, struct: Dict[str, Any]) -> None:
-        schema, pk = self._require_schema(map_name)
-        if pk not in struct:
-            raise ValueError(f"Primary key {pk!r} missing from struct.")
-        key = struct.pop(pk)
+        codec = self._require_codec(map_name)
         # All struct fields must be present in the schema
-        values = []
-        assignments = []
-        for field in struct:
-            if field not in schema:
-                raise ValueError(f"Field {field!r} not found in schema for map {map_name!r}.")
-            if schema[field] not in _PY_TO_SQL:
-                encoded = cbor2.dumps(struct[field])
-                values.append(encoded)
-            elif schema[field] is bool:
-                values.append(1 if struct[field] else 0)
-            else:
-                values.append(struct[field])
-            assignments.append(f"{field} = ?")
-        
-        assignments_str = ", ".join(assignments)
+        fields, params = codec.encode_update(struct)
+        if self._writer is not None and not self._tx_depth:
+            current = self.get_data(map_name, params[-1])
+            row = list(cast(LazyMapping, current)._row)
+            for field, value in zip(fields, params):
+                row[codec.index[field]] = value
+            self._cache.pop((map_name, params[-1]), None)
+            self._enqueue(map_name, params[-1], codec.update_sql(fields), params, LazyMapping(codec, tuple(row)))
+            return
         try:
-            cursor = self._conn.execute(
-                f"UPDATE {map_name} SET {assignments_str} WHERE {pk} = ?",
-                tuple(values + [key]),
-            )
+            cursor = self._execute(codec.update_sql(fields), params)
         except sqlite3.IntegrityError as exc:
             raise ValueError(f"Unexpected error occurred while updating map {map_name!r}.") from exc
         if cursor.rowcount == 0:
-            raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
+            raise KeyError(f"Key {params[-1]!r} not found in map {map_name!r}.")
+        self._cache.pop((map_name, params[-1]), None)
         self._dirty = True
 
     def delete_data(self, map_name: str, key: Any) -> None:
-        schema, pk = self._require_schema(map_name)
+        codec = self._require_codec(map_name)
         self.flush()
         try:
-            cursor = self._conn.execute(
-                f"DELETE FROM {map_name} WHERE {pk} = ?",
-                (key,),
-            )
+            cursor = self._execute(codec.delete_sql, (key,))
         except sqlite3.IntegrityError as exc:
             raise ValueError(f"Unexpected error occurred while deleting from map {map_name!r}.") from exc
         if cursor.rowcount == 0:
             raise KeyError(f"Key {key!r} not found in map {map_name!r}.")
+        # Deletes may cascade to rows of other maps through foreign keys
+        self._cache.clear()
         self._dirty = True
 
+    def insert_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        codec = self._require_codec(map_name)
+        rows = [codec.encode_row(struct) for struct in structs]
+        with self.transaction():
+            try:
+                self._executemany(codec.insert_sql, rows)
+            except sqlite3.IntegrityError as exc:
+                raise KeyError(f"Key conflict while inserting into map {map_name!r}.") from exc
+        self._dirty = True
+
+    def update_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        codec = self._require_codec(map_name)
+        rows = [codec.encode_update(struct) for struct in structs]
+        for _, params in rows:
+            self._cache.pop((map_name, params[-1]), None)
+        with self.transaction():
+            # One executemany per run of structs updating the same fields, keeping the write order
+            for fields, run in itertools.groupby(rows, key=lambda row: row[0]):
+                params = [values for _, values in run]
+                try:
+                    cursor = self._executemany(codec.update_sql(fields), params)
+                except sqlite3.IntegrityError as exc:
+                    raise ValueError(f"Unexpected error occurred while updating map {map_name!r}.") from exc
+                if cursor.rowcount != len(params):
+                    raise KeyError(f"Some keys were not found in map {map_name!r}.")
+        self._dirty = True
+
+    def delete_many(self, map_name: str, keys: Iterable[Any]) -> None:
+        codec = self._require_codec(map_name)
+        params = [(key,) for key in keys]
+        with self.transaction():
+            try:
+                cursor = self._executemany(codec.delete_sql, params)
+            except sqlite3.IntegrityError as exc:
+                raise ValueError(f"Unexpected error occurred while deleting from map {map_name!r}.") from exc
+            if cursor.rowcount != len(params):
+                raise KeyError(f"Some keys were not found in map {map_name!r}.")
+        self._cache.clear()
+        self._dirty = True
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        savepoint = f"gamms_tx_{self._tx_depth}"
+        if self._tx_depth == 0:
+            self.flush()
+            self._execute("BEGIN")
+        else:
+            self._execute(f"SAVEPOINT {savepoint}")
+        self._tx_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._tx_depth -= 1
+            # Rows read inside the transaction may hold rolled back values
+            self._cache.clear()
+            if self._tx_depth == 0:
+                self._execute("ROLLBACK")
+            else:
+                self._execute(f"ROLLBACK TO {savepoint}")
+                self._execute(f"RELEASE {savepoint}")
+            raise
+        self._tx_depth -= 1
+        if self._tx_depth == 0:
+            self._execute("COMMIT")
+        else:
+            self._execute(f"RELEASE {savepoint}")
+
+    def tick(self, steps: int = 1) -> None:
+        # No map of this backend evicts rows
+        pass
+
     def query_keys(self, map_name: str) -> Iterator[Any]:
-        schema, pk = self._require_schema(map_name)
+        codec = self._require_codec(map_name)
         self.flush()
-        cursor = self._conn.execute(
-            f"SELECT {pk} FROM {map_name}"
+        cursor = self.read_connection().execute(codec.keys_sql)
+        pk_type = codec.schema[codec.pk]
+        while True:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            yield pk_type(row[0])
+
+    def iter_batches(self, map_name: str, batch_size: int = _EXPORT_BATCH_SIZE) -> Iterator[Dict[str, np.ndarray]]:
+        codec = self._require_codec(map_name)
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+        return self._sql_batches(codec, batch_size)
+
+    def _sql_batches(self, codec: _MapCodec, batch_size: int) -> Iterator[Dict[str, np.ndarray]]:
+        self.flush()
+        cursor = self.read_connection().execute(codec.scan_sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            columns: Dict[str, List[Any]] = {}
+            for i, field in enumerate(codec.fields):
+                decoder = _raw_coords if codec.schema[field] in _COORD_TYPES else codec.decoders[i]
+                if decoder is None:
+                    columns[field] = [row[i] for row in rows]
+                else:
+                    columns[field] = [None if row[i] is None else decoder(row[i]) for row in rows]
+            yield _batch_arrays(codec.schema, columns)
+
+    def export(self, map_name: str, path: Union[str, IPathLike], format: str = "npz") -> None:
+        codec = self._require_codec(map_name)
+        empty = _batch_arrays(codec.schema, dict.fromkeys(codec.schema, []))
+        _write_npz(path, format, self.iter_batches(map_name), empty)
+
+    def create_index(self, map_name: str, fields: Sequence[str], kind: str = "btree") -> None:
+        """
+        Create an SQLite index over ``fields``.
+
+        SQLite only has B-tree indexes, so every kind maps to one over the
+        given columns; a spatial index narrows on its first coordinate.
+        """
+        codec = self._require_codec(map_name)
+        fields = _index_fields(codec.schema, fields, kind)
+        self._drain()
+        self._execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{map_name}_{'_'.join(fields)} ON {map_name} ({', '.join(fields)})"
         )
-        pk_type = schema[pk]
+
+    def _query_pks(self, codec: _MapCodec, where: str, params: Tuple[Any, ...]) -> Iterator[Any]:
+        self.flush()
+        cursor = self.read_connection().execute(f"{codec.keys_sql} WHERE {where}", params)
+        pk_type = codec.schema[codec.pk]
         while True:
             row = cursor.fetchone()
             if row is None:
                 break
             yield pk_type(row[0])
 
+    def _encode_value(self, codec: _MapCodec, field: str, value: Any) -> Any:
+        encoder = codec.encoders[field]
+        return value if encoder is None else encoder(value)
+
+    def query_eq(self, map_name: str, field: str, value: Any) -> Iterator[Any]:
+        codec = self._require_codec(map_name)
+        if field not in codec.schema:
+            raise KeyError(f"Field {field!r} not in map schema.")
+        if value is None:
+            return self._query_pks(codec, f"{field} IS NULL", ())
+        return self._query_pks(codec, f"{field} = ?", (self._encode_value(codec, field, value),))
+
+    def query_range(self, map_name: str, field_ranges: Dict[str, Tuple[Any, Any]]) -> Iterator[Any]:
+        codec = self._require_codec(map_name)
+        _check_ranges(codec.schema, field_ranges)
+        clauses: List[str] = []
+        params: List[Any] = []
+        for field, (low, high) in field_ranges.items():
+            if low is None and high is None:
+                clauses.append(f"{field} IS NOT NULL")
+            if low is not None:
+                clauses.append(f"{field} >= ?")
+                params.append(self._encode_value(codec, field, low))
+            if high is not None:
+                clauses.append(f"{field} <= ?")
+                params.append(self._encode_value(codec, field, high))
+        return self._query_pks(codec, " AND ".join(clauses) or "1", tuple(params))
+
+    def snapshot(self) -> Any:
+        """Copy the database into an in-memory one with the SQLite online backup API."""
+        if self._tx_depth:
+            raise RuntimeError("Cannot snapshot a store inside a transaction.")
+        self.flush()
+        copy = sqlite3.connect(":memory:")
+        with self._conn_lock:
+            self._conn.backup(copy)
+        return _SqliteSnapshot(self, copy, dict(self._codecs))
+
+    def restore(self, snapshot: Any) -> None:
+        if not isinstance(snapshot, _SqliteSnapshot) or snapshot.store is not self:
+            raise ValueError(f"Snapshot was not taken from store {self._name!r}.")
+        if self._tx_depth:
+            raise RuntimeError("Cannot restore a store inside a transaction.")
+        self.flush()
+        with self._conn_lock:
+            snapshot.conn.backup(self._conn)
+        self._codecs = dict(snapshot.codecs)
+        self._cache.clear()
+
     # ---- generic extension methods --------------------------------------
 
     def connection(self) -> sqlite3.Connection:
+        if self._stats is not None:
+            return cast(sqlite3.Connection, _TimedConnection(self._conn, self._stats))
         return self._conn
 
     def cursor(self) -> sqlite3.Cursor:
-        return self._conn.cursor()
+        return self.connection().cursor()
+
+    def read_connection(self) -> sqlite3.Connection:
+        """
+        Connection for reads from the calling thread.
+
+        The writer thread reads through the writer connection and sees its own
+        uncommitted writes. Any other thread gets a read-only connection of
+        its own to the WAL database, which sees what the writer has committed:
+        writes made outside ``transaction()`` once ``flush()`` has run on the
+        writer thread, and a transaction's writes once it commits. An
+        in-memory database cannot be opened twice, so every thread shares the
+        writer connection and its uncommitted writes. Reads through the writer
+        connection hold the store's connection lock for each statement and
+        fetch, so they never run concurrently with another use of it.
+        """
+        path_str = self._path.as_str()
+        if threading.get_ident() == self._writer_thread or path_str == ":memory:":
+            conn: Any = _LockedConnection(self._conn, self._conn_lock)
+            if self._stats is not None:
+                return cast(sqlite3.Connection, _TimedConnection(conn, self._stats))
+            return cast(sqlite3.Connection, conn)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Closed from the writer thread by close()
+            conn = sqlite3.connect(path_str, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON;")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        if self._stats is not None:
+            return cast(sqlite3.Connection, _TimedConnection(conn, self._stats))
+        return conn
+
+    # ---- write-behind ---------------------------------------------------
+
+    def _enqueue(self, map_name: str, key: Any, sql: str, params: Tuple[Any, ...], row: LazyMapping) -> None:
+        with self._queue_cond:
+            while len(self._queue) >= _WRITE_BEHIND_LIMIT:
+                self._queue_cond.wait()
+            self._seq += 1
+            self._queue.append((self._seq, (map_name, key), sql, params))
+            self._overlay[(map_name, key)] = (self._seq, row)
+            self._queue_cond.notify_all()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closing:
+                    self._queue_cond.wait()
+                if not self._queue:
+                    return
+                batch, self._queue = self._queue, []
+                self._applying = True
+                self._queue_cond.notify_all()
+            failed: List[Tuple[Tuple[str, Any], BaseException]] = []
+            with self._conn_lock:
+                try:
+                    self._conn.execute("BEGIN")
+                    # A savepoint per write, so a failing write leaves the rest of the batch applied
+                    for _, cache_key, sql, params in batch:
+                        self._conn.execute("SAVEPOINT gamms_write")
+                        try:
+                            self._conn.execute(sql, params)
+                        except sqlite3.Error as exc:
+                            self._conn.execute("ROLLBACK TO gamms_write")
+                            failed.append((cache_key, exc))
+                        self._conn.execute("RELEASE gamms_write")
+                    self._conn.execute("COMMIT")
+                except Exception as exc:
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    failed = [(cache_key, exc) for _, cache_key, _, _ in batch]
+            with self._queue_cond:
+                # Rows queued again meanwhile stay in the overlay
+                for seq, cache_key, _, _ in batch:
+                    queued = self._overlay.get(cache_key)
+                    if queued is not None and queued[0] <= seq:
+                        del self._overlay[cache_key]
+                self._write_errors.extend(failed)
+                self._applying = False
+                self._queue_cond.notify_all()
+
+    def _drain(self) -> None:
+        """Wait until the background writer has applied every queued write."""
+        if self._writer is None:
+            return
+        with self._queue_cond:
+            while self._queue or self._applying:
+                self._queue_cond.wait()
+            errors, self._write_errors = self._write_errors, []
+        if errors:
+            # Reads of the failed writes already fell back to the database
+            self._cache.clear()
+            failed = ", ".join(f"key {key!r} of map {map_name!r}" for (map_name, key), _ in errors[:5])
+            if len(errors) > 5:
+                failed += f" and {len(errors) - 5} more"
+            raise RuntimeError(f"Queued writes to store {self._name!r} failed for {failed}.") from errors[0][1]
 
     def flush(self) -> None:
-        if self._dirty:
-            self._conn.commit()
+        if threading.get_ident() == self._writer_thread:
+            self._drain()
+        self._commit()
+
+    def _commit(self) -> None:
+        # Committing here would end an open transaction() early
+        if self._dirty and not self._tx_depth and threading.get_ident() == self._writer_thread:
+            with self._conn_lock:
+                self._conn.commit()
             self._dirty = False
 
     def mark_dirty(self) -> None:
         """Mark pending writes that bypassed the IStore API.
 
         Consumers using ``connection()`` / ``cursor()`` directly should call
-        this so subsequent reads ``flush()`` first.
+        this so subsequent reads ``flush()`` first and do not see stale cached rows.
         """
         self._dirty = True
+        self._cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Hit and miss counts of the ``get_data`` read cache, with its current and maximum size."""
+        return {
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
+            'size': len(self._cache),
+            'capacity': self._cache_size,
+        }
+
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        ret = super().stats(reset)
+        ret['cache'] = self.cache_stats()
+        if reset:
+            self._cache_hits = self._cache_misses = 0
+        return ret
 
     def close(self) -> None:
-        self.flush()
-        self._conn.close()
\ No newline at end of file
+        try:
+            self.flush()
+        finally:
+            if self._writer is not None:
+                with self._queue_cond:
+                    self._closing = True
+                    self._queue_cond.notify_all()
+                self._writer.join()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._conn_lock:
+            self._conn.close()
\ No newline at end of file
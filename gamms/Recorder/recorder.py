@@ -33,6 +33,9 @@ def _record_switch_case(ctx: IContext, opCode: OpCodes, data: JsonType) -> None:
     elif opCode == OpCodes.AGENT_CURRENT_NODE:
         ctx.logger.info(f"Agent {data['agent_name']} moved to node {data['node_id']}")
         ctx.agent.get_agent(data["agent_name"]).current_node_id = data["node_id"]
+    elif opCode == OpCodes.AGENT_MOVE_MANY:
+        ctx.logger.info(f"Moving {len(data['agent_names'])} agents")
+        ctx.agent.move_many(data["agent_names"], data["node_ids"])
     elif opCode == OpCodes.AGENT_PREV_NODE:
         ctx.agent.get_agent(data["agent_name"]).prev_node_id = data["node_id"]
     elif opCode == OpCodes.AGENT_ORIENTATION:
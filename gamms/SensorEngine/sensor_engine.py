@@ -42,18 +42,23 @@ def create_sensor(self, sensor_id: str, sensor_type: SensorType, **kwargs: Dict[
                 self.ctx, sensor_id, sensor_type,
                 sensor_range=float('inf'),
                 fov=2 * math.pi,
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.RANGE:
             sensor = MapSensor(
                 self.ctx, sensor_id, sensor_type,
                 sensor_range=cast(float, kwargs.get('sensor_range', 30.0)),
                 fov=2 * math.pi,
+                incremental=cast(bool, kwargs.get('incremental', False)),
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.ARC:
             sensor = MapSensor(
                 self.ctx, sensor_id, sensor_type,
                 sensor_range=cast(float, kwargs.get('sensor_range', 30.0)),
                 fov=cast(float, kwargs.get('fov', 2 * math.pi)),
+                incremental=cast(bool, kwargs.get('incremental', False)),
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.AGENT:
             sensor = AgentSensor(
@@ -79,6 +84,7 @@ def create_sensor(self, sensor_id: str, sensor_type: SensorType, **kwargs: Dict[
                 sensor_range=cast(float, kwargs.get('sensor_range', 100.0)),
                 fov=cast(float, kwargs.get('fov', math.pi / 3)),
                 quat=cast(tuple, kwargs.get('quat', (0.0, 0.0, 1.0, 0.0))),
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.AERIAL_AGENT:
             sensor = AerialAgentSensor(
@@ -93,6 +99,7 @@ def create_sensor(self, sensor_id: str, sensor_type: SensorType, **kwargs: Dict[
                 sensor_range=cast(float, kwargs.get('sensor_range', float('inf'))),
                 fov=cast(float, kwargs.get('fov', 2 * math.pi)),
                 observer_height=cast(float, kwargs.get('observer_height', 1.6)),
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.OCCLUDED_AGENT:
             sensor = OccludedAgentSensor(
@@ -107,6 +114,7 @@ def create_sensor(self, sensor_id: str, sensor_type: SensorType, **kwargs: Dict[
                 sensor_range=cast(float, kwargs.get('sensor_range', 100.0)),
                 fov=cast(float, kwargs.get('fov', math.pi / 3)),
                 quat=cast(tuple, kwargs.get('quat', (math.sqrt(0.5), 0.0, math.sqrt(0.5), 0.0))),
+                compact=cast(bool, kwargs.get('compact', False)),
             )
         elif sensor_type == SensorType.OCCLUDED_AERIAL_AGENT:
             sensor = OccludedAerialAgentSensor(
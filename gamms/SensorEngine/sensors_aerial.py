@@ -3,11 +3,13 @@
 import math
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 
+import numpy as np
+
+from gamms.SensorEngine.sensors_basic import _CachedSensor, _detached, _fetch_edges, _map_arrays
 from gamms.typing import (
     AgentType,
     IAerialAgent,
     IContext,
-    ISensor,
     Node,
     OSMEdge,
     SensorType,
@@ -39,7 +41,11 @@ def quaternion_to_direction(
     )
 
 
-class AerialSensor(ISensor):
+# Slack on cosine comparisons, so points on the cone boundary are not lost to rounding
+_COS_EPS = 1e-9
+
+
+class AerialSensor(_CachedSensor):
     def __init__(
         self,
         ctx: IContext,
@@ -47,13 +53,17 @@ def __init__(
         sensor_range: float,
         fov: float = math.pi / 3,
         quat: Tuple[float, float, float, float] = (math.sqrt(0.5), 0.0, math.sqrt(0.5), 0.0),
+        compact: bool = False,
     ):
         """
         Downward-facing conic sensor for aerial agents.
+
+        ``compact`` selects the NumPy array output format described on MapSensor.
         """
         self._sensor_id = sensor_id
         self.ctx = ctx
-        self._data: Dict[str, Union[Dict[int, Node], List[OSMEdge]]] = {}
+        self.compact = compact
+        self._data: Dict[str, Union[Dict[int, Node], List[OSMEdge], np.ndarray]] = {}
         self._owner: Optional[str] = None
         self.range = sensor_range
         self.fov = min(fov, math.pi * 0.9)
@@ -68,8 +78,8 @@ def type(self) -> SensorType:
         return SensorType.AERIAL
 
     @property
-    def data(self) -> Dict[str, Union[Dict[int, Node], List[OSMEdge]]]:
-        return self._data
+    def data(self) -> Dict[str, Union[Dict[int, Node], List[OSMEdge], np.ndarray]]:
+        return _detached(self._data)
 
     def set_owner(self, owner: Union[str, None]) -> None:
         if owner is not None:
@@ -78,40 +88,58 @@ def set_owner(self, owner: Union[str, None]) -> None:
                 raise ValueError("Owner of AerialSensor must be an aerial agent")
         self._owner = owner
 
-    def sense(self, node_id: int) -> None:
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        if self._owner is None:
+            return (None, self.compact)
+        agent = cast(IAerialAgent, self.ctx.agent.get_agent(self._owner))
+        return (
+            self._owner, agent.position, agent.quat, self.quat,
+            self.ctx.graph.graph.version,
+            self.range, self.fov, self.compact,
+        )
+
+    def _sense(self, node_id: int) -> None:
         if self._owner is None:
-            self._data = {'nodes': {}, 'edges': []}
+            self._data = _map_arrays({}, []) if self.compact else {'nodes': {}, 'edges': []}
             return
         agent = cast(IAerialAgent, self.ctx.agent.get_agent(self._owner))
         orientation = multiply_quaternions(agent.quat, self.quat)
         fx, fy, fz = quaternion_to_direction(orientation)
         x, y, z = agent.position
-        half_angle = self.fov / 2
-
-        sensed_nodes: Dict[int, Node] = {}
-        sensed_edges: List[OSMEdge] = []
-
-        for edge_id in self.ctx.graph.graph.get_edges(d=self.range, x=x, y=y):
-            edge = self.ctx.graph.graph.get_edge(edge_id)
-            source = self.ctx.graph.graph.get_node(edge.source)
-            target = self.ctx.graph.graph.get_node(edge.target)
-
-            normsq = (source.x - x)**2 + (source.y - y)**2 + z**2
-            cosine = (source.x - x) * fx + (source.y - y) * fy - z * fz
-            angle = math.acos(max(min(cosine / math.sqrt(normsq), 1.0), -1.0)) if normsq != 0 else 2 * math.pi
-            sbool = (normsq <= self.range**2) and (angle <= half_angle)
-
-            normsq = (target.x - x)**2 + (target.y - y)**2 + z**2
-            cosine = (target.x - x) * fx + (target.y - y) * fy - z * fz
-            angle = math.acos(max(min(cosine / math.sqrt(normsq), 1.0), -1.0)) if normsq != 0 else 2 * math.pi
-            tbool = (normsq <= self.range**2) and (angle <= half_angle)
+        cos_half = math.cos(self.fov / 2) - _COS_EPS
+
+        edges, nodes = _fetch_edges(self.ctx, self.ctx.graph.graph.get_edges(d=self.range, x=x, y=y))
+        candidates = list(nodes.values())
+        xy = np.array([(node.x, node.y) for node in candidates], dtype=np.float64).reshape(-1, 2)
+        dx = xy[:, 0] - x
+        dy = xy[:, 1] - y
+        normsq = dx * dx + dy * dy + z * z
+        cosine = dx * fx + dy * fy - z * fz
+        # angle <= half_angle is cosine / |v| >= cos(half_angle), so no acos is needed
+        visible = (normsq <= self.range**2) & (normsq != 0) & (cosine >= cos_half * np.sqrt(normsq))
+
+        if self.compact:
+            node_ids = np.fromiter(nodes, dtype=np.int64, count=len(nodes))[visible]
+            edge_ids = np.fromiter((edge.id for edge in edges), dtype=np.int64, count=len(edges))
+            edge_source = np.fromiter((edge.source for edge in edges), dtype=np.int64, count=len(edges))
+            edge_target = np.fromiter((edge.target for edge in edges), dtype=np.int64, count=len(edges))
+            keep = np.isin(edge_source, node_ids) & np.isin(edge_target, node_ids)
+            self._data = {
+                'node_ids': node_ids,
+                'node_xy': xy[visible],
+                'edge_ids': edge_ids[keep],
+                'edge_source': edge_source[keep],
+                'edge_target': edge_target[keep],
+            }
+            return
 
-            if sbool:
-                sensed_nodes[source.id] = source
-            if tbool:
-                sensed_nodes[target.id] = target
-            if sbool and tbool:
-                sensed_edges.append(edge)
+        sensed_nodes: Dict[int, Node] = {
+            node.id: node for node, seen in zip(candidates, visible.tolist()) if seen
+        }
+        sensed_edges: List[OSMEdge] = [
+            edge for edge in edges
+            if edge.source in sensed_nodes and edge.target in sensed_nodes
+        ]
 
         self._data = {'nodes': sensed_nodes, 'edges': sensed_edges}
 
@@ -119,7 +147,7 @@ def update(self, data: Dict[str, Any]) -> None:
         pass
 
 
-class AerialAgentSensor(ISensor):
+class AerialAgentSensor(_CachedSensor):
     def __init__(
         self,
         ctx: IContext,
@@ -146,7 +174,7 @@ def type(self) -> SensorType:
 
     @property
     def data(self) -> Dict[str, Tuple[AgentType, Tuple[float, float, float]]]:
-        return self._data
+        return _detached(self._data)
 
     def set_owner(self, owner: Union[str, None]) -> None:
         agent = self.ctx.agent.get_agent(owner) if owner else None
@@ -155,7 +183,17 @@ def set_owner(self, owner: Union[str, None]) -> None:
                 raise ValueError("Owner of AerialAgentSensor must be an aerial agent")
         self._owner = owner
 
-    def sense(self, node_id: int) -> None:
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        if self._owner is None:
+            return (None,)
+        agent = cast(IAerialAgent, self.ctx.agent.get_agent(self._owner))
+        return (
+            self._owner, agent.position, agent.quat, self.quat,
+            self.ctx.agent.movement_epoch,
+            self.range, self.fov,
+        )
+
+    def _sense(self, node_id: int) -> None:
         if self._owner is None:
             self._data = {}
             return
@@ -164,25 +202,26 @@ def sense(self, node_id: int) -> None:
         fx, fy, fz = quaternion_to_direction(quat)
         x, y, z = agent.position
 
+        half_angle = self.fov / 2
+        cos_half = math.cos(half_angle) - _COS_EPS
+        range_sq = self.range**2
+
         sensed_agents: Dict[str, Tuple[AgentType, Tuple[float, float, float]]] = {}
-        for other in self.ctx.agent.create_iter():
+        # The 3D range bounds the horizontal distance, so the index prunes candidates
+        for other, agent_pos in self.ctx.agent.query_agents(x, y, self.range):
             if other.name == self._owner:
                 continue
-            if other.type == AgentType.AERIAL:
-                agent_pos = cast(IAerialAgent, other).position
-            elif other.type == AgentType.BASIC:
-                agent_node = self.ctx.graph.graph.get_node(other.current_node_id)
-                agent_pos = (agent_node.x, agent_node.y, 0.0)
-            else:
+            if other.type not in (AgentType.AERIAL, AgentType.BASIC):
                 raise RuntimeError(f"Unknown agent type {other.type} for agent {other.name}")
 
             dx = agent_pos[0] - x
             dy = agent_pos[1] - y
             dz = agent_pos[2] - z
             distance_3d = dx**2 + dy**2 + dz**2
+            if distance_3d == 0 or distance_3d > range_sq:
+                continue
             cosine = dx * fx + dy * fy + dz * fz
-            angle = math.acos(max(min(cosine / math.sqrt(distance_3d), 1.0), -1.0)) if distance_3d != 0 else 2 * math.pi
-            if (distance_3d <= self.range**2) and (angle <= self.fov / 2):
+            if half_angle >= math.pi or cosine >= cos_half * math.sqrt(distance_3d):
                 sensed_agents[other.name] = (other.type, agent_pos)
 
         self._data = sensed_agents
@@ -1,7 +1,10 @@
 """Basic ground-level sensors: NeighborSensor, MapSensor, AgentSensor."""
 
 import math
-from typing import Any, Dict, List, Optional, Tuple, Union
+from abc import abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
 
 from gamms.typing import (
     IContext,
@@ -12,7 +15,94 @@
 )
 
 
-class NeighborSensor(ISensor):
+def _fetch_edges(ctx: IContext, edge_iter: Iterable[int]) -> Tuple[List[OSMEdge], Dict[int, Node]]:
+    """Fetch the edges of ``edge_iter`` along with each of their endpoints, every node exactly once."""
+    graph = ctx.graph.graph
+    edges: List[OSMEdge] = []
+    nodes: Dict[int, Node] = {}
+    for edge_id in edge_iter:
+        edge = graph.get_edge(edge_id)
+        edges.append(edge)
+        if edge.source not in nodes:
+            nodes[edge.source] = graph.get_node(edge.source)
+        if edge.target not in nodes:
+            nodes[edge.target] = graph.get_node(edge.target)
+    return edges, nodes
+
+
+def _map_arrays(nodes: Dict[int, Node], edges: List[OSMEdge]) -> Dict[str, np.ndarray]:
+    """Pack sensed nodes and edges into the compact array output format."""
+    return {
+        'node_ids': np.fromiter(nodes, dtype=np.int64, count=len(nodes)),
+        'node_xy': np.array([(node.x, node.y) for node in nodes.values()], dtype=np.float64).reshape(-1, 2),
+        'edge_ids': np.fromiter((edge.id for edge in edges), dtype=np.int64, count=len(edges)),
+        'edge_source': np.fromiter((edge.source for edge in edges), dtype=np.int64, count=len(edges)),
+        'edge_target': np.fromiter((edge.target for edge in edges), dtype=np.int64, count=len(edges)),
+    }
+
+
+def _detached(data: Any) -> Any:
+    """Copy sensed data down to the containers it holds, so callers cannot alter a cached result."""
+    if isinstance(data, list):
+        return list(data)
+    return {
+        key: value.copy() if isinstance(value, (dict, list, np.ndarray)) else value
+        for key, value in data.items()
+    }
+
+
+class _CachedSensor(ISensor):
+    """
+    Sensor that remembers the inputs its last result was computed from.
+
+    Subclasses implement ``_sense`` and ``_inputs``. ``sense`` keeps the
+    previous result whenever ``_inputs`` returns the same tuple as last time,
+    so ``data`` hands out a copy of it rather than the cached result itself.
+    """
+    _last_inputs: Optional[Tuple[Any, ...]] = None
+
+    @abstractmethod
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        """Everything the result sensed at ``node_id`` depends on, compared by equality."""
+
+    @abstractmethod
+    def _sense(self, node_id: int) -> None:
+        """Sense at ``node_id`` and store the result in ``_data``."""
+
+    def sense(self, node_id: int) -> None:
+        inputs = self._inputs(node_id)
+        if inputs == self._last_inputs:
+            return
+        self._sense(node_id)
+        self._last_inputs = inputs
+
+    @classmethod
+    def sense_many(cls, sensors: List["_CachedSensor"], node_ids: List[int]) -> None:
+        """
+        Sense for several sensors of this class, each at its own node.
+
+        ``AgentEngine.step_all`` hands every sensor of a class to this in one
+        call. Subclasses with a vectorized kernel override it to share work
+        across the group; the default senses one sensor after the other.
+        """
+        for sensor, node_id in zip(sensors, node_ids):
+            sensor.sense(node_id)
+
+
+def _owner_orientation(
+    ctx: IContext, owner: Optional[str], orientation: Tuple[float, float],
+) -> Tuple[float, float]:
+    """Rotate the sensor ``orientation`` by the heading of its owner, if any."""
+    if owner is None:
+        return orientation
+    owner_orientation = ctx.agent.get_agent(owner).orientation
+    return (
+        orientation[0] * owner_orientation[0] - orientation[1] * owner_orientation[1],
+        orientation[0] * owner_orientation[1] + orientation[1] * owner_orientation[0],
+    )
+
+
+class NeighborSensor(_CachedSensor):
     def __init__(self, ctx: IContext, sensor_id: str, sensor_type: SensorType):
         self._sensor_id = sensor_id
         self.ctx = ctx
@@ -30,12 +120,15 @@ def type(self) -> SensorType:
 
     @property
     def data(self):
-        return self._data
+        return _detached(self._data)
 
     def set_owner(self, owner: Union[str, None]) -> None:
         self._owner = owner
 
-    def sense(self, node_id: int) -> None:
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return (node_id, self.ctx.graph.graph.version)
+
+    def _sense(self, node_id: int) -> None:
         nearest_neighbors = {node_id}
         for nid in self.ctx.graph.graph.get_neighbors(node_id):
             nearest_neighbors.add(nid)
@@ -45,7 +138,33 @@ def update(self, data: Dict[str, Any]) -> None:
         pass
 
 
-class MapSensor(ISensor):
+def _annulus_tiles(
+    x: float, y: float, r: float, d: float,
+) -> Optional[List[Tuple[float, float, float]]]:
+    """
+    Squares ``(cx, cy, half_width)`` covering every point whose distance to
+    (x, y) lies in [r - d, r + d]. Squares of half-width 2d are centred on the
+    circle of radius r, spaced so that 2r·sin(θ/4) <= d. Returns None when the
+    ring is the whole disc (r <= 0 or d >= r) or when the squares cover more
+    area than the full (2r)² query they replace.
+    """
+    if d == 0:
+        return []
+    if r <= 0 or d >= r:
+        return None
+    half_width = 2 * d
+    theta = 4 * math.asin(min(1.0, d / (2 * r)))
+    n = math.ceil(2 * math.pi / theta)
+    if n * half_width**2 >= r**2:
+        return None
+    step = 2 * math.pi / n
+    return [
+        (x + r * math.cos(k * step), y + r * math.sin(k * step), half_width)
+        for k in range(n)
+    ]
+
+
+class MapSensor(_CachedSensor):
     def __init__(
         self,
         ctx: IContext,
@@ -54,10 +173,22 @@ def __init__(
         sensor_range: float,
         fov: float,
         orientation: Tuple[float, float] = (1.0, 0.0),
+        incremental: bool = False,
+        compact: bool = False,
     ):
         """
         Acts as a map sensor (range == inf), a range sensor (fov == 2π),
         or a unidirectional sensor (fov < 2π). FOV/orientation in radians.
+
+        With ``incremental`` set, the sensor keeps the disc of nodes and edges
+        within range of the previous observer position and only re-queries the
+        ring that can change when the observer moves a short distance. Large
+        moves and graph mutations fall back to a full recompute.
+
+        With ``compact`` set, ``data`` holds NumPy arrays instead of Node and
+        OSMEdge objects: ``node_ids`` (N,), ``node_xy`` (N, 2), ``edge_ids``,
+        ``edge_source`` and ``edge_target`` (M,). Edge geometry is not copied;
+        fetch it on demand with ``ctx.graph.graph.get_edge(edge_id)``.
         """
         self.ctx = ctx
         self._sensor_id = sensor_id
@@ -66,8 +197,15 @@ def __init__(
         self.fov = fov
         norm = math.sqrt(orientation[0]**2 + orientation[1]**2)
         self.orientation = (orientation[0] / norm, orientation[1] / norm)
-        self._data: Dict[str, Union[Dict[int, Node], List[OSMEdge]]] = {}
+        self.incremental = incremental
+        self.compact = compact
+        self._data: Dict[str, Union[Dict[int, Node], List[OSMEdge], np.ndarray]] = {}
         self._owner: Optional[str] = None
+        # Range-only result at the last observer position (incremental mode)
+        self._disc_nodes: Dict[int, Node] = {}
+        self._disc_edges: Dict[int, OSMEdge] = {}
+        self._disc_center: Optional[Tuple[float, float]] = None
+        self._disc_version = -1
 
     @property
     def sensor_id(self) -> str:
@@ -78,60 +216,130 @@ def type(self) -> SensorType:
         return self._type
 
     @property
-    def data(self) -> Dict[str, Union[Dict[int, Node], List[OSMEdge]]]:
-        return self._data
+    def data(self) -> Dict[str, Union[Dict[int, Node], List[OSMEdge], np.ndarray]]:
+        return _detached(self._data)
 
     def set_owner(self, owner: Union[str, None]) -> None:
         self._owner = owner
 
-    def sense(self, node_id: int) -> None:
-        current_node = self.ctx.graph.graph.get_node(node_id)
-        if self._owner is not None:
-            owner_orientation = self.ctx.agent.get_agent(self._owner).orientation
-            orientation_used = (
-                self.orientation[0] * owner_orientation[0] - self.orientation[1] * owner_orientation[1],
-                self.orientation[0] * owner_orientation[1] + self.orientation[1] * owner_orientation[0],
-            )
+    def _publish(self, sensed_nodes: Dict[int, Node], sensed_edges: List[OSMEdge]) -> None:
+        if self.compact:
+            self._data = _map_arrays(sensed_nodes, sensed_edges)
         else:
-            orientation_used = self.orientation
+            self._data = {'nodes': sensed_nodes, 'edges': sensed_edges}
+
+    def _scan_disc(self, edge_iter: Iterator[int], x: float, y: float, seen: Set[int]) -> None:
+        """Reclassify the edges of ``edge_iter`` against the disc at (x, y), patching the disc cache."""
+        edges, nodes = _fetch_edges(self.ctx, (eid for eid in edge_iter if eid not in seen))
+        range_sq = self.range ** 2
+        for nid, node in nodes.items():
+            if (node.x - x)**2 + (node.y - y)**2 <= range_sq:
+                self._disc_nodes[nid] = node
+            else:
+                self._disc_nodes.pop(nid, None)
+        for edge in edges:
+            seen.add(edge.id)
+            if edge.source in self._disc_nodes and edge.target in self._disc_nodes:
+                self._disc_edges[edge.id] = edge
+            else:
+                self._disc_edges.pop(edge.id, None)
+
+    def _update_disc(self, x: float, y: float) -> None:
+        """Bring the disc cache to the observer position (x, y)."""
+        graph = self.ctx.graph.graph
+        seen: Set[int] = set()
+        tiles = None
+        if self._disc_center is not None and self._disc_version == graph.version:
+            if self.range == float('inf'):
+                tiles = []
+            else:
+                moved = math.sqrt((x - self._disc_center[0])**2 + (y - self._disc_center[1])**2)
+                tiles = _annulus_tiles(x, y, self.range, moved)
+        if tiles is None:
+            self._disc_nodes.clear()
+            self._disc_edges.clear()
+            if self.range == float('inf'):
+                self._scan_disc(graph.get_edges(), x, y, seen)
+            else:
+                self._scan_disc(graph.get_edges(d=self.range, x=x, y=y), x, y, seen)
+        else:
+            # Only nodes in the ring between r - moved and r + moved can enter or leave the disc
+            for cx, cy, half_width in tiles:
+                self._scan_disc(graph.get_edges(d=half_width, x=cx, y=cy), x, y, seen)
+        self._disc_center = (x, y)
+        self._disc_version = graph.version
+
+    def _filter_nodes(
+        self,
+        nodes: Dict[int, Node],
+        node_id: int,
+        current_node: Node,
+        orientation_used: Tuple[float, float],
+        range_sq: float,
+    ) -> Dict[int, Node]:
+        """Keep the nodes within range and inside the field of view. The sensing node is always in view."""
+        full_fov = self.fov == 2 * math.pi or orientation_used == (0.0, 0.0)
+        heading = math.atan2(orientation_used[1], orientation_used[0])
+        sensed_nodes: Dict[int, Node] = {}
+        for nid, node in nodes.items():
+            if (node.x - current_node.x)**2 + (node.y - current_node.y)**2 > range_sq:
+                continue
+            if not full_fov and nid != node_id:
+                angle = math.atan2(node.y - current_node.y, node.x - current_node.x) - heading + math.pi
+                angle = (angle % (2 * math.pi)) - math.pi
+                if abs(angle) > self.fov / 2:
+                    continue
+            sensed_nodes[nid] = node
+        return sensed_nodes
+
+    def _sense_incremental(self, node_id: int, current_node: Node, orientation_used: Tuple[float, float]) -> None:
+        self._update_disc(current_node.x, current_node.y)
+        if self.fov == 2 * math.pi or orientation_used == (0.0, 0.0):
+            sensed_nodes = dict(self._disc_nodes)
+        else:
+            sensed_nodes = self._filter_nodes(self._disc_nodes, node_id, current_node, orientation_used, float('inf'))
+        sensed_edges = [
+            edge for edge in self._disc_edges.values()
+            if edge.source in sensed_nodes and edge.target in sensed_nodes
+        ]
+        self._publish(sensed_nodes, sensed_edges)
+
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return (
+            node_id,
+            _owner_orientation(self.ctx, self._owner, self.orientation),
+            self.ctx.graph.graph.version,
+            self.range, self.fov, self.compact,
+        )
+
+    def _sense(self, node_id: int) -> None:
+        current_node = self.ctx.graph.graph.get_node(node_id)
+        orientation_used = _owner_orientation(self.ctx, self._owner, self.orientation)
+
+        if self.incremental:
+            self._sense_incremental(node_id, current_node, orientation_used)
+            return
 
         if self.range == float('inf'):
             edge_iter = self.ctx.graph.graph.get_edges()
         else:
             edge_iter = self.ctx.graph.graph.get_edges(d=self.range, x=current_node.x, y=current_node.y)
 
-        sensed_nodes: Dict[int, Node] = {}
-        sensed_edges: List[OSMEdge] = []
-
         range_sq = self.range ** 2 if self.range != float('inf') else float('inf')
+        edges, nodes = _fetch_edges(self.ctx, edge_iter)
+        sensed_nodes = self._filter_nodes(nodes, node_id, current_node, orientation_used, range_sq)
+        sensed_edges = [
+            edge for edge in edges
+            if edge.source in sensed_nodes and edge.target in sensed_nodes
+        ]
 
-        for edge_id in edge_iter:
-            edge = self.ctx.graph.graph.get_edge(edge_id)
-            source = self.ctx.graph.graph.get_node(edge.source)
-            target = self.ctx.graph.graph.get_node(edge.target)
-            sbool = (source.x - current_node.x)**2 + (source.y - current_node.y)**2 <= range_sq
-            tbool = (target.x - current_node.x)**2 + (target.y - current_node.y)**2 <= range_sq
-            if not (self.fov == 2 * math.pi or orientation_used == (0.0, 0.0)):
-                angle = math.atan2(source.y - current_node.y, source.x - current_node.x) - math.atan2(orientation_used[1], orientation_used[0]) + math.pi
-                angle = (angle % (2 * math.pi)) - math.pi
-                sbool &= (abs(angle) <= self.fov / 2) or (source.id == node_id)
-                angle = math.atan2(target.y - current_node.y, target.x - current_node.x) - math.atan2(orientation_used[1], orientation_used[0]) + math.pi
-                angle = (angle % (2 * math.pi)) - math.pi
-                tbool &= (abs(angle) <= self.fov / 2) or (target.id == node_id)
-            if sbool:
-                sensed_nodes[source.id] = source
-            if tbool:
-                sensed_nodes[target.id] = target
-            if sbool and tbool:
-                sensed_edges.append(edge)
-
-        self._data = {'nodes': sensed_nodes, 'edges': sensed_edges}
+        self._publish(sensed_nodes, sensed_edges)
 
     def update(self, data: Dict[str, Any]) -> None:
         pass
 
 
-class AgentSensor(ISensor):
+class AgentSensor(_CachedSensor):
     def __init__(
         self,
         ctx: IContext,
@@ -161,39 +369,37 @@ def type(self) -> SensorType:
 
     @property
     def data(self) -> Dict[str, int]:
-        return self._data
+        return _detached(self._data)
 
     def set_owner(self, owner: Union[str, None]) -> None:
         self._owner = owner
 
-    def sense(self, node_id: int) -> None:
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return (
+            node_id,
+            self._owner,
+            _owner_orientation(self.ctx, self._owner, self.orientation),
+            self.ctx.graph.graph.version,
+            self.ctx.agent.movement_epoch,
+            self.range, self.fov,
+        )
+
+    def _sense(self, node_id: int) -> None:
         current_node = self.ctx.graph.graph.get_node(node_id)
-        if self._owner is not None:
-            owner_orientation = self.ctx.agent.get_agent(self._owner).orientation
-            orientation_used = (
-                self.orientation[0] * owner_orientation[0] - self.orientation[1] * owner_orientation[1],
-                self.orientation[0] * owner_orientation[1] + self.orientation[1] * owner_orientation[0],
-            )
-        else:
-            orientation_used = self.orientation
+        orientation_used = _owner_orientation(self.ctx, self._owner, self.orientation)
 
         sensed_agents: Dict[str, int] = {}
-        range_sq = self.range ** 2 if self.range != float('inf') else float('inf')
 
-        for agent in self.ctx.agent.create_iter():
+        for agent, (ax, ay, _) in self.ctx.agent.query_agents(current_node.x, current_node.y, self.range):
             if agent.name == self._owner:
                 continue
-            agent_node = self.ctx.graph.graph.get_node(agent.current_node_id)
-            distance_sq = (agent_node.x - current_node.x)**2 + (agent_node.y - current_node.y)**2
-
-            if distance_sq <= range_sq:
-                if self.fov == 2 * math.pi or orientation_used == (0.0, 0.0):
+            if self.fov == 2 * math.pi or orientation_used == (0.0, 0.0):
+                sensed_agents[agent.name] = agent.current_node_id
+            else:
+                angle = math.atan2(ay - current_node.y, ax - current_node.x) - math.atan2(orientation_used[1], orientation_used[0]) + math.pi
+                angle = (angle % (2 * math.pi)) - math.pi
+                if abs(angle) <= self.fov / 2 or agent.current_node_id == node_id:
                     sensed_agents[agent.name] = agent.current_node_id
-                else:
-                    angle = math.atan2(agent_node.y - current_node.y, agent_node.x - current_node.x) - math.atan2(orientation_used[1], orientation_used[0]) + math.pi
-                    angle = (angle % (2 * math.pi)) - math.pi
-                    if abs(angle) <= self.fov / 2 or agent.current_node_id == node_id:
-                        sensed_agents[agent.name] = agent.current_node_id
 
         self._data = sensed_agents
 
@@ -187,6 +187,19 @@ def _apply_occlusion(
     return visible
 
 
+def _filter_arrays(data: dict, visible: np.ndarray) -> dict:
+    """Compact-format counterpart of _filter_data."""
+    node_ids = data['node_ids'][visible]
+    keep = np.isin(data['edge_source'], node_ids) & np.isin(data['edge_target'], node_ids)
+    return {
+        'node_ids': node_ids,
+        'node_xy': data['node_xy'][visible],
+        'edge_ids': data['edge_ids'][keep],
+        'edge_source': data['edge_source'][keep],
+        'edge_target': data['edge_target'][keep],
+    }
+
+
 def _filter_data(data: dict, node_ids: list, visible: np.ndarray) -> dict:
     """Rebuild sensor _data keeping only visible nodes and edges between them."""
     visible_ids = {node_ids[i] for i, v in enumerate(visible) if v}
@@ -213,12 +226,29 @@ def __init__(
         fov: float,
         orientation: Tuple[float, float] = (1.0, 0.0),
         observer_height: float = 1.6,
+        compact: bool = False,
     ) -> None:
-        super().__init__(ctx, sensor_id, sensor_type, sensor_range, fov, orientation)
+        super().__init__(ctx, sensor_id, sensor_type, sensor_range, fov, orientation, compact=compact)
         self.observer_height = observer_height
 
-    def sense(self, node_id: int) -> None:
-        super().sense(node_id)
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return super()._inputs(node_id) + (self.ctx.graph.obstacle_version, self.observer_height)
+
+    def _sense(self, node_id: int) -> None:
+        super()._sense(node_id)
+        if self.compact:
+            node_xy = cast(np.ndarray, self._data['node_xy'])
+            if not len(node_xy):
+                return
+            current_node = self.ctx.graph.graph.get_node(node_id)
+            obs = np.array((current_node.x, current_node.y, self.observer_height), dtype=float)
+            targets = np.column_stack((node_xy, np.full(len(node_xy), self.observer_height)))
+            visible = _apply_occlusion(
+                obs, targets,
+                _iter_faces(self.ctx, current_node.x, current_node.y, self.range),
+            )
+            self._data = _filter_arrays(self._data, visible)
+            return
         nodes: Dict[int, Node] = cast(Dict[int, Node], self._data.get('nodes'))
         if not nodes:
             return
@@ -255,8 +285,11 @@ def __init__(
         super().__init__(ctx, sensor_id, sensor_type, sensor_range, fov, orientation, owner)
         self.observer_height = observer_height
 
-    def sense(self, node_id: int) -> None:
-        super().sense(node_id)
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return super()._inputs(node_id) + (self.ctx.graph.obstacle_version, self.observer_height)
+
+    def _sense(self, node_id: int) -> None:
+        super()._sense(node_id)
         if not self._data:
             return
 
@@ -276,10 +309,25 @@ def sense(self, node_id: int) -> None:
 class OccludedAerialSensor(AerialSensor):
     """AerialSensor that drops ground nodes/edges occluded by obstacle faces."""
 
-    def sense(self, node_id: int) -> None:
-        super().sense(node_id)
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return super()._inputs(node_id) + (self.ctx.graph.obstacle_version,)
+
+    def _sense(self, node_id: int) -> None:
+        super()._sense(node_id)
         if self._owner is None:
             return
+        if self.compact:
+            node_xy = cast(np.ndarray, self._data['node_xy'])
+            if not len(node_xy):
+                return
+            origin = cast(IAerialAgent, self.ctx.agent.get_agent(self._owner)).position
+            targets = np.column_stack((node_xy, np.zeros(len(node_xy))))
+            visible = _apply_occlusion(
+                np.array(origin, dtype=float), targets,
+                _iter_faces(self.ctx, origin[0], origin[1], self.range),
+            )
+            self._data = _filter_arrays(self._data, visible)
+            return
         nodes: Dict[int, Node] = cast(Dict[int, Node], self._data.get('nodes'))
         if not nodes:
             return
@@ -301,8 +349,11 @@ def sense(self, node_id: int) -> None:
 class OccludedAerialAgentSensor(AerialAgentSensor):
     """AerialAgentSensor that drops occluded agents — early exit per agent."""
 
-    def sense(self, node_id: int) -> None:
-        super().sense(node_id)
+    def _inputs(self, node_id: int) -> Tuple[Any, ...]:
+        return super()._inputs(node_id) + (self.ctx.graph.obstacle_version,)
+
+    def _sense(self, node_id: int) -> None:
+        super()._sense(node_id)
         if self._owner is None:
             return
         if not self._data:
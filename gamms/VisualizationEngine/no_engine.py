@@ -44,7 +44,8 @@ def remove_artist(self, name: str):
     def simulate(self):
         if self.ctx.record.record():
             self.ctx.record.write(opCode=OpCodes.SIMULATE, data={})
-        return
+        # Each simulation step ages the rows of TTL maps
+        self.ctx.ictx.memory.tick()
     
     def human_input(self, agent_name: str, state: Dict[str, Any]) -> Union[int, Tuple[float, float, float]]:
         agent = self.ctx.agent.get_agent(agent_name)
@@ -800,6 +800,8 @@ def simulate(self):
 
         while self._waiting_simulation and not self._will_quit:
             self.update()
+        # Each simulation step ages the rows of TTL maps
+        self.ctx.ictx.memory.tick()
 
     def terminate(self):
         self._pygame.quit()
@@ -3,6 +3,7 @@
 import gamms.GraphEngine.graph_engine as graph
 import gamms.VisualizationEngine as visual
 import gamms.MemoryEngine as memory
+import gamms.ComputationEngine as compute
 from gamms.Recorder.recorder import Recorder
 from gamms.context import Context
 from gamms.internal_context import InternalContext
@@ -20,6 +21,10 @@ def create_context(
     vis_engine: Enum = visual.Engine.NO_VIS,
     vis_kwargs: Optional[Dict[str, Any]] = None,
     logger_config: Optional[Dict[str, Any]] = None,
+    graph_kwargs: Optional[Dict[str, Any]] = None,
+    compute_engine: Optional[Enum] = None,
+    compute_kwargs: Optional[Dict[str, Any]] = None,
+    agent_kwargs: Optional[Dict[str, Any]] = None,
 ) -> Context:
     _logger = logging.getLogger("gamms")
     if logger_config is None:
@@ -34,16 +39,26 @@ def create_context(
     else:
         raise NotImplementedError(f"Visualization engine {vis_engine} not implemented")
     
-    agent_engine = agent.AgentEngine(ctx)
+    if agent_kwargs is None:
+        agent_kwargs = {}
+    agent_engine = agent.AgentEngine(ctx, **agent_kwargs)
     sensor_engine = sensor.SensorEngine(ctx)
     memory_engine = memory.MemoryEngine()
+    if compute_engine is None:
+        compute_instance = None
+    else:
+        if compute_kwargs is None:
+            compute_kwargs = {}
+        compute_instance = compute.ComputeEngine(engine=compute_engine, engine_kwargs=compute_kwargs)
     ctx.internal_context = InternalContext(
-        compute_engine=None,
+        compute_engine=compute_instance,
         memory_engine=memory_engine,
         message_engine=None,
     )
     ctx.agent_engine = agent_engine
-    ctx.graph_engine = graph.GraphEngine(ctx, engine=graph_engine)
+    if graph_kwargs is None:
+        graph_kwargs = {}
+    ctx.graph_engine = graph.GraphEngine(ctx, engine=graph_engine, **graph_kwargs)
     ctx.visual_engine = visual_engine
     ctx.sensor_engine = sensor_engine
     ctx.recorder = Recorder(ctx)
@@ -0,0 +1,76 @@
+import math
+from typing import Dict, Generic, Hashable, Iterator, Set, Tuple, TypeVar
+
+_K = TypeVar('_K', bound=Hashable)
+
+
+class SpatialHash(Generic[_K]):
+    """
+    Uniform grid bucketing keys by their (x, y) position.
+
+    Queries return every key whose position lies inside the axis aligned
+    square of half-width ``d`` around (x, y), plus possibly some keys from the
+    same border cells. Callers needing exact distances filter the result.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("Cell size must be positive.")
+        self._cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[_K]] = {}
+        self._key_cell: Dict[_K, Tuple[int, int]] = {}
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self._cell_size), math.floor(y / self._cell_size))
+
+    def update(self, key: _K, x: float, y: float) -> None:
+        """Insert ``key`` at (x, y) or move it there."""
+        cell = self._cell(x, y)
+        old_cell = self._key_cell.get(key)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(key, old_cell)
+        self._cells.setdefault(cell, set()).add(key)
+        self._key_cell[key] = cell
+
+    def remove(self, key: _K) -> None:
+        """Remove ``key``. Unknown keys are ignored."""
+        cell = self._key_cell.pop(key, None)
+        if cell is not None:
+            self._discard(key, cell)
+
+    def _discard(self, key: _K, cell: Tuple[int, int]) -> None:
+        bucket = self._cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self._cells[cell]
+
+    def query(self, x: float, y: float, d: float) -> Iterator[_K]:
+        """Yield the keys in the cells overlapping the square of half-width ``d`` around (x, y)."""
+        if math.isinf(d):
+            yield from list(self._key_cell)
+            return
+        cx_min, cy_min = self._cell(x - d, y - d)
+        cx_max, cy_max = self._cell(x + d, y + d)
+        # Walk whichever is smaller: the cells under the query square or the occupied cells
+        if (cx_max - cx_min + 1) * (cy_max - cy_min + 1) > len(self._cells):
+            for (cx, cy), bucket in list(self._cells.items()):
+                if cx_min <= cx <= cx_max and cy_min <= cy <= cy_max:
+                    yield from list(bucket)
+            return
+        for cx in range(cx_min, cx_max + 1):
+            for cy in range(cy_min, cy_max + 1):
+                bucket = self._cells.get((cx, cy))
+                if bucket is not None:
+                    yield from list(bucket)
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._key_cell.clear()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._key_cell
+
+    def __len__(self) -> int:
+        return len(self._key_cell)
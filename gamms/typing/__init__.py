@@ -1,11 +1,11 @@
 from gamms.typing.compute_engine import IComputeEngine, ITask
-from gamms.typing.memory_engine import IMemoryEngine, IStore, IPathLike, StoreType
+from gamms.typing.memory_engine import IMemoryEngine, IStore, IPathLike, StoreType, Eviction, LRU, TTL
 from gamms.typing.message_engine import IMessageEngine
 from gamms.typing.internal_context import IInternalContext
 from gamms.typing.sensor_engine import ISensorEngine, ISensor, SensorType
 from gamms.typing.artist import IArtist, ArtistType
 from gamms.typing.visualization_engine import IVisualizationEngine, ColorType
-from gamms.typing.agent_engine import IAgentEngine, IAgent, IAerialAgent, AgentType
+from gamms.typing.agent_engine import IAgentEngine, IAgent, IAerialAgent, AgentType, StrategyError
 from gamms.typing.graph_engine import IGraphEngine, IGraph, OSMEdge, Node, ObsFace
 from gamms.typing.recorder import IRecorder
 from gamms.typing.logger import ILogger
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Iterable, Dict, Any, Optional, Callable, Tuple
+from typing import Iterable, Iterator, Dict, Any, List, Optional, Callable, Sequence, Tuple, Union
 from gamms.typing.sensor_engine import ISensor
 
 from enum import IntEnum
@@ -11,6 +11,18 @@ class AgentType(IntEnum):
     BASIC = 0
     AERIAL = 1
 
+class StrategyError(RuntimeError):
+    """
+    Raised when the strategies of one or more agents fail during a step.
+
+    Attributes:
+        errors (Dict[str, BaseException]): The exception raised by the strategy of each failed agent.
+    """
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        names = ", ".join(errors)
+        super().__init__(f"Strategy failed for agents: {names}")
+
 class IAgent(ABC):
     """
     Abstract base class representing an agent in the system.
@@ -233,6 +245,161 @@ def create_iter(self) -> Iterable[IAgent]:
         """
         pass
 
+    @abstractmethod
+    def step_all(self, agents: Optional[Iterable[str]] = None) -> None:
+        """
+        Step several agents at once with simultaneous moves.
+
+        All agents sense first, then every strategy runs, then all actions
+        are validated and only if every one of them is valid are they
+        committed. No agent therefore sees a move another agent made in the
+        same step, and an invalid action leaves every agent in place.
+
+        If the context has a compute engine, the strategies run as tasks on
+        it and the step waits for all of them before validating any action.
+        With a process backend the strategies and their states are pickled
+        to the workers, so strategies must be module level functions or
+        other picklable callables, and only the state they return is seen
+        by the agents.
+
+        Every strategy runs even if another one fails. The time each
+        strategy took is available from ``strategy_times`` afterwards.
+
+        Args:
+            agents (Optional[Iterable[str]]): Names of the agents to step.
+                Defaults to every agent with a strategy.
+
+        Raises:
+            StrategyError: If any strategy raised. No agent is moved.
+            KeyError: If an agent does not exist, or an action is not a valid node ID.
+            AttributeError: If a named agent has no strategy.
+            TypeError: If an action has the wrong type.
+            ValueError: If an action is malformed, or moves to a node that is not
+                adjacent while the engine only allows adjacent moves.
+        """
+        pass
+
+    @abstractmethod
+    def move_many(self, agents: Sequence[Union[str, int]], node_ids: Union[Sequence[int], int]) -> None:
+        """
+        Move several agents to nodes at once.
+
+        Each agent's previous node becomes its current node and its current
+        node the matching entry of ``node_ids``. The move is recorded as a
+        single batch rather than one entry per agent and attribute. Agents and
+        targets are all validated first, so either every agent moves or none.
+
+        Args:
+            agents (Sequence[Union[str, int]]): Agent names, or with the array
+                engine also their row indices.
+            node_ids (Union[Sequence[int], int]): Target node ID for each agent,
+                or one node ID for all of them.
+
+        Raises:
+            KeyError: If an agent or a target node does not exist.
+            ValueError: If an agent is aerial, or node_ids does not match agents in length.
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def strategy_times(self) -> Dict[str, float]:
+        """
+        Get the time in seconds each strategy took in the last ``step_all``.
+
+        Returns:
+            Dict[str, float]: Strategy run time keyed by agent name.
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def movement_epoch(self) -> int:
+        """
+        Get the agent movement counter.
+
+        The counter is incremented whenever an agent is created, deleted or changes position,
+        so consumers caching agent positions can detect that they went stale.
+
+        Returns:
+            int: The current movement epoch.
+        """
+        pass
+
+    @abstractmethod
+    def query_agents(self, x: float, y: float, r: float) -> Iterator[Tuple[IAgent, Tuple[float, float, float]]]:
+        """
+        Find the agents within a horizontal distance of a point.
+
+        Agent positions are kept in a spatial index that is refreshed whenever an agent moves,
+        so the cost depends on the number of agents near the point rather than the total.
+        Basic agents are located at their current node with z = 0.
+
+        Args:
+            x (float): The x-coordinate of the query point.
+            y (float): The y-coordinate of the query point.
+            r (float): The query radius in the x-y plane. May be infinite.
+
+        Returns:
+            Iterator[Tuple[IAgent, Tuple[float, float, float]]]: Pairs of agent and its (x, y, z) position.
+        """
+        pass
+
+    @abstractmethod
+    def agents_at(self, node_id: int) -> List[IAgent]:
+        """
+        Get the basic agents currently at a node.
+
+        Basic agents are kept in a node occupancy index that is updated whenever
+        they move, so the lookup does not scan the agents. Aerial agents are not
+        bound to nodes and are not indexed.
+
+        Args:
+            node_id (int): The node to look at.
+
+        Returns:
+            List[IAgent]: The agents at the node, in the order they arrived.
+        """
+        pass
+
+    @abstractmethod
+    def co_located(self, team_a: Iterable[str], team_b: Iterable[str]) -> List[Tuple[IAgent, IAgent]]:
+        """
+        Find the pairs of agents of two teams that share a node.
+
+        The cost is linear in the sizes of the teams plus the number of pairs found,
+        rather than in the product of the team sizes.
+
+        Args:
+            team_a (Iterable[str]): Names of the agents of the first team.
+            team_b (Iterable[str]): Names of the agents of the second team.
+
+        Returns:
+            List[Tuple[IAgent, IAgent]]: Pairs of an agent of ``team_a`` and an agent
+                of ``team_b`` at the same node. An agent is never paired with itself.
+        """
+        pass
+
+    @abstractmethod
+    def agents_within_hops(self, node_id: int, k: int) -> List[Tuple[IAgent, int]]:
+        """
+        Find the basic agents at most ``k`` hops away from a node.
+
+        Hops follow the graph's neighbors of each node, that is its outgoing edges.
+
+        Args:
+            node_id (int): The node to search from.
+            k (int): The maximum number of hops. 0 gives the agents at the node itself.
+
+        Returns:
+            List[Tuple[IAgent, int]]: Pairs of agent and its hop distance, nearest first.
+
+        Raises:
+            ValueError: If k is negative.
+            KeyError: If k is positive and the node does not exist in the graph.
+        """
+        pass
+
     @abstractmethod
     def create_agent(self, name:str, **kwargs: Dict[str, Any]) -> IAgent:
         """
@@ -1,8 +1,6 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-
-from abc import ABC, abstractmethod
-from enum import Enum
+from typing import Any
 
 
 class ITask(ABC):
@@ -36,6 +34,17 @@ def status(self) -> Enum:
         """
         pass
 
+    @property
+    @abstractmethod
+    def result(self) -> Any:
+        """
+        Get the value returned by the task's function.
+
+        Returns:
+            Any: The return value, or None if the task has not completed.
+        """
+        pass
+
     @abstractmethod
     def run(self) -> None:
         """
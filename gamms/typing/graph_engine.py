@@ -11,10 +11,12 @@ class Engine(Enum):
 
     Attributes:
         MEMORY: In-memory graph engine.
-        SQLITE: SQLite-based graph engine.        
+        SQLITE: SQLite-based graph engine.
+        SHARED: Read-only view of a graph another process published to shared memory.
     """
     MEMORY = 0
     SQLITE = 1
+    SHARED = 2
 
 class Node:
     """
@@ -75,6 +77,20 @@ class IGraph(ABC):
     The graph consists of nodes and edges, allowing for addition, removal, and retrieval of these elements.
     """
 
+    @property
+    @abstractmethod
+    def version(self) -> int:
+        """
+        Get the mutation counter of the graph.
+
+        The counter is incremented every time a node or edge is added, updated or removed,
+        so consumers caching graph data can detect that it went stale.
+
+        Returns:
+            int: The current version of the graph.
+        """
+        pass
+
     @abstractmethod
     def add_node(self, node_data: Dict[str, Any]) -> None:
         """
@@ -231,6 +247,19 @@ def get_node(self, node_id: int) -> Node:
         """
         pass
 
+    @abstractmethod
+    def has_node(self, node_id: int) -> bool:
+        """
+        Check whether a node exists without loading it.
+
+        Args:
+            node_id (int): The unique identifier of the node.
+
+        Returns:
+            bool: True if the node exists in the graph.
+        """
+        pass
+
     @abstractmethod
     def get_edge(self, edge_id: int) -> OSMEdge:
         """
@@ -285,6 +314,72 @@ def graph(self) -> IGraph:
         """
         pass
 
+    @abstractmethod
+    def snapshot(self) -> Any:
+        """
+        Capture the graph and its obstacle faces, for example at the start of an episode.
+
+        Returns:
+            Any: An opaque object to pass back to ``restore`` on this engine, any number of times.
+
+        Raises:
+            RuntimeError: If the graph is read-only or a transaction is open on its store.
+        """
+        pass
+
+    @abstractmethod
+    def restore(self, snapshot: Any) -> None:
+        """
+        Bring the graph and its obstacle faces back to a snapshot.
+
+        The indexes of the graph are rebuilt, and ``graph.version`` and
+        ``obstacle_version`` advance rather than go back, so anything cached
+        against the versions, such as sensor results, is recomputed.
+
+        Args:
+            snapshot (Any): An object returned by ``snapshot`` on this engine.
+
+        Raises:
+            ValueError: If the snapshot was not taken from this engine.
+            RuntimeError: If the graph is read-only or a transaction is open on its store.
+        """
+        pass
+
+    @abstractmethod
+    def get_heading(self, source_id: int, target_id: int) -> Tuple[float, float]:
+        """
+        Get the unit direction from one node to another.
+
+        Headings are kept in a table keyed by node pair, so each pair is computed
+        once until the graph changes.
+
+        Args:
+            source_id (int): The node the direction starts from.
+            target_id (int): The node the direction points to.
+
+        Returns:
+            Tuple[float, float]: The unit vector (dx, dy) from source to target,
+                or (0.0, 0.0) if both nodes are at the same position.
+
+        Raises:
+            KeyError: If either node does not exist.
+        """
+        pass
+
+    @property
+    @abstractmethod
+    def obstacle_version(self) -> int:
+        """
+        Get the mutation counter of the obstacle faces.
+
+        The counter is incremented every time an obstacle face is added or removed,
+        so occlusion results computed earlier can be detected as stale.
+
+        Returns:
+            int: The current version of the obstacle faces.
+        """
+        pass
+
     @abstractmethod
     def add_obstacle_face(
         self,
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, Mapping
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Mapping, Union
 from enum import IntEnum
 
 
@@ -9,9 +9,8 @@ class StoreType(IntEnum):
 
     Attributes:
         MEMORY: Pure in-memory store backed by Python dictionaries.
-        FILESYSTEM: Filesystem-backed store (kept for compatibility with the
-            previous artefact-style API). Not used by the structured
-            map/table backends.
+        FILESYSTEM: Append-only log store memory-mapping a single segment
+            file, reading rows in place.
         DATABASE: SQLite-backed store with on-disk persistence.
     """
     MEMORY = 0
@@ -43,6 +42,54 @@ def exists(self) -> bool:
         pass
 
 
+class Eviction:
+    """
+    Bound on the rows of a map, passed to ``IStore.create_map``.
+
+    Policies combine with ``|``: ``LRU(1000) | TTL(50)`` keeps at most 1000
+    rows, none of them older than 50 steps.
+
+    Attributes:
+        max_entries (Optional[int]): Rows kept before the least recently read
+            or written one is evicted.
+        ttl (Optional[int]): Steps of ``IStore.tick`` a row is kept after it
+            was last written. Stores of the memory engine tick once per
+            ``IVisualizationEngine.simulate`` call.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[int] = None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("Eviction max_entries must be at least 1.")
+        if ttl is not None and ttl < 1:
+            raise ValueError("Eviction ttl must be at least 1 step.")
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def __or__(self, other: "Eviction") -> "Eviction":
+        if not isinstance(other, Eviction):
+            return NotImplemented
+        def tighter(a: Optional[int], b: Optional[int]) -> Optional[int]:
+            return b if a is None else a if b is None else min(a, b)
+        return Eviction(tighter(self.max_entries, other.max_entries), tighter(self.ttl, other.ttl))
+
+    def __repr__(self) -> str:
+        return f"Eviction(max_entries={self.max_entries!r}, ttl={self.ttl!r})"
+
+
+class LRU(Eviction):
+    """Evict the least recently read or written row once a map holds more than ``max_entries`` rows."""
+
+    def __init__(self, max_entries: int):
+        super().__init__(max_entries=max_entries)
+
+
+class TTL(Eviction):
+    """Evict rows ``steps`` ticks after they were last written."""
+
+    def __init__(self, steps: int):
+        super().__init__(ttl=steps)
+
+
 class IStore(ABC):
     """
     Abstract base class representing a structured storage instance.
@@ -77,7 +124,13 @@ def type(self) -> StoreType:
         pass
 
     @abstractmethod
-    def create_map(self, map_name: str, schema: Dict[str, Type], primary_key: str) -> None:
+    def create_map(
+        self,
+        map_name: str,
+        schema: Dict[str, Type],
+        primary_key: str,
+        eviction: Optional[Eviction] = None,
+    ) -> None:
         """
         Create a new key/value map within the store.
 
@@ -85,9 +138,14 @@ def create_map(self, map_name: str, schema: Dict[str, Type], primary_key: str) -
             map_name: Unique name of the map within this store.
             schema: Defines the schema for the map.
             primary_key: The key to use as the primary key for the map. It needs to be unique within the map.
+            eviction: Optional bound on the rows of the map, such as ``LRU(max_entries)``
+                or ``TTL(steps)``. Evicted rows are dropped as if deleted. A TTL
+                counts calls to ``tick``, which the memory engine makes for its
+                stores once per simulation step, on ``ctx.visual.simulate()``.
 
         Raises:
-            ValueError: If a map with the given name already exists.
+            ValueError: If a map with the given name already exists, or the
+                backend does not support the requested eviction.
             TypeError: If there is unsupported strutures in the schema.
             IndexError: If the primary key is not found in the schema or is not indexable
         """
@@ -186,6 +244,236 @@ def query_keys(self, map_name: str) -> Iterator[Any]:
         """
         pass
 
+    @abstractmethod
+    def insert_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        """
+        Insert several entries into a map as a single transaction.
+
+        Either every struct is inserted or, if any of them fails, none is.
+
+        Args:
+            map_name: Name of the target map.
+            structs: The structs to insert, in order.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If a primary key already exists.
+            ValueError: If there is an issue with a struct
+        """
+        pass
+
+    @abstractmethod
+    def update_many(self, map_name: str, structs: Iterable[Dict[str, Any]]) -> None:
+        """
+        Update several entries of a map as a single transaction.
+
+        Either every struct is applied or, if any of them fails, none is.
+
+        Args:
+            map_name: Name of the target map.
+            structs: The structs to apply, in order. Each must carry the primary key.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If a primary key is not found in the map.
+            ValueError: If there is an issue with a struct
+        """
+        pass
+
+    @abstractmethod
+    def delete_many(self, map_name: str, keys: Iterable[Any]) -> None:
+        """
+        Delete several keys from a map as a single transaction.
+
+        Either every key is deleted or, if any of them is missing, none is.
+
+        Args:
+            map_name: Name of the target map.
+            keys: The keys to delete.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If a key is not found in the map.
+        """
+        pass
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        """
+        Group writes into one atomic unit.
+
+        Used as ``with store.transaction(): ...``. Data writes made inside the block are
+        committed together when it exits and rolled back if it raises. Transactions nest;
+        an inner block that raises only undoes its own writes.
+        """
+        pass
+
+    @abstractmethod
+    def create_index(self, map_name: str, fields: Sequence[str], kind: str = "btree") -> None:
+        """
+        Create a secondary index over fields of a map.
+
+        Creating an index that already exists does nothing. Indexes only
+        speed up ``query_eq`` and ``query_range``, which also work without one.
+
+        Args:
+            map_name: Name of the target map.
+            fields: The indexed fields, most selective first. A single field name is accepted.
+            kind: ``"btree"`` for ordered lookups on the first field, ``"hash"`` for equality
+                lookups on a single field, or ``"spatial"`` for boxes over exactly two
+                coordinate fields.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If a field is not in the map schema.
+            ValueError: If the kind is unknown or does not fit the fields.
+        """
+        pass
+
+    @abstractmethod
+    def query_eq(self, map_name: str, field: str, value: Any) -> Iterator[Any]:
+        """
+        Query the keys of the entries whose field equals a value.
+
+        Args:
+            map_name: Name of the target map.
+            field: Field to compare.
+            value: Value to look up.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If the field is not in the map schema.
+        """
+        pass
+
+    @abstractmethod
+    def query_range(self, map_name: str, field_ranges: Dict[str, Tuple[Any, Any]]) -> Iterator[Any]:
+        """
+        Query the keys of the entries whose fields all lie within inclusive ranges.
+
+        Args:
+            map_name: Name of the target map.
+            field_ranges: Maps each constrained field to its ``(low, high)`` bounds. Either
+                bound may be None to leave that side open. Null field values never match.
+
+        Raises:
+            IndexError: If the map does not exist.
+            KeyError: If a field is not in the map schema.
+        """
+        pass
+
+    @abstractmethod
+    def iter_batches(self, map_name: str, batch_size: int = 65536) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the rows of a map as NumPy column arrays, ``batch_size`` rows at a time.
+
+        Each batch maps field names to arrays of equal length: typed arrays
+        for int, float and bool fields and unicode arrays for str fields.
+        LineString and ndarray fields are laid out like Arrow lists, the
+        points of all rows stacked under the field name and
+        ``<field>.offsets`` giving where the points of each row start and
+        end. Other fields, and fields holding None, become object arrays.
+        The map must not be written to until the iteration ends.
+
+        Args:
+            map_name: Name of the map.
+            batch_size: Maximum number of rows per batch.
+
+        Raises:
+            IndexError: If the map does not exist.
+            ValueError: If ``batch_size`` is less than 1.
+        """
+        pass
+
+    @abstractmethod
+    def export(self, map_name: str, path: Union[str, IPathLike], format: str = "npz") -> None:
+        """
+        Write the columns of a map to a file, streaming it in batches.
+
+        The ``npz`` format holds one array per key of ``iter_batches``,
+        concatenated over all batches, and loads with ``numpy.load``; only
+        object columns need ``allow_pickle``.
+
+        Args:
+            map_name: Name of the map.
+            path: Destination file.
+            format: Output format; only ``"npz"`` is supported.
+
+        Raises:
+            IndexError: If the map does not exist.
+            ValueError: If the format is not supported.
+        """
+        pass
+
+    @abstractmethod
+    def snapshot(self) -> Any:
+        """
+        Capture the maps of the store and their contents.
+
+        The returned object is opaque and is only meant to be passed back to
+        ``restore`` on the same store, any number of times.
+
+        Raises:
+            RuntimeError: If a transaction is open.
+        """
+        pass
+
+    @abstractmethod
+    def restore(self, snapshot: Any) -> None:
+        """
+        Bring the store back to the state captured by ``snapshot``.
+
+        Maps created after the snapshot are dropped and deleted ones come back.
+        Rows previously returned by ``get_data`` must not be used afterwards.
+
+        Args:
+            snapshot: An object returned by ``snapshot`` on this store.
+
+        Raises:
+            ValueError: If the snapshot was not taken from this store or is no longer valid.
+            RuntimeError: If a transaction is open.
+        """
+        pass
+
+    @abstractmethod
+    def tick(self, steps: int = 1) -> None:
+        """
+        Advance the step clock of the store, evicting rows whose ``TTL`` ran out.
+
+        Args:
+            steps: Number of steps to advance.
+        """
+        pass
+
+    @abstractmethod
+    def enable_stats(self, enabled: bool = True) -> None:
+        """
+        Turn the per-map operation counters on or off.
+
+        Counting is off by default. While on, every insert, get, update,
+        delete, query and key iteration records its latency, as do
+        statements run on raw database connections of backends exposing them.
+
+        Args:
+            enabled: Whether to count; turning counting off discards the counts.
+        """
+        pass
+
+    @abstractmethod
+    def stats(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        Return the operation counters of the store.
+
+        ``stats()["maps"][map_name][op]`` holds the ``count`` of calls, their
+        ``total`` and ``max`` seconds, and a ``histogram`` of call counts per
+        latency bucket. Backends may add entries, such as read cache hit rates
+        or the eviction counts of bounded maps.
+
+        Args:
+            reset: Clear the counters after reading them, e.g. once per step.
+        """
+        pass
+
     @abstractmethod
     def close(self) -> None:
         """Release any resources held by the store."""
@@ -245,6 +533,36 @@ def list_stores(self) -> Iterator[str]:
         """
         pass
 
+    @abstractmethod
+    def tick(self, steps: int = 1) -> None:
+        """
+        Advance the step clock of every store.
+
+        The visualization engine calls this once per simulation step, at the
+        end of ``simulate``; extra calls age TTL maps further.
+
+        Args:
+            steps: Number of steps to advance.
+        """
+        pass
+
+    @abstractmethod
+    def enable_stats(self, enabled: bool = True) -> None:
+        """
+        Turn operation counters on or off for every current and future store.
+        """
+        pass
+
+    @abstractmethod
+    def stats(self, reset: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Return ``IStore.stats`` of every store, keyed by store name.
+
+        Args:
+            reset: Clear the counters after reading them.
+        """
+        pass
+
     @abstractmethod
     def terminate(self) -> None:
         """Tear down the memory engine and release all store resources."""
@@ -10,6 +10,7 @@ class OpCodes(Enum):
     AGENT_ORIENTATION = 0x01100004
     AERIAL_AGENT_POSITION = 0x01100005
     AERIAL_AGENT_QUATERNION = 0x01100006
+    AGENT_MOVE_MANY = 0x01100007
     AGENT_SENSOR_REGISTER = 0x01100002
     AGENT_SENSOR_DEREGISTER = 0x01100003
     COMPONENT_REGISTER = 0x02000000
@@ -137,6 +137,7 @@ def simulate(self) -> None:
         This method advances the simulation by one step, updating the positions,
         states, and visual representations of the graph and agents. It should be
         called repeatedly within a loop to animate the visualization in real-time.
+        Each call also ticks the memory engine, ageing the rows of TTL maps.
 
         Raises:
             RuntimeError: If the simulation cannot be advanced due to internal errors.
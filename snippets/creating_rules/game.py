@@ -49,16 +49,18 @@ def create_grid(graph, n):
 blue_start_dict = {name: config.agent_config[name]['start_node_id'] for name in blue_team}
 
 def tag_rule(ctx):
-    for red_agent in red_team:
-        for blue_agent in blue_team:
-            ragent = ctx.agent.get_agent(red_agent)
-            bagent = ctx.agent.get_agent(blue_agent)
-            if ragent.current_node_id == bagent.current_node_id:
-                # Reset the agents to their starting positions
-                ragent.current_node_id = red_start_dict[red_agent]
-                bagent.current_node_id = blue_start_dict[blue_agent]
-                ragent.prev_node_id = red_start_dict[red_agent]
-                bagent.prev_node_id = blue_start_dict[blue_agent]
+    # The occupancy index only looks at agents sharing a node with a red agent
+    tagged = set()
+    for ragent, bagent in ctx.agent.co_located(red_team, blue_team):
+        # A red agent tags one blue agent per step, and a tagged agent has already left the node
+        if ragent.name in tagged or bagent.name in tagged:
+            continue
+        tagged.update((ragent.name, bagent.name))
+        # Reset the agents to their starting positions
+        ragent.current_node_id = red_start_dict[ragent.name]
+        bagent.current_node_id = blue_start_dict[bagent.name]
+        ragent.prev_node_id = red_start_dict[ragent.name]
+        bagent.prev_node_id = blue_start_dict[bagent.name]
 
 
 
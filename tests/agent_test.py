@@ -1,6 +1,14 @@
+import io
 import unittest
 import gamms
 
+# Strategies for the process backend must be picklable, so they live at module level
+def step_forward(state):
+    state['action'] = state['curr_pos'] + 1
+
+def fail(state):
+    raise ValueError('no plan')
+
 class AgentTest(unittest.TestCase):
     def setUp(self):
         self.ctx = gamms.create_context(
@@ -61,6 +69,45 @@ def test_common_properties(self):
         self.assertEqual(self.agent.orientation, (1.0, 0.0))
         self.assertEqual(self.aerial.orientation, (1.0, 0.0))
 
+
+    def test_orientation_cache(self):
+        self.assertEqual(self.ctx.graph.get_heading(0, 5), (0.0, 1.0))
+        self.assertEqual(self.ctx.graph.get_heading(0, 0), (0.0, 0.0))
+        with self.assertRaises(KeyError):
+            self.ctx.graph.get_heading(0, 99)
+
+        self.agent.current_node_id = 1
+        self.assertEqual(self.agent.orientation, (1.0, 0.0))
+        # Repeated reads do not go back to the graph
+        headings = self.ctx.graph._headings
+        headings[(0, 1)] = (0.6, 0.8)
+        self.assertEqual(self.agent.orientation, (1.0, 0.0))
+
+        # Moving, or changing the graph, derives the heading again
+        self.agent.prev_node_id = 1
+        self.agent.current_node_id = 6
+        self.assertEqual(self.agent.orientation, (0.0, 1.0))
+        self.ctx.graph.graph.update_node({'id': 6, 'x': 2, 'y': 0})
+        self.assertEqual(self.agent.orientation, (1.0, 0.0))
+
+        # An explicit orientation takes precedence
+        self.agent.orientation = (0.0, -2.0)
+        self.assertEqual(self.agent.orientation, (0.0, -1.0))
+
+    def test_track_positions(self):
+        from unittest.mock import patch
+        tracked = self.ctx.agent.create_agent('tracked', start_node_id=0)
+        graph = self.ctx.graph.graph
+        with patch.object(graph, 'get_node', wraps=graph.get_node) as get_node:
+            for node_id in (1, 2, 1, 2, 1):
+                tracked.current_node_id = node_id
+        # Every node is read from the graph once
+        self.assertEqual(sorted(call.args[0] for call in get_node.call_args_list), [1, 2])
+
+        # A changed graph is read again
+        graph.update_node({'id': 2, 'x': 10.0, 'y': 10.0})
+        tracked.current_node_id = 2
+        self.assertEqual([agent.name for agent, _ in self.ctx.agent.query_agents(10.0, 10.0, 0.5)], ['tracked'])
     
     def test_aerial_properties(self):
         # Test position property and current_node_id interaction
@@ -139,6 +186,278 @@ def test_engine(self):
         aerial_fetched = self.ctx.agent.get_agent('aerial')
         self.assertEqual(aerial, aerial_fetched)
 
+    def test_query_agents(self):
+        self.ctx.agent.create_agent(name='a', start_node_id=0)
+        self.ctx.agent.create_agent(name='b', start_node_id=4)
+        aerial = self.ctx.agent.create_agent(
+            name='aerial',
+            start_node_id=0,
+            speed=2.0,
+            type=gamms.typing.agent_engine.AgentType.AERIAL,
+        )
+        aerial.position = (2.0, 2.0, 5.0)
+
+        found = dict(self.ctx.agent.query_agents(0.0, 0.0, 1.5))
+        self.assertEqual({agent.name for agent in found}, {'a'})
+        found = {agent.name: pos for agent, pos in self.ctx.agent.query_agents(2.0, 2.0, 3.0)}
+        self.assertEqual(found['aerial'], (2.0, 2.0, 5.0))
+        self.assertEqual(set(found), {'a', 'b', 'aerial'})
+        self.assertEqual(len(list(self.ctx.agent.query_agents(0.0, 0.0, float('inf')))), 3)
+
+        # Index follows moves and deletions
+        self.ctx.agent.get_agent('a').current_node_id = 24
+        found = {agent.name for agent, _ in self.ctx.agent.query_agents(4.0, 4.0, 0.5)}
+        self.assertEqual(found, {'a'})
+        self.ctx.agent.delete_agent('a')
+        found = {agent.name for agent, _ in self.ctx.agent.query_agents(4.0, 4.0, 0.5)}
+        self.assertEqual(found, set())
+
+    def test_step_all(self):
+        for name, start in (('a', 0), ('b', 1), ('idle', 12)):
+            sensor = self.ctx.sensor.create_sensor(f'{name}_agents', gamms.sensor.SensorType.AGENT)
+            agent = self.ctx.agent.create_agent(name=name, start_node_id=start)
+            agent.register_sensor('agents', sensor)
+
+        def chase(target):
+            def strategy(state):
+                state['action'] = state['sensor']['agents'][1][target]
+            return strategy
+
+        self.ctx.agent.get_agent('a').register_strategy(chase('b'))
+        self.ctx.agent.get_agent('b').register_strategy(chase('a'))
+
+        # Both agents sense before either moves, so they swap places
+        self.ctx.agent.step_all()
+        self.assertEqual(self.ctx.agent.get_agent('a').current_node_id, 1)
+        self.assertEqual(self.ctx.agent.get_agent('b').current_node_id, 0)
+        self.assertEqual(self.ctx.agent.get_agent('a').prev_node_id, 0)
+        self.assertEqual(self.ctx.agent.get_agent('idle').current_node_id, 12)
+
+        # An invalid action leaves every agent in place
+        def invalid(state):
+            state['action'] = 99
+        self.ctx.agent.get_agent('b').register_strategy(invalid)
+        with self.assertRaises(KeyError):
+            self.ctx.agent.step_all()
+        self.assertEqual(self.ctx.agent.get_agent('a').current_node_id, 1)
+        self.assertEqual(self.ctx.agent.get_agent('a').prev_node_id, 0)
+
+        self.ctx.agent.step_all(['a'])
+        self.assertEqual(self.ctx.agent.get_agent('a').current_node_id, 0)
+        with self.assertRaises(AttributeError):
+            self.ctx.agent.step_all(['idle'])
+
+    def test_step_all_compute(self):
+        for engine in (gamms.compute.Engine.THREAD, gamms.compute.Engine.PROCESS):
+            with self.subTest(engine=engine):
+                ctx = gamms.create_context(
+                    vis_engine=gamms.visual.Engine.NO_VIS,
+                    logger_config={'level': 'CRITICAL'},
+                    graph_engine=gamms.graph.Engine.MEMORY,
+                    compute_engine=engine,
+                    compute_kwargs={'max_workers': 2},
+                )
+                for i in range(5):
+                    ctx.graph.graph.add_node({'id': i, 'x': i, 'y': 0})
+                for name, start in (('a', 0), ('b', 1), ('c', 2)):
+                    ctx.agent.create_agent(name=name, start_node_id=start).register_strategy(step_forward)
+
+                ctx.agent.step_all()
+                self.assertEqual([ctx.agent.get_agent(n).current_node_id for n in 'abc'], [1, 2, 3])
+                self.assertEqual(set(ctx.agent.strategy_times), {'a', 'b', 'c'})
+                self.assertTrue(all(t >= 0 for t in ctx.agent.strategy_times.values()))
+
+                # A failing strategy is reported per agent and no agent moves
+                ctx.agent.get_agent('b').register_strategy(fail)
+                with self.assertRaises(gamms.typing.StrategyError) as cm:
+                    ctx.agent.step_all()
+                self.assertEqual(set(cm.exception.errors), {'b'})
+                self.assertIsInstance(cm.exception.errors['b'], ValueError)
+                self.assertEqual(set(ctx.agent.strategy_times), {'a', 'c'})
+                self.assertEqual([ctx.agent.get_agent(n).current_node_id for n in 'abc'], [1, 2, 3])
+                ctx.terminate()
+
+    def test_array_engine(self):
+        ctx = gamms.create_context(
+            vis_engine=gamms.visual.Engine.NO_VIS,
+            logger_config={'level': 'CRITICAL'},
+            graph_engine=gamms.graph.Engine.MEMORY,
+            agent_kwargs={'engine': gamms.agent.Engine.ARRAY},
+        )
+        for i in range(200):
+            ctx.graph.graph.add_node({'id': i, 'x': i, 'y': 0})
+        for i in range(100):
+            ctx.agent.create_agent(name=f'agent_{i}', start_node_id=i, meta={'team': i % 2})
+        aerial = ctx.agent.create_agent(name='aerial', start_node_id=0, type=gamms.typing.AgentType.AERIAL, speed=2.0)
+        arrays = ctx.agent.arrays
+
+        self.assertEqual(len(arrays), 101)
+        self.assertEqual(arrays.team[arrays.index(['agent_3', 'agent_4'])].tolist(), [1, 0])
+        self.assertEqual(arrays.speed[arrays.rows['aerial']], 2.0)
+        aerial.position = (1.0, 2.0, 3.0)
+        self.assertEqual(arrays.position[arrays.rows['aerial']].tolist(), [1.0, 2.0, 3.0])
+
+        # Agents are views over their rows
+        agent = ctx.agent.get_agent('agent_5')
+        agent.current_node_id = 150
+        self.assertEqual(arrays.current_node[arrays.rows['agent_5']], 150)
+        self.assertEqual(arrays.position[arrays.rows['agent_5']].tolist(), [150.0, 0.0, 0.0])
+
+        fp = io.BytesIO()
+        ctx.record.start(fp)
+        ctx.agent.move_many([f'agent_{i}' for i in range(100)], [i + 100 for i in range(100)])
+        ctx.agent.move_many([arrays.rows['agent_0']], 7)
+        fp.seek(0)
+        fp_replay = io.BytesIO(fp.read())
+        ctx.record.stop()
+        self.assertEqual(agent.current_node_id, 105)
+        self.assertEqual(agent.prev_node_id, 150)
+        self.assertEqual(ctx.agent.get_agent('agent_0').current_node_id, 7)
+        self.assertEqual(ctx.agent.get_agent('agent_0').prev_node_id, 100)
+        self.assertEqual(ctx.agent.query_agents(105, 0, 0.5).__next__()[0], agent)
+
+        with self.assertRaises(ValueError):
+            ctx.agent.move_many(['aerial'], 1)
+        with self.assertRaises(KeyError):
+            ctx.agent.move_many(['missing'], 1)
+        with self.assertRaises(ValueError):
+            ctx.agent.move_many(['agent_1', 'agent_2'], [1, 2, 3])
+
+        # Rows of deleted agents are reused
+        row = arrays.rows['agent_1']
+        ctx.agent.delete_agent('agent_1')
+        with self.assertRaises(KeyError):
+            ctx.agent.move_many([row], 1)
+        ctx.agent.create_agent(name='late', start_node_id=9)
+        self.assertEqual(arrays.rows['late'], row)
+        self.assertEqual(arrays.team[row], -1)
+
+        # The batched moves replay on the object engine
+        replay = gamms.create_context(
+            vis_engine=gamms.visual.Engine.NO_VIS,
+            logger_config={'level': 'CRITICAL'},
+            graph_engine=gamms.graph.Engine.MEMORY,
+        )
+        for i in range(200):
+            replay.graph.graph.add_node({'id': i, 'x': i, 'y': 0})
+        for i in range(100):
+            replay.agent.create_agent(name=f'agent_{i}', start_node_id=i)
+        # The copy is taken before stop, so it lacks the terminate entry
+        with self.assertRaises(ValueError):
+            for _ in replay.record.replay(fp_replay):
+                pass
+        self.assertEqual(replay.agent.get_agent('agent_5').current_node_id, 105)
+        self.assertEqual(replay.agent.get_agent('agent_5').prev_node_id, 5)
+        self.assertEqual(replay.agent.get_agent('agent_0').current_node_id, 7)
+        ctx.terminate()
+        replay.terminate()
+
+    def test_move_many_validation(self):
+        for engine in (gamms.agent.Engine.OBJECT, gamms.agent.Engine.ARRAY):
+            ctx = gamms.create_context(
+                vis_engine=gamms.visual.Engine.NO_VIS,
+                logger_config={'level': 'CRITICAL'},
+                graph_engine=gamms.graph.Engine.MEMORY,
+                agent_kwargs={'engine': engine},
+            )
+            for i in range(10):
+                ctx.graph.graph.add_node({'id': i, 'x': i, 'y': 0})
+            for i in range(3):
+                ctx.agent.create_agent(name=f'agent_{i}', start_node_id=i)
+
+            # One missing target fails the whole batch before any agent moves
+            with self.assertRaises(KeyError):
+                ctx.agent.move_many(['agent_0', 'agent_1', 'agent_2'], [5, 99, 6])
+            for i in range(3):
+                agent = ctx.agent.get_agent(f'agent_{i}')
+                self.assertEqual((agent.current_node_id, agent.prev_node_id), (i, i))
+            self.assertEqual([a.name for a in ctx.agent.agents_at(5)], [])
+            with self.assertRaises(KeyError):
+                ctx.agent.move_many(['agent_0', 'agent_1'], 99)
+
+            ctx.agent.move_many(['agent_0', 'agent_1', 'agent_2'], [5, 6, 7])
+            self.assertEqual([ctx.agent.get_agent(f'agent_{i}').current_node_id for i in range(3)], [5, 6, 7])
+            ctx.terminate()
+
+    def test_occupancy(self):
+        for name, start in (('red_0', 0), ('red_1', 6), ('blue_0', 0), ('blue_1', 7), ('blue_2', 24)):
+            self.ctx.agent.create_agent(name=name, start_node_id=start)
+        aerial = self.ctx.agent.create_agent(name='aerial', start_node_id=0, type=gamms.typing.AgentType.AERIAL, speed=1.0)
+        red, blue = ['red_0', 'red_1'], ['blue_0', 'blue_1', 'blue_2']
+
+        self.assertEqual([a.name for a in self.ctx.agent.agents_at(0)], ['red_0', 'blue_0'])
+        self.assertEqual(self.ctx.agent.agents_at(3), [])
+        self.assertNotIn(aerial, self.ctx.agent.agents_at(0))
+        self.assertEqual(
+            [(a.name, b.name) for a, b in self.ctx.agent.co_located(red, blue)],
+            [('red_0', 'blue_0')],
+        )
+
+        # The index follows the setter and batched moves
+        self.ctx.agent.get_agent('red_1').current_node_id = 7
+        self.ctx.agent.move_many(['blue_0'], 1)
+        self.assertEqual(
+            [(a.name, b.name) for a, b in self.ctx.agent.co_located(red, blue)],
+            [('red_1', 'blue_1')],
+        )
+        self.assertEqual([a.name for a in self.ctx.agent.agents_at(0)], ['red_0'])
+
+        # Grid hops from node 0: 1 and 5 are one hop away, 2, 6 and 10 two hops
+        self.assertEqual(
+            [(a.name, k) for a, k in self.ctx.agent.agents_within_hops(0, 2)],
+            [('red_0', 0), ('blue_0', 1)],
+        )
+        self.assertEqual(
+            sorted((a.name, k) for a, k in self.ctx.agent.agents_within_hops(0, 3)),
+            [('blue_0', 1), ('blue_1', 3), ('red_0', 0), ('red_1', 3)],
+        )
+        with self.assertRaises(ValueError):
+            self.ctx.agent.agents_within_hops(0, -1)
+
+        # An agent on a node unknown to the graph leaves the index
+        self.ctx.agent.get_agent('red_1').current_node_id = 99
+        self.assertEqual([a.name for a in self.ctx.agent.agents_at(7)], ['blue_1'])
+        self.assertEqual(self.ctx.agent.agents_at(99), [])
+        self.assertEqual(self.ctx.agent.co_located(red, blue), [])
+
+        self.ctx.agent.delete_agent('red_0')
+        self.assertEqual(self.ctx.agent.agents_at(0), [])
+
+    def test_adjacent_moves(self):
+        ctx = gamms.create_context(
+            vis_engine=gamms.visual.Engine.NO_VIS,
+            logger_config={'level': 'CRITICAL'},
+            graph_engine=gamms.graph.Engine.MEMORY,
+            agent_kwargs={'adjacent_moves': True},
+        )
+        for i in range(3):
+            ctx.graph.graph.add_node({'id': i, 'x': i, 'y': 0})
+        ctx.graph.graph.add_edge({'id': 0, 'source': 0, 'target': 1, 'length': 1})
+        agent = ctx.agent.create_agent(name='agent', start_node_id=0)
+
+        def move_to(node_id):
+            def strategy(state):
+                state['action'] = node_id
+            return strategy
+
+        # Staying put and moving along an edge are allowed
+        for target in (0, 1):
+            agent.register_strategy(move_to(target))
+            agent.step()
+            self.assertEqual(agent.current_node_id, target)
+
+        # Node 2 exists but is not a neighbor of node 1
+        agent.register_strategy(move_to(2))
+        with self.assertRaises(ValueError):
+            agent.step()
+        with self.assertRaises(ValueError):
+            ctx.agent.step_all()
+        agent.register_strategy(move_to(7))
+        with self.assertRaises(KeyError):
+            ctx.agent.step_all()
+        self.assertEqual(agent.current_node_id, 1)
+        ctx.terminate()
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -166,6 +166,63 @@ def test_update_node_edge(self):
         with self.assertRaises(KeyError):
             self.ctx.graph.graph.update_edge({'id': 3, 'source': 1, 'target': 2, 'length': 2})
         
+    def test_snapshot_restore(self):
+        graph = self.ctx.graph.graph
+        for i in range(3):
+            graph.add_node({'id': i, 'x': i, 'y': 0})
+        graph.add_edge({'id': 0, 'source': 0, 'target': 1, 'length': 1})
+        sensor = self.ctx.sensor.create_sensor('neighbors', gamms.sensor.SensorType.NEIGHBOR)
+        graph.has_node(0)
+        snapshot = self.ctx.graph.snapshot()
+
+        graph.add_node({'id': 3, 'x': 0.5, 'y': 0})
+        graph.add_edge({'id': 1, 'source': 0, 'target': 3, 'length': 1})
+        graph.remove_node(2)
+        self.ctx.graph.add_obstacle_face(face_id=1, tr=(1, 1, 0), tl=(0, 1, 0), br=(1, 0, 0), bl=(0, 0, 0), type=0)
+        sensor.sense(0)
+        self.assertEqual(sorted(sensor.data), [0, 1, 3])
+        version = graph.version
+        obstacle_version = self.ctx.graph.obstacle_version
+
+        self.ctx.graph.restore(snapshot)
+        self.assertGreater(graph.version, version)
+        self.assertGreater(self.ctx.graph.obstacle_version, obstacle_version)
+        self.assertEqual(sorted(graph.get_nodes()), [0, 1, 2])
+        self.assertTrue(graph.has_node(2))
+        self.assertFalse(graph.has_node(3))
+        self.assertEqual(list(graph.get_neighbors(0)), [1])
+        self.assertNotIn(3, list(graph.get_nodes(d=0.6, x=0, y=0)))
+        self.assertEqual(sorted(graph.get_edges(d=5, x=0, y=0)), [0])
+        self.assertEqual(list(self.ctx.graph.get_obstacle_faces()), [])
+        # The sensor result cached before the restore is not served again
+        sensor.sense(0)
+        self.assertEqual(sorted(sensor.data), [0, 1])
+
+        # The snapshot can be restored again after further changes
+        graph.add_edge({'id': 2, 'source': 0, 'target': 2, 'length': 2})
+        self.ctx.graph.restore(snapshot)
+        self.assertEqual(list(graph.get_neighbors(0)), [1])
+
+    def test_has_node(self):
+        graph = self.ctx.graph.graph
+        graph.add_node({'id': 1, 'x': 0, 'y': 0})
+        self.assertTrue(graph.has_node(1))
+        self.assertFalse(graph.has_node(2))
+
+        # Membership stays current once the ids are known
+        graph.add_node({'id': 2, 'x': 1, 'y': 0})
+        self.assertTrue(graph.has_node(2))
+        graph.remove_node(1)
+        self.assertFalse(graph.has_node(1))
+
+        G = nx.DiGraph()
+        G.add_node(5, x=0.0, y=0.0)
+        G.add_node(6, x=1.0, y=0.0)
+        G.add_edge(5, 6, id=0, length=1.0)
+        graph.attach_networkx_graph(G)
+        self.assertTrue(graph.has_node(5))
+        self.assertTrue(graph.has_node(6))
+
     def test_get_neighbors(self):
         self.ctx.graph.graph.add_node({'id': 1, 'x': 0, 'y': 0})
         self.ctx.graph.graph.add_node({'id': 2, 'x': 1, 'y': 1})
@@ -227,6 +284,11 @@ def test_obstacle_face(self):
         face_ids = list(self.ctx.graph.get_obstacle_faces(d=2.0, x=100, y=100))
         self.assertEqual(len(face_ids), 0)
 
+        # The query square only has to touch the bounding box of the face
+        self.assertEqual(list(self.ctx.graph.get_obstacle_faces(d=0.5, x=1.5, y=0.5)), [1])
+        self.assertEqual(list(self.ctx.graph.get_obstacle_faces(d=0.5, x=1.6, y=0.5)), [])
+        self.assertEqual(list(self.ctx.graph.get_obstacle_faces(d=0.5, x=0.5, y=-0.5)), [1])
+
         self.ctx.graph.remove_obstacle_face(1)
         with self.assertRaises(KeyError):
             self.ctx.graph.get_obstacle_face(1)
@@ -245,6 +307,53 @@ def test_attach_network(self):
         self.ctx.graph.graph.get_node(2)
         self.ctx.graph.graph.get_edge(1)
 
+    def test_publish_shared(self):
+        self.ctx.graph.graph.add_node({'id': 1, 'x': 0, 'y': 0})
+        self.ctx.graph.graph.add_node({'id': 3, 'x': 1, 'y': 1})
+        self.ctx.graph.graph.add_node({'id': 2, 'x': 50, 'y': 50})
+        self.ctx.graph.graph.add_edge({'id': 1, 'source': 1, 'target': 3, 'length': 1.5})
+        self.ctx.graph.graph.add_edge({'id': 2, 'source': 3, 'target': 2, 'length': 70, 'linestring': [(1, 1), (20, 30), (50, 50)]})
+        self.ctx.graph.add_obstacle_face(
+            face_id=7,
+            tr=(1.0, 1.0, 0.0),
+            tl=(0.0, 1.0, 0.0),
+            br=(1.0, 0.0, 0.0),
+            bl=(0.0, 0.0, 0.0),
+            type=3
+        )
+        name = self.ctx.graph.publish()
+
+        shared = gamms.create_context(
+            vis_engine=gamms.visual.Engine.NO_VIS,
+            graph_engine=gamms.graph.Engine.SHARED,
+            graph_kwargs={'shared_name': name},
+            logger_config={'level': 'ERROR'},
+        )
+        try:
+            graph = shared.graph.graph
+            self.assertEqual(sorted(graph.get_nodes()), [1, 2, 3])
+            self.assertEqual(sorted(graph.get_nodes(d=2, x=0, y=0)), [1, 3])
+            self.assertEqual(sorted(graph.get_edges(d=2, x=0, y=0)), [1, 2])
+            self.assertEqual(list(graph.get_neighbors(3)), [2])
+            self.assertEqual(graph.get_node(2).x, 50)
+            self.assertTrue(graph.has_node(3))
+            self.assertFalse(graph.has_node(4))
+            self.assertFalse(graph.has_node(0))
+            edge = graph.get_edge(2)
+            self.assertEqual((edge.source, edge.target, edge.length), (3, 2, 70))
+            self.assertEqual(list(edge.linestring.coords), [(1, 1), (20, 30), (50, 50)])
+            with self.assertRaises(KeyError):
+                graph.get_node(4)
+            with self.assertRaises(RuntimeError):
+                graph.add_node({'id': 4, 'x': 0, 'y': 0})
+
+            face = shared.graph.get_obstacle_face(7)
+            self.assertEqual((face.tr, face.type), ((1.0, 1.0, 0.0), 3))
+            self.assertEqual(list(shared.graph.get_obstacle_faces(d=2.0, x=100, y=100)), [])
+            self.assertEqual(list(shared.graph.get_obstacle_faces(d=10, x=0, y=0)), [7])
+        finally:
+            shared.terminate()
+
     def tearDown(self) -> None:
         self.ctx.terminate()
 
@@ -266,8 +375,11 @@ def suite(cls):
     suite.addTest(cls('test_get_edges'))
     suite.addTest(cls('test_remove_node_edge'))
     suite.addTest(cls('test_update_node_edge'))
+    suite.addTest(cls('test_has_node'))
+    suite.addTest(cls('test_snapshot_restore'))
     suite.addTest(cls('test_get_neighbors'))
     suite.addTest(cls('test_attach_network'))
+    suite.addTest(cls('test_publish_shared'))
     return suite
 
 if __name__ == '__main__':
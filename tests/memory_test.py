@@ -1,7 +1,14 @@
+import os
+import sqlite3
+import tempfile
 import unittest
 
+import numpy as np
+from shapely.geometry import LineString
+
 import gamms
-from gamms.MemoryEngine.store import PathLike
+from gamms.MemoryEngine.file_store import FileStore
+from gamms.MemoryEngine.store import PathLike, SqliteStore, _write_npz
 
 
 class StoreTestBase(unittest.TestCase):
@@ -86,6 +93,232 @@ def test_query_keys(self):
         with self.assertRaises(IndexError):
             list(self.store.query_keys('q'))
     
+    def test_field_codecs(self):
+        self.store.create_map('m', {'id': int, 'flag': bool, 'tags': tuple, 'name': str}, 'id')
+        self.store.insert_data('m', {'id': 1, 'flag': True, 'tags': (1, 2), 'name': 'foo'})
+        data = self.store.get_data('m', 1)
+        self.assertIs(data['flag'], True)
+        self.assertEqual(data['tags'], (1, 2))
+        self.assertEqual(list(data), ['id', 'flag', 'tags', 'name'])
+        with self.assertRaises(KeyError):
+            data['missing']
+
+        update = {'id': 1, 'flag': False, 'tags': (3,)}
+        self.store.update_data('m', update)
+        data = self.store.get_data('m', 1)
+        self.assertIs(data['flag'], False)
+        self.assertEqual(data['tags'], (3,))
+        self.assertEqual(data['name'], 'foo')
+
+        with self.assertRaises(ValueError):
+            self.store.insert_data('m', {'id': 2, 'flag': True})
+
+    def test_batch_writes(self):
+        self.store.create_map('m', {'id': int, 'name': str, 'tags': tuple}, 'id')
+        self.store.insert_many('m', ({'id': i, 'name': f'n{i}', 'tags': (i,)} for i in range(10)))
+        self.assertEqual(sorted(self.store.query_keys('m')), list(range(10)))
+        self.assertEqual(self.store.get_data('m', 3)['tags'], (3,))
+
+        self.store.update_many('m', [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}, {'id': 2, 'tags': (7,)}])
+        self.assertEqual(self.store.get_data('m', 1)['name'], 'a')
+        self.assertEqual(self.store.get_data('m', 2)['name'], 'b')
+        self.assertEqual(self.store.get_data('m', 2)['tags'], (7,))
+
+        self.store.delete_many('m', [0, 9])
+        self.assertEqual(sorted(self.store.query_keys('m')), list(range(1, 9)))
+
+        with self.assertRaises(IndexError):
+            self.store.insert_many('q', [{'id': 1}])
+
+        # A failing batch leaves the map untouched
+        with self.assertRaises(KeyError):
+            self.store.insert_many('m', [{'id': 20, 'name': 'x', 'tags': ()}, {'id': 1, 'name': 'x', 'tags': ()}])
+        with self.assertRaises(KeyError):
+            self.store.get_data('m', 20)
+        with self.assertRaises(KeyError):
+            self.store.update_many('m', [{'id': 3, 'name': 'x'}, {'id': 42, 'name': 'x'}])
+        self.assertEqual(self.store.get_data('m', 3)['name'], 'n3')
+        with self.assertRaises(KeyError):
+            self.store.delete_many('m', [4, 42])
+        self.store.get_data('m', 4)
+
+    def test_transaction(self):
+        self.store.create_map('m', {'id': int, 'name': str}, 'id')
+        with self.store.transaction():
+            self.store.insert_data('m', {'id': 1, 'name': 'foo'})
+            self.store.insert_data('m', {'id': 2, 'name': 'bar'})
+        self.assertEqual(sorted(self.store.query_keys('m')), [1, 2])
+
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.insert_data('m', {'id': 3, 'name': 'baz'})
+                self.store.update_data('m', {'id': 1, 'name': 'qux'})
+                self.store.delete_data('m', 2)
+                self.assertEqual(self.store.get_data('m', 1)['name'], 'qux')
+                raise RuntimeError()
+        self.assertEqual(sorted(self.store.query_keys('m')), [1, 2])
+        self.assertEqual(self.store.get_data('m', 1)['name'], 'foo')
+
+        # An inner failure only undoes the inner writes
+        with self.store.transaction():
+            self.store.insert_data('m', {'id': 3, 'name': 'baz'})
+            with self.assertRaises(KeyError):
+                with self.store.transaction():
+                    self.store.insert_data('m', {'id': 4, 'name': 'x'})
+                    self.store.insert_data('m', {'id': 1, 'name': 'x'})
+        self.assertEqual(sorted(self.store.query_keys('m')), [1, 2, 3])
+
+    def test_secondary_indexes(self):
+        self.store.create_map('pts', {'id': int, 'x': float, 'y': float, 'kind': int}, 'id')
+        self.store.create_map('named', {'id': int, 'name': str, 'tags': tuple}, 'id')
+        self.store.insert_many('pts', [{'id': i, 'x': float(i % 10), 'y': float(i // 10), 'kind': i % 3} for i in range(100)])
+        self.store.insert_many('named', [{'id': i, 'name': f'n{i % 4}', 'tags': (i,)} for i in range(20)])
+
+        def check():
+            self.assertEqual(sorted(self.store.query_eq('pts', 'kind', 1)), list(range(1, 100, 3)))
+            self.assertEqual(
+                sorted(self.store.query_range('pts', {'x': (2.0, 3.0), 'y': (None, 1.0)})),
+                [2, 3, 12, 13],
+            )
+            self.assertEqual(sorted(self.store.query_range('pts', {'y': (9.5, None)})), [])
+            self.assertEqual(sorted(self.store.query_eq('named', 'name', 'n1')), [1, 5, 9, 13, 17])
+            self.assertEqual(sorted(self.store.query_range('named', {'name': ('n2', 'n3')})), [2, 3, 6, 7, 10, 11, 14, 15, 18, 19])
+
+        check()
+        self.store.create_index('pts', 'kind', kind='hash')
+        self.store.create_index('pts', ('x', 'y'), kind='spatial')
+        self.store.create_index('pts', ['y'])
+        self.store.create_index('pts', ['y'])
+        self.store.create_index('named', 'name')
+        check()
+
+        self.store.update_data('pts', {'id': 1, 'kind': 2, 'x': 50.0})
+        self.store.delete_data('named', 5)
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.update_data('pts', {'id': 4, 'kind': 1})
+                self.store.delete_data('pts', 2)
+                raise RuntimeError()
+        self.assertEqual(sorted(self.store.query_eq('pts', 'kind', 1)), list(range(4, 100, 3)))
+        self.assertEqual(sorted(self.store.query_range('pts', {'x': (40.0, None)})), [1])
+        self.assertEqual(sorted(self.store.query_range('pts', {'x': (2.0, 3.0), 'y': (0.0, 0.0)})), [2, 3])
+        self.assertEqual(sorted(self.store.query_eq('named', 'name', 'n1')), [1, 9, 13, 17])
+
+        with self.assertRaises(IndexError):
+            self.store.create_index('q', 'x')
+        with self.assertRaises(KeyError):
+            self.store.create_index('pts', 'z')
+        with self.assertRaises(ValueError):
+            self.store.create_index('pts', 'x', kind='spatial')
+        with self.assertRaises(ValueError):
+            self.store.create_index('pts', 'x', kind='rtree')
+        with self.assertRaises(KeyError):
+            list(self.store.query_eq('pts', 'z', 1))
+        with self.assertRaises(KeyError):
+            list(self.store.query_range('pts', {'z': (0, 1)}))
+
+    def test_snapshot_restore(self):
+        self.store.create_map('pts', {'id': int, 'x': float}, 'id')
+        self.store.create_map('named', {'id': int, 'name': str}, 'id')
+        self.store.insert_many('pts', [{'id': i, 'x': float(i)} for i in range(10)])
+        self.store.insert_many('named', [{'id': i, 'name': f'n{i}'} for i in range(10)])
+        self.store.create_index('named', 'name', kind='hash')
+        snapshot = self.store.snapshot()
+
+        for _ in range(2):
+            self.store.update_data('pts', {'id': 1, 'x': -1.0})
+            self.store.update_data('named', {'id': 1, 'name': 'changed'})
+            self.store.delete_many('named', [2, 3])
+            self.store.insert_data('named', {'id': 20, 'name': 'n1'})
+            self.store.delete_map('pts')
+            self.store.create_map('extra', {'id': int}, 'id')
+            self.store.restore(snapshot)
+
+            self.assertEqual(sorted(self.store.list_maps()), ['named', 'pts'])
+            self.assertEqual(self.store.get_data('pts', 1)['x'], 1.0)
+            self.assertEqual(self.store.get_data('named', 1)['name'], 'n1')
+            self.assertEqual(sorted(self.store.query_keys('named')), list(range(10)))
+            self.assertEqual(list(self.store.query_eq('named', 'name', 'n1')), [1])
+
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.snapshot()
+        with self.assertRaises(ValueError):
+            self.store.restore(object())
+
+    def test_iter_batches_export(self):
+        self.store.create_map('pts', {'id': int, 'x': float, 'ok': bool}, 'id')
+        self.store.create_map('edges', {'id': int, 'name': str, 'line': LineString}, 'id')
+        self.store.insert_many('pts', [{'id': i, 'x': i / 2, 'ok': i % 2 == 0} for i in range(10)])
+        self.store.insert_many('edges', [
+            {'id': i, 'name': 'e' * (i + 1), 'line': LineString([(j, i) for j in range(i + 2)])}
+            for i in range(5)
+        ])
+
+        batches = list(self.store.iter_batches('pts', batch_size=4))
+        self.assertEqual([len(batch['id']) for batch in batches], [4, 4, 2])
+        self.assertEqual(batches[0]['x'].dtype, np.float64)
+        self.assertEqual(sorted(np.concatenate([batch['x'] for batch in batches]).tolist()), [i / 2 for i in range(10)])
+        with self.assertRaises(ValueError):
+            self.store.iter_batches('pts', batch_size=0)
+        with self.assertRaises(IndexError):
+            self.store.iter_batches('missing')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'edges.npz')
+            self.store.export('edges', path)
+            with np.load(path) as data:
+                order = np.argsort(data['id'])
+                self.assertEqual(data['id'][order].tolist(), list(range(5)))
+                self.assertEqual(data['name'][order].tolist(), ['e' * (i + 1) for i in range(5)])
+                offsets = data['line.offsets']
+                self.assertEqual(offsets.tolist()[-1], sum(i + 2 for i in range(5)))
+                i = int(order[3])
+                self.assertEqual(data['line'][offsets[i]:offsets[i + 1]].tolist(), [[j, 3] for j in range(5)])
+
+            # Batches are concatenated, with the offsets of later batches rebased
+            batched = os.path.join(tmpdir, 'batched.npz')
+            _write_npz(batched, 'npz', self.store.iter_batches('edges', batch_size=2), {})
+            with np.load(path) as whole, np.load(batched) as parts:
+                self.assertEqual(sorted(whole.files), sorted(parts.files))
+                for key in whole.files:
+                    self.assertEqual(whole[key].tolist(), parts[key].tolist())
+
+            self.store.create_map('empty', {'id': int, 'name': str}, 'id')
+            self.store.export('empty', os.path.join(tmpdir, 'empty.npz'))
+            with np.load(os.path.join(tmpdir, 'empty.npz')) as data:
+                self.assertEqual(len(data['id']), 0)
+            with self.assertRaises(ValueError):
+                self.store.export('pts', os.path.join(tmpdir, 'pts.csv'), format='csv')
+
+    def test_stats(self):
+        self.store.create_map('pts', {'id': int, 'x': float}, 'id')
+        self.store.insert_data('pts', {'id': 0, 'x': 0.0})
+        self.assertEqual(self.store.stats()['maps'], {})
+
+        self.ctx.ictx.memory.enable_stats()
+        self.store.insert_many('pts', [{'id': i, 'x': float(i)} for i in range(1, 5)])
+        self.store.update_data('pts', {'id': 1, 'x': -1.0})
+        for _ in range(3):
+            self.store.get_data('pts', 1)
+        with self.assertRaises(KeyError):
+            self.store.get_data('pts', 99)
+        self.assertEqual(len(list(self.store.query_keys('pts'))), 5)
+
+        ops = self.ctx.ictx.memory.stats(reset=True)['test_store']['maps']['pts']
+        self.assertEqual(ops['insert']['count'], 1)
+        self.assertEqual(ops['update']['count'], 1)
+        self.assertEqual(ops['get']['count'], 4)
+        self.assertEqual(sum(ops['get']['histogram']), 4)
+        self.assertGreaterEqual(ops['get']['total'], ops['get']['max'])
+        self.assertEqual(ops['query_keys']['count'], 1)
+        self.assertNotIn('delete', ops)
+        self.assertEqual(self.store.stats()['maps'], {})
+
+        self.ctx.ictx.memory.enable_stats(False)
+        self.store.get_data('pts', 1)
+        self.assertEqual(self.store.stats()['maps'], {})
+
     def tearDown(self) -> None:
         return self.ctx.terminate()
 
@@ -95,11 +328,414 @@ def setUp(self):
         self.store = self.ctx.ictx.memory.create_store(gamms.typing.StoreType.MEMORY, 'test_store')
 
 
+    def test_columnar_map(self):
+        import numpy as np
+        self.store.create_map('nodes', {'id': int, 'x': float, 'seen': bool}, 'id')
+        self.store.insert_many('nodes', [{'id': i, 'x': i / 2, 'seen': i % 2 == 0} for i in range(2000)])
+        self.assertEqual(self.store.get_data('nodes', 3), {'id': 3, 'x': 1.5, 'seen': False})
+        self.store.update_data('nodes', {'id': 3, 'seen': True})
+        self.assertIs(self.store.get_data('nodes', 3)['seen'], True)
+
+        self.store.delete_many('nodes', range(0, 2000, 2))
+        self.store.delete_data('nodes', 1999)
+        xs = self.store.get_column('nodes', 'x')
+        ids = self.store.get_column('nodes', 'id')
+        self.assertEqual(ids.tolist(), list(self.store.query_keys('nodes')))
+        np.testing.assert_array_equal(xs, ids / 2)
+        self.assertFalse(xs.flags.writeable)
+
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.delete_data('nodes', 5)
+                self.store.update_data('nodes', {'id': 7, 'x': 0.0})
+                raise RuntimeError()
+        self.assertEqual(self.store.get_data('nodes', 5)['x'], 2.5)
+        self.assertEqual(self.store.get_data('nodes', 7)['x'], 3.5)
+
+        self.store.create_map('named', {'id': int, 'name': str}, 'id')
+        self.store.insert_data('named', {'id': 1, 'name': 'foo'})
+        self.assertEqual(self.store.get_column('named', 'name').tolist(), ['foo'])
+        with self.assertRaises(KeyError):
+            self.store.get_column('named', 'missing')
+
+    def test_columnar_values(self):
+        # Values the columns would change are stored as given, like the dict store does
+        values = ('3.5', 2**60 + 1, True, 3, 1.7, 2**70, float('inf'))
+        for i, value in enumerate(values):
+            self.store.create_map(f'x{i}', {'id': int, 'x': float}, 'id')
+            self.store.insert_data(f'x{i}', {'id': 0, 'x': 0.5})
+            self.store.insert_data(f'x{i}', {'id': 1, 'x': value})
+            self.store.update_data(f'x{i}', {'id': 0, 'x': value})
+            for key in (0, 1):
+                stored = self.store.get_data(f'x{i}', key)['x']
+                self.assertIs(type(stored), type(value))
+                self.assertEqual(stored, value)
+
+        self.store.create_map('nodes', {'id': int, 'x': float, 'count': int}, 'id')
+        self.store.insert_data('nodes', {'id': 0, 'x': 0.5, 'count': 2})
+        self.assertEqual(self.store.get_data('nodes', 0), {'id': 0, 'x': 0.5, 'count': 2})
+
+        # None and undeclared fields are kept, as the dict store keeps them
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.update_data('nodes', {'id': 0, 'count': None})
+                raise RuntimeError()
+        self.assertEqual(self.store.get_data('nodes', 0)['count'], 2)
+        self.store.insert_data('nodes', {'id': 1, 'x': None, 'count': 1})
+        self.store.insert_data('nodes', {'id': 2, 'x': 2.0, 'count': 3, 'tag': 'extra'})
+        self.store.update_data('nodes', {'id': 0, 'count': None})
+        self.assertIsNone(self.store.get_data('nodes', 1)['x'])
+        self.assertIsNone(self.store.get_data('nodes', 0)['count'])
+        self.assertEqual(self.store.get_data('nodes', 2)['tag'], 'extra')
+        self.assertEqual(self.store.get_column('nodes', 'count').tolist(), [None, 1, 3])
+        self.assertEqual(list(self.store.query_eq('nodes', 'count', 3)), [2])
+        self.assertEqual(list(self.store.query_range('nodes', {'x': (1.0, 3.0)})), [2])
+
+    def test_evicting_maps(self):
+        LRU, TTL = gamms.typing.LRU, gamms.typing.TTL
+        self.store.create_map('lru', {'id': int, 'x': float}, 'id', eviction=LRU(3))
+        self.store.create_index('lru', 'x')
+        for i in range(3):
+            self.store.insert_data('lru', {'id': i, 'x': float(i)})
+        self.store.get_data('lru', 0)
+        self.store.insert_data('lru', {'id': 3, 'x': 3.0})
+        self.assertEqual(sorted(self.store.query_keys('lru')), [0, 2, 3])
+        self.assertEqual(list(self.store.query_range('lru', {'x': (0.5, 1.5)})), [])
+        with self.assertRaises(KeyError):
+            self.store.get_data('lru', 1)
+
+        self.store.create_map('ttl', {'id': int, 'x': float}, 'id', eviction=TTL(2) | LRU(10))
+        self.store.insert_data('ttl', {'id': 0, 'x': 0.0})
+        self.store.insert_data('ttl', {'id': 1, 'x': 1.0})
+        self.ctx.ictx.memory.tick()
+        self.store.update_data('ttl', {'id': 1, 'x': 1.5})
+        self.ctx.ictx.memory.tick()
+        self.assertEqual(list(self.store.query_keys('ttl')), [1])
+        self.ctx.ictx.memory.tick()
+        self.assertEqual(list(self.store.query_keys('ttl')), [])
+
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.insert_data('lru', {'id': 4, 'x': 4.0})
+                raise RuntimeError
+        self.assertEqual(sorted(self.store.query_keys('lru')), [0, 2, 3])
+
+        stats = self.ctx.ictx.memory.stats(reset=True)['test_store']['eviction']
+        self.assertEqual(stats['lru']['lru_evictions'], 2)
+        self.assertEqual((stats['lru']['hits'], stats['lru']['misses'], stats['lru']['size']), (1, 1, 3))
+        self.assertEqual(stats['ttl']['ttl_evictions'], 2)
+        self.assertEqual((stats['ttl']['max_entries'], stats['ttl']['ttl']), (10, 2))
+        self.assertEqual(self.store.stats()['eviction']['lru']['lru_evictions'], 0)
+
+        with self.assertRaises(ValueError):
+            gamms.typing.LRU(0)
+
+
 class SqliteStoreTest(StoreTestBase):
     def setUp(self):
         self.ctx = gamms.create_context(logger_config={'level': 'ERROR'})
         self.store = self.ctx.ictx.memory.create_store(gamms.typing.StoreType.DATABASE, 'test_store', path=PathLike(':memory:'))
 
+    def test_read_cache(self):
+        self.store.create_map('m', {'id': int, 'name': str}, 'id')
+        self.store.insert_many('m', [{'id': 1, 'name': 'foo'}, {'id': 2, 'name': 'bar'}])
+        first = self.store.get_data('m', 1)
+        self.assertIs(self.store.get_data('m', 1), first)
+        stats = self.store.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+        self.store.update_data('m', {'id': 1, 'name': 'qux'})
+        self.assertEqual(self.store.get_data('m', 1)['name'], 'qux')
+        self.store.update_many('m', [{'id': 1, 'name': 'baz'}])
+        self.assertEqual(self.store.get_data('m', 1)['name'], 'baz')
+
+        # Writes behind the store's back are picked up after mark_dirty
+        self.store.connection().execute("UPDATE m SET name = 'raw' WHERE id = 1")
+        self.store.mark_dirty()
+        self.assertEqual(self.store.get_data('m', 1)['name'], 'raw')
+
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.update_data('m', {'id': 2, 'name': 'tx'})
+                self.assertEqual(self.store.get_data('m', 2)['name'], 'tx')
+                raise RuntimeError()
+        self.assertEqual(self.store.get_data('m', 2)['name'], 'bar')
+
+        self.store.delete_data('m', 2)
+        with self.assertRaises(KeyError):
+            self.store.get_data('m', 2)
+
+    def test_packed_coordinates(self):
+        from shapely.geometry import LineString
+        import cbor2
+        import numpy as np
+        self.store.create_map('e', {'id': int, 'ls': LineString, 'pts': np.ndarray}, 'id')
+        self.store.insert_data('e', {'id': 1, 'ls': ((0.0, 0.0), (1.0, 2.0), (3.0, 4.5)), 'pts': np.eye(3)})
+        data = self.store.get_data('e', 1)
+        self.assertIsInstance(data['ls'], LineString)
+        self.assertEqual(list(data['ls'].coords), [(0.0, 0.0), (1.0, 2.0), (3.0, 4.5)])
+        self.assertIs(data['ls'], data['ls'])
+        coords = data.coords('ls')
+        self.assertEqual(coords.shape, (3, 2))
+        self.assertFalse(coords.flags.writeable)
+        np.testing.assert_array_equal(data['pts'], np.eye(3))
+        with self.assertRaises(TypeError):
+            data.coords('id')
+
+        # Rows written as CBOR arrays are still readable
+        self.store.connection().execute(
+            "INSERT INTO e (id, ls, pts) VALUES (?, ?, ?)",
+            (2, cbor2.dumps(((0.0, 0.0), (1.0, 1.0))), cbor2.dumps(((1.0, 2.0),))),
+        )
+        self.store.mark_dirty()
+        data = self.store.get_data('e', 2)
+        self.assertEqual(list(data['ls'].coords), [(0.0, 0.0), (1.0, 1.0)])
+        self.assertEqual(data.coords('ls').shape, (2, 2))
+        np.testing.assert_array_equal(data['pts'], [[1.0, 2.0]])
+
+    def test_threaded_reads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SqliteStore('threaded', PathLike(os.path.join(tmpdir, 'store.db')))
+            store.create_map('m', {'id': int, 'name': str}, 'id')
+            store.insert_many('m', [{'id': i, 'name': f'n{i}'} for i in range(100)])
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                names = list(pool.map(lambda i: store.get_data('m', i)['name'], range(100)))
+                self.assertEqual(names, [f'n{i}' for i in range(100)])
+                self.assertNotIn(
+                    store.connection(), set(pool.map(lambda _: store.read_connection(), range(8)))
+                )
+
+                # Workers only see what the writer has committed
+                with store.transaction():
+                    store.update_data('m', {'id': 1, 'name': 'tx'})
+                    self.assertEqual(store.get_data('m', 1)['name'], 'tx')
+                    self.assertEqual(pool.submit(lambda: store.get_data('m', 1)['name']).result(), 'n1')
+                    self.assertEqual(pool.submit(lambda: len(list(store.query_keys('m')))).result(), 100)
+                self.assertEqual(pool.submit(lambda: store.get_data('m', 1)['name']).result(), 'tx')
+                with self.assertRaises(KeyError):
+                    pool.submit(store.get_data, 'm', 999).result()
+            store.close()
+
+    def test_memory_threaded_reads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        store = SqliteStore('shared', PathLike(':memory:'))
+        store.create_map('m', {'id': int, 'name': str}, 'id')
+        store.insert_many('m', [{'id': i, 'name': f'n{i}'} for i in range(200)])
+
+        def scan(_):
+            # Interleave statements and fetches of several cursors on the shared connection
+            cursor = store.read_connection().cursor()
+            cursor.execute("SELECT id FROM m ORDER BY id")
+            ids = [row[0] for row in cursor]
+            names = [store.get_data('m', i)['name'] for i in range(0, 200, 7)]
+            return ids, names
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(scan, i) for i in range(32)]
+            # The writer thread keeps writing meanwhile
+            for i in range(200, 300):
+                store.insert_data('m', {'id': i, 'name': f'n{i}'})
+            results = [future.result() for future in futures]
+        for ids, names in results:
+            self.assertEqual(ids[:200], list(range(200)))
+            self.assertEqual(names, [f'n{i}' for i in range(0, 200, 7)])
+        self.assertEqual(len(list(store.query_keys('m'))), 300)
+        store.close()
+
+    def test_write_behind(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SqliteStore('behind', PathLike(os.path.join(tmpdir, 'store.db')), write_behind=True)
+            store.create_map('m', {'id': int, 'name': str, 'tags': tuple}, 'id')
+            for i in range(50):
+                store.insert_data('m', {'id': i, 'name': f'n{i}', 'tags': (i,)})
+                store.update_data('m', {'id': i, 'name': f'u{i}'})
+            self.assertEqual(store.get_data('m', 7)['name'], 'u7')
+            self.assertEqual(store.get_data('m', 7)['tags'], (7,))
+            with self.assertRaises(KeyError):
+                store.insert_data('m', {'id': 7, 'name': 'dup', 'tags': ()})
+            with self.assertRaises(KeyError):
+                store.update_data('m', {'id': 99, 'name': 'missing'})
+
+            store.flush()
+            reader = sqlite3.connect(store.path().as_str())
+            self.assertEqual(reader.execute("SELECT name FROM m WHERE id = 49").fetchone(), ('u49',))
+            self.assertEqual(sorted(store.query_keys('m')), list(range(50)))
+
+            # A failing batch is rolled back and reported by the next flush
+            store.connection().execute(
+                "CREATE TRIGGER boom BEFORE INSERT ON m WHEN NEW.id = 60 BEGIN SELECT RAISE(ABORT, 'boom'); END"
+            )
+            store.insert_data('m', {'id': 60, 'name': 'x', 'tags': ()})
+            with self.assertRaises(RuntimeError):
+                store.flush()
+            with self.assertRaises(KeyError):
+                store.get_data('m', 60)
+            store.delete_data('m', 0)
+            reader.close()
+            store.close()
+
+    def test_write_behind_duplicate(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = SqliteStore('behind', PathLike(os.path.join(tmpdir, 'store.db')), cache_size=0, write_behind=True)
+            store.create_map('m', {'id': int, 'name': str}, 'id')
+            store.insert_data('m', {'id': 1, 'name': 'a'})
+            with self.assertRaises(KeyError):
+                store.insert_data('m', {'id': 1, 'name': 'queued'})
+            store.flush()
+            # Neither queued nor cached, the key is found in the database
+            with self.assertRaises(KeyError):
+                store.insert_data('m', {'id': 1, 'name': 'b'})
+
+            # A failing write only loses itself, the rest of its batch is applied
+            store.connection().execute(
+                "CREATE TRIGGER boom BEFORE INSERT ON m WHEN NEW.id = 30 BEGIN SELECT RAISE(ABORT, 'boom'); END"
+            )
+            for i in range(2, 50):
+                store.insert_data('m', {'id': i, 'name': f'n{i}'})
+            with self.assertRaisesRegex(RuntimeError, "key 30 of map 'm'"):
+                store.flush()
+            self.assertEqual(sorted(store.query_keys('m')), [i for i in range(1, 50) if i != 30])
+            self.assertEqual(store.get_data('m', 1)['name'], 'a')
+            store.close()
+
+    def test_connection_stats(self):
+        self.store.create_map('pts', {'id': int, 'x': float}, 'id')
+        self.store.insert_many('pts', [{'id': i, 'x': float(i)} for i in range(5)])
+        self.store.get_data('pts', 1)
+        self.store.enable_stats()
+        self.store.get_data('pts', 1)
+        self.store.get_data('pts', 2)
+        cursor = self.store.read_connection().cursor()
+        cursor.execute("SELECT id FROM pts WHERE x > ?", (1.5,))
+        self.assertEqual(sorted(row[0] for row in cursor), [2, 3, 4])
+
+        stats = self.store.stats(reset=True)
+        self.assertEqual(stats['maps']['pts']['sql']['count'], 1)
+        self.assertEqual(stats['maps']['pts']['get']['count'], 2)
+        self.assertEqual((stats['cache']['hits'], stats['cache']['misses']), (1, 2))
+        self.assertEqual((self.store.cache_stats()['hits'], self.store.cache_stats()['misses']), (0, 0))
+
+    def test_read_cache_bound(self):
+        store = SqliteStore('bounded', PathLike(':memory:'), cache_size=2)
+        store.create_map('m', {'id': int}, 'id')
+        store.insert_many('m', [{'id': i} for i in range(4)])
+        for i in range(4):
+            store.get_data('m', i)
+        self.assertEqual(store.cache_stats()['size'], 2)
+        store.get_data('m', 3)
+        store.get_data('m', 0)
+        self.assertEqual(store.cache_stats()['hits'], 1)
+        store.close()
+
+class FileStoreTest(StoreTestBase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = PathLike(os.path.join(self.tmpdir.name, 'store.log'))
+        self.ctx = gamms.create_context(logger_config={'level': 'ERROR'})
+        self.store = self.ctx.ictx.memory.create_store(gamms.typing.StoreType.FILESYSTEM, 'test_store', path=self.path)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.tmpdir.cleanup()
+
+    def test_reopen(self):
+        from shapely.geometry import LineString
+        self.store.create_map('e', {'id': int, 'ls': LineString, 'tags': tuple, 'name': str}, 'id')
+        self.store.insert_many('e', [
+            {'id': i, 'ls': ((0.0, 0.0), (1.0, float(i))), 'tags': (i,), 'name': f'e{i}'} for i in range(5)
+        ])
+        self.store.update_data('e', {'id': 1, 'name': 'one'})
+        self.store.delete_data('e', 2)
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.delete_data('e', 3)
+                raise RuntimeError()
+        with self.store.transaction():
+            self.store.insert_data('e', {'id': 5, 'ls': None, 'tags': (), 'name': 'x'})
+            with self.assertRaises(KeyError):
+                with self.store.transaction():
+                    self.store.update_data('e', {'id': 5, 'name': 'y'})
+                    self.store.insert_data('e', {'id': 0, 'ls': None, 'tags': (), 'name': 'dup'})
+        self.store.close()
+
+        store = FileStore('reopened', self.path)
+        self.assertEqual(store.list_maps(), ['e'])
+        self.assertEqual(sorted(store.query_keys('e')), [0, 1, 3, 4, 5])
+        data = store.get_data('e', 1)
+        self.assertEqual((data['name'], data['tags']), ('one', (1,)))
+        self.assertEqual(list(data['ls'].coords), [(0.0, 0.0), (1.0, 1.0)])
+        self.assertFalse(data.coords('ls').flags.writeable)
+        self.assertEqual(store.get_data('e', 5)['name'], 'x')
+        self.assertIsNone(store.get_data('e', 5)['ls'])
+        store.close()
+
+    def test_torn_tail(self):
+        self.store.create_map('m', {'id': int, 'name': str}, 'id')
+        self.store.insert_data('m', {'id': 1, 'name': 'foo'})
+        self.store.close()
+        intact = os.path.getsize(self.path.as_str())
+
+        # A crash mid-transaction leaves its records without a COMMIT, the last one torn
+        store = FileStore('crashed', self.path)
+        with store.transaction():
+            store.insert_data('m', {'id': 2, 'name': 'bar'})
+            store.insert_data('m', {'id': 3, 'name': 'baz'})
+        store.close()
+        commit_size = 16
+        os.truncate(self.path.as_str(), os.path.getsize(self.path.as_str()) - commit_size - 3)
+        self.assertGreater(os.path.getsize(self.path.as_str()), intact)
+
+        store = FileStore('recovered', self.path)
+        self.assertEqual(list(store.query_keys('m')), [1])
+        store.insert_data('m', {'id': 4, 'name': 'qux'})
+        store.close()
+        store = FileStore('recovered', self.path)
+        self.assertEqual(sorted(store.query_keys('m')), [1, 4])
+        store.close()
+
+    def test_restore_truncates_log(self):
+        self.store.create_map('m', {'id': int, 'name': str}, 'id')
+        self.store.insert_data('m', {'id': 1, 'name': 'foo'})
+        snapshot = self.store.snapshot()
+        size = self.store.segment_size()
+        self.store.insert_data('m', {'id': 2, 'name': 'bar'})
+        self.store.restore(snapshot)
+        self.assertEqual(self.store.segment_size(), size)
+        self.store.update_data('m', {'id': 1, 'name': 'qux'})
+        self.store.compact()
+        with self.assertRaises(ValueError):
+            self.store.restore(snapshot)
+        self.store.close()
+
+        store = FileStore('reopened', self.path)
+        self.assertEqual(list(store.query_keys('m')), [1])
+        self.assertEqual(store.get_data('m', 1)['name'], 'qux')
+        store.close()
+
+    def test_compact(self):
+        self.store.create_map('m', {'id': int, 'name': str}, 'id')
+        self.store.create_map('gone', {'id': int}, 'id')
+        self.store.insert_many('m', [{'id': i, 'name': 'x' * 64} for i in range(100)])
+        for _ in range(5):
+            self.store.update_many('m', [{'id': i, 'name': 'y' * 64} for i in range(100)])
+        self.store.delete_many('m', range(50))
+        self.store.delete_map('gone')
+        before = self.store.get_data('m', 60)
+        size = self.store.segment_size()
+        self.store.compact()
+        self.assertLess(self.store.segment_size(), size / 5)
+        self.assertEqual(before['name'], 'y' * 64)
+        self.assertEqual(sorted(self.store.query_keys('m')), list(range(50, 100)))
+        self.store.update_data('m', {'id': 60, 'name': 'z'})
+        self.store.close()
+
+        store = FileStore('reopened', self.path)
+        self.assertEqual(store.list_maps(), ['m'])
+        self.assertEqual(store.get_data('m', 60)['name'], 'z')
+        self.assertEqual(store.get_data('m', 61)['name'], 'y' * 64)
+        store.close()
+
 class MemoryEngineTestSuite(unittest.TestCase):
     def setUp(self) -> None:
         self.ctx = gamms.create_context(logger_config={'level': 'ERROR'})
@@ -127,12 +763,23 @@ def test_create_get_list_store(self):
         self.ctx.ictx.memory.get_store('mem_store')
         self.ctx.ictx.memory.get_store('sqlite_store')
 
+    def test_simulate_ticks(self):
+        store = self.ctx.ictx.memory.create_store(gamms.typing.StoreType.MEMORY, 'ttl_store')
+        store.create_map('seen', {'id': int, 'x': float}, 'id', eviction=gamms.typing.TTL(2))
+        store.insert_data('seen', {'id': 0, 'x': 0.0})
+        # Rows expire in a plain simulation loop without ticking by hand
+        self.ctx.visual.simulate()
+        self.assertEqual(list(store.query_keys('seen')), [0])
+        self.ctx.visual.simulate()
+        self.assertEqual(list(store.query_keys('seen')), [])
+
 def suite():
     s = unittest.TestSuite()
     for cls in (
         MemoryEngineTestSuite,
         MemoryStoreTest,
         SqliteStoreTest,
+        FileStoreTest,
     ):
         s.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(cls))
     return s
@@ -354,6 +354,22 @@ def test_no_building_all_nodes_visible(self):
                 self.assertIn(self.nid(row, col), data['nodes'],
                               msg=f"node ({row},{col}) missing with no buildings")
 
+    def test_compact_output_matches_dict(self):
+        self.add_building(4, -3, 6, 3)
+        data = self._sense()
+        s = self.occluded_map('occ_compact', sensor_range=self.RANGE, compact=True)
+        s.sense(self.nid(0, 0))
+        self.assertEqual(set(s.data['node_ids'].tolist()), set(data['nodes']))
+        self.assertEqual(set(s.data['edge_ids'].tolist()), {e.id for e in data['edges']})
+
+    def test_new_building_invalidates_cached_result(self):
+        s = self.occluded_map('occ_cached', sensor_range=self.RANGE)
+        s.sense(self.nid(0, 0))
+        self.assertIn(self.nid(0, 1), s.data['nodes'])
+        self.add_building(4, -3, 6, 3)
+        s.sense(self.nid(0, 0))
+        self.assertNotIn(self.nid(0, 1), s.data['nodes'])
+
     def test_building_blocks_column_ahead(self):
         # Wall slab at x=5 (between col 0 and col 1), centred on y=0 axis.
         # Blocks all nodes with col >= 1 and row == 0 when looking straight along +x.
@@ -572,6 +588,19 @@ def test_drone_at_eye_level_loses_node_behind_wall(self):
         s.sense(self.nid(0, 0))
         self.assertNotIn(self.nid(0, 1), s.data['nodes'])
 
+    def test_compact_output_matches_dict(self):
+        self.add_building(4, -3, 6, 3)
+        drone = self._make_drone('drone_low', z=1.0)
+        data = {}
+        for label, compact in (('occ_aerial_dict', False), ('occ_aerial_compact', True)):
+            s = self.occluded_aerial(label, sensor_range=60.0, fov=math.pi, compact=compact)
+            s.set_owner(drone.name)
+            s.sense(self.nid(0, 0))
+            data[compact] = s.data
+        self.assertNotIn(self.nid(0, 1), data[True]['node_ids'].tolist())
+        self.assertEqual(set(data[True]['node_ids'].tolist()), set(data[False]['nodes']))
+        self.assertEqual(set(data[True]['edge_ids'].tolist()), {e.id for e in data[False]['edges']})
+
     def test_drone_side_node_always_visible(self):
         # Node (1,0) is above the origin in y — the wall along x=5 never crosses this ray.
         self.add_building(4, -3, 6, 3)
@@ -105,6 +105,151 @@ def test_agent_sensor(self):
         self.assertEqual(data['agent_1'], 24)
         self.assertNotIn('agent_0', data)
 
+    def test_sensor_skips_unchanged_inputs(self):
+        map_sensor = gamms.SensorEngine.sensor_engine.MapSensor(
+            self.ctx, sensor_id='cached_map',
+            sensor_type=gamms.SensorEngine.sensor_engine.SensorType.RANGE,
+            sensor_range=1.5, fov=2 * math.pi,
+        )
+        agent_sensor = gamms.SensorEngine.sensor_engine.AgentSensor(
+            self.ctx, sensor_id='cached_agent',
+            sensor_type=gamms.SensorEngine.sensor_engine.SensorType.AGENT_RANGE,
+            sensor_range=2.0,
+        )
+        agent = self.ctx.agent.create_agent('agent_0', start_node_id=0)
+        self.ctx.agent.create_agent('agent_1', start_node_id=24)
+
+        map_sensor.sense(12)
+        agent_sensor.sense(0)
+        # The cached result is kept as is, callers get copies of it
+        map_data, agent_data = map_sensor._data, agent_sensor._data
+        map_sensor.sense(12)
+        agent_sensor.sense(0)
+        self.assertIs(map_sensor._data, map_data)
+        self.assertIs(agent_sensor._data, agent_data)
+
+        # Observer moved
+        map_sensor.sense(13)
+        self.assertIsNot(map_sensor._data, map_data)
+        self.assertIn(14, map_sensor.data['nodes'])
+
+        # Graph changed under the sensor
+        map_data = map_sensor._data
+        self.ctx.graph.graph.update_node({'id': 14, 'x': 40.0, 'y': 40.0})
+        map_sensor.sense(13)
+        self.assertIsNot(map_sensor._data, map_data)
+        self.assertNotIn(14, map_sensor.data['nodes'])
+
+        # Sensor parameters changed
+        map_data = map_sensor._data
+        map_sensor.range = 0.5
+        map_sensor.sense(13)
+        self.assertEqual(list(map_sensor.data['nodes']), [13])
+
+        # Another agent moved into range
+        agent.current_node_id = 1
+        agent_sensor.sense(0)
+        self.assertIsNot(agent_sensor._data, agent_data)
+        self.assertEqual(agent_sensor.data, {'agent_0': 1})
+        agent_data = agent_sensor._data
+        agent.current_node_id = 1
+        agent_sensor.sense(0)
+        self.assertIs(agent_sensor._data, agent_data)
+
+        # Mutating a copy leaves the cached result intact
+        map_sensor.range = 1.5
+        map_sensor.sense(12)
+        map_data = map_sensor.data
+        map_sensor.data['nodes'].clear()
+        map_sensor.data['edges'].clear()
+        map_sensor.sense(12)
+        self.assertEqual(map_sensor.data, map_data)
+        self.assertIn(13, map_sensor.data['nodes'])
+        agent_sensor.data['agent_0'] = 24
+        agent_sensor.sense(0)
+        self.assertEqual(agent_sensor.data, {'agent_0': 1})
+
+    def test_compact_map_sensor(self):
+        for k, (sensor_range, fov) in enumerate(((float('inf'), 2 * math.pi), (2.5, 2 * math.pi), (3.0, 1.5))):
+            full = gamms.SensorEngine.sensor_engine.MapSensor(
+                self.ctx, sensor_id=f'dict_{k}',
+                sensor_type=gamms.SensorEngine.sensor_engine.SensorType.ARC,
+                sensor_range=sensor_range, fov=fov, orientation=(1.0, 1.0),
+            )
+            compact = gamms.SensorEngine.sensor_engine.MapSensor(
+                self.ctx, sensor_id=f'compact_{k}',
+                sensor_type=gamms.SensorEngine.sensor_engine.SensorType.ARC,
+                sensor_range=sensor_range, fov=fov, orientation=(1.0, 1.0), compact=True,
+            )
+            for node_id in (0, 12, 19):
+                full.sense(node_id)
+                compact.sense(node_id)
+                data = compact.data
+                self.assertEqual(data['node_ids'].shape, (len(full.data['nodes']),))
+                self.assertEqual(data['node_xy'].shape, (len(full.data['nodes']), 2))
+                for nid, (x, y) in zip(data['node_ids'].tolist(), data['node_xy'].tolist()):
+                    node = full.data['nodes'][nid]
+                    self.assertEqual((node.x, node.y), (x, y))
+                self.assertEqual(
+                    sorted(zip(data['edge_ids'].tolist(), data['edge_source'].tolist(), data['edge_target'].tolist())),
+                    sorted((edge.id, edge.source, edge.target) for edge in full.data['edges']),
+                )
+
+    def test_incremental_map_sensor(self):
+        # 40x40 unit grid far away from the base grid
+        n, base = 40, 1000
+        for i in range(n * n):
+            self.ctx.graph.graph.add_node({'id': base + i, 'x': 100.0 + i % n, 'y': float(i // n)})
+        eid = 10000
+        for i in range(n * n):
+            if i % n + 1 < n:
+                self.ctx.graph.graph.add_edge({'id': eid, 'source': base + i, 'target': base + i + 1, 'length': 1})
+                eid += 1
+            if i + n < n * n:
+                self.ctx.graph.graph.add_edge({'id': eid, 'source': base + i, 'target': base + i + n, 'length': 1})
+                eid += 1
+
+        for fov in (2 * math.pi, 2.0):
+            full = gamms.SensorEngine.sensor_engine.MapSensor(
+                self.ctx, sensor_id=f'full_{fov}',
+                sensor_type=gamms.SensorEngine.sensor_engine.SensorType.ARC,
+                sensor_range=15.0, fov=fov,
+            )
+            incremental = gamms.SensorEngine.sensor_engine.MapSensor(
+                self.ctx, sensor_id=f'incremental_{fov}',
+                sensor_type=gamms.SensorEngine.sensor_engine.SensorType.ARC,
+                sensor_range=15.0, fov=fov, incremental=True,
+            )
+
+            def check(node_id):
+                full.sense(node_id)
+                incremental.sense(node_id)
+                self.assertEqual(set(full.data['nodes']), set(incremental.data['nodes']))
+                self.assertEqual(
+                    {edge.id for edge in full.data['edges']},
+                    {edge.id for edge in incremental.data['edges']},
+                )
+
+            # Walk one edge at a time, then teleport
+            for node_id in [base + 20 * n + 20 + k for k in range(5)] + [base + 5 * n + 30, base + 5 * n + 31]:
+                check(node_id)
+
+            # Graph mutations inside the sensed disc force a full recompute
+            self.ctx.graph.graph.remove_edge(full.data['edges'][0].id)
+            check(base + 5 * n + 31)
+            self.ctx.graph.graph.update_node({'id': base + 5 * n + 32, 'x': 500.0, 'y': 500.0})
+            check(base + 5 * n + 31)
+
+        # A zero range sensor only sees the node it stands on
+        point = gamms.SensorEngine.sensor_engine.MapSensor(
+            self.ctx, sensor_id='point',
+            sensor_type=gamms.SensorEngine.sensor_engine.SensorType.RANGE,
+            sensor_range=0.0, fov=2 * math.pi, incremental=True,
+        )
+        for node_id in (base + 20 * n + 20, base + 20 * n + 21, base + 20 * n + 21):
+            point.sense(node_id)
+            self.assertEqual(set(point.data['nodes']), {node_id})
+
     def tearDown(self):
         self.ctx.terminate()
 
@@ -174,7 +319,7 @@ def test_create_sensor(self):
             MockSensor.assert_called_once_with(
                 self.ctx, 'test_map_sensor',
                 gamms.SensorEngine.sensor_engine.SensorType.MAP,
-                sensor_range=float('inf'), fov=2*math.pi
+                sensor_range=float('inf'), fov=2*math.pi, compact=False
             )
         with patch('gamms.SensorEngine.sensor_engine.MapSensor') as MockSensor:
             _ = self.ctx.sensor.create_sensor(
@@ -184,7 +329,7 @@ def test_create_sensor(self):
             MockSensor.assert_called_once_with(
                 self.ctx, 'test_map_sensor_2',
                 gamms.SensorEngine.sensor_engine.SensorType.RANGE,
-                sensor_range=30.0, fov=2*math.pi
+                sensor_range=30.0, fov=2*math.pi, incremental=False, compact=False
             )
         with patch('gamms.SensorEngine.sensor_engine.MapSensor') as MockSensor:
             _ = self.ctx.sensor.create_sensor(
@@ -194,7 +339,7 @@ def test_create_sensor(self):
             MockSensor.assert_called_once_with(
                 self.ctx, 'test_map_sensor_2',
                 gamms.SensorEngine.sensor_engine.SensorType.RANGE,
-                sensor_range=30.0, fov=2*math.pi
+                sensor_range=30.0, fov=2*math.pi, incremental=False, compact=False
             )
         
         with patch('gamms.SensorEngine.sensor_engine.AgentSensor') as MockSensor:
@@ -304,6 +449,74 @@ def test_aerial_sensor(self):
         self.assertIn('edges', data)
         self.assertEqual(len(data['nodes']), 5)
 
+    def test_aerial_sensor_cone(self):
+        from gamms.SensorEngine.sensors_aerial import multiply_quaternions, quaternion_to_direction
+        aerial_agent = self.ctx.agent.create_agent(
+            name='aerial_agent',
+            type=gamms.typing.agent_engine.AgentType.AERIAL,
+            start_node_id=12,
+            speed=5.0
+        )
+        quats = [
+            (math.sqrt(0.5), 0.0, math.sqrt(0.5), 0.0),
+            (1.0, 0.0, 0.0, 0.0),
+            (math.cos(0.4), 0.0, math.sin(0.4), 0.0),
+        ]
+        for k, quat in enumerate(quats):
+            for fov in (math.pi / 6, math.pi / 2, math.pi):
+                sensor = gamms.SensorEngine.sensor_engine.AerialSensor(
+                    self.ctx, sensor_id=f'aerial_cone_{k}_{fov}',
+                    sensor_range=4.0, fov=fov, quat=quat,
+                )
+                sensor.set_owner(aerial_agent.name)
+                for position in ((2.0, 2.0, 1.0), (0.5, 3.0, 2.5), (4.0, 0.0, 0.0)):
+                    aerial_agent.position = position
+                    sensor.sense(12)
+                    x, y, z = position
+                    fx, fy, fz = quaternion_to_direction(multiply_quaternions(aerial_agent.quat, sensor.quat))
+                    expected = set()
+                    for nid in range(25):
+                        node = self.ctx.graph.graph.get_node(nid)
+                        normsq = (node.x - x)**2 + (node.y - y)**2 + z**2
+                        if normsq == 0 or normsq > sensor.range**2:
+                            continue
+                        cosine = (node.x - x) * fx + (node.y - y) * fy - z * fz
+                        # Points on the cone boundary count as inside
+                        if math.acos(max(min(cosine / math.sqrt(normsq), 1.0), -1.0)) <= sensor.fov / 2 + 1e-6:
+                            expected.add(nid)
+                    self.assertEqual(set(sensor.data['nodes']), expected)
+                    for edge in sensor.data['edges']:
+                        self.assertIn(edge.source, expected)
+                        self.assertIn(edge.target, expected)
+
+    def test_compact_aerial_sensor(self):
+        aerial_agent = self.ctx.agent.create_agent(
+            name='aerial_agent',
+            type=gamms.typing.agent_engine.AgentType.AERIAL,
+            start_node_id=12,
+            speed=5.0
+        )
+        full = gamms.SensorEngine.sensor_engine.AerialSensor(
+            self.ctx, sensor_id='aerial_dict', sensor_range=50.0, fov=math.pi / 2,
+        )
+        compact = gamms.SensorEngine.sensor_engine.AerialSensor(
+            self.ctx, sensor_id='aerial_compact', sensor_range=50.0, fov=math.pi / 2, compact=True,
+        )
+        self.assertEqual(len(compact.data), 0)
+        compact.sense(12)
+        self.assertEqual(compact.data['node_ids'].shape, (0,))
+        full.set_owner(aerial_agent.name)
+        compact.set_owner(aerial_agent.name)
+        aerial_agent.position = (2.0, 2.0, 2.0)
+        full.sense(12)
+        compact.sense(12)
+        data = compact.data
+        self.assertEqual(set(data['node_ids'].tolist()), set(full.data['nodes']))
+        for nid, (x, y) in zip(data['node_ids'].tolist(), data['node_xy'].tolist()):
+            self.assertEqual((full.data['nodes'][nid].x, full.data['nodes'][nid].y), (x, y))
+        self.assertEqual(set(data['edge_ids'].tolist()), {edge.id for edge in full.data['edges']})
+        self.assertGreater(len(data['edge_ids']), 0)
+
     def test_aerial_agent_sensor(self):
         sensor = gamms.SensorEngine.sensor_engine.AerialAgentSensor(
             self.ctx, sensor_id='aerial_agent_sensor',
@@ -355,10 +568,15 @@ def suite():
     suite.addTest(SensorTest('test_neighbor_sensor'))
     suite.addTest(SensorTest('test_map_sensor'))
     suite.addTest(SensorTest('test_agent_sensor'))
+    suite.addTest(SensorTest('test_sensor_skips_unchanged_inputs'))
+    suite.addTest(SensorTest('test_compact_map_sensor'))
+    suite.addTest(SensorTest('test_incremental_map_sensor'))
     suite.addTest(SensorEngineTest('test_add_get_sensor'))
     suite.addTest(SensorEngineTest('test_create_sensor'))
     suite.addTest(SensorEngineTest('test_custom_sensor'))
     suite.addTest(SensorEngineTest('test_aerial_sensor'))
+    suite.addTest(SensorEngineTest('test_aerial_sensor_cone'))
+    suite.addTest(SensorEngineTest('test_compact_aerial_sensor'))
     suite.addTest(SensorEngineTest('test_aerial_agent_sensor'))
     return suite
 